@@ -1,31 +1,49 @@
 import asyncio
+import atexit
+import concurrent.futures
 import datetime
 import decimal
+import itertools
 import json
+import threading
+import uuid
+import weakref
 from copy import deepcopy
 from functools import reduce
 
 import pytz
 import redis
 
-from python_redis_orm.utils import check_types, get_ids_from_untyped_data, check_callable
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:
+    redis_asyncio = None
+
+from python_redis_orm.utils import check_types, get_ids_from_untyped_data, check_callable, get_not_supported_method
 
 
 ### FIELDS ###
 
 
 class RedisField:
+    index_type = None
     
-    def __init__(self, default=None, choices=None, null=True):
+    def __init__(self, default=None, choices=None, null=True, index=False):
         default = check_callable(default)
         choices = check_callable(choices)
         null = check_callable(null)
         check_types(choices, dict)
         check_types(null, bool)
+        check_types(index, bool)
+        if self.index_type is None and choices:
+            self.index_type = 'exact'
+        if index and self.index_type is None:
+            raise Exception(f'{self.__class__.__name__} can not be indexed')
         self.default = default
         self.value = None
         self.choices = choices
         self.null = null
+        self.index = index
     
     def _get_default_value(self):
         self.value = check_callable(self.default)
@@ -36,20 +54,27 @@ class RedisField:
             if value not in self.choices.keys():
                 raise Exception(f'{value} is not allowed. Allowed values: {", ".join(list(self.choices.keys()))}')
     
-    def check_value(self):
-        if self.value is None:
-            self.value = self._get_default_value()
-        if self.value is None:
+    def _check_value(self, value):
+        if value is None:
+            value = check_callable(self.default)
+        if value is None:
             if self.null:
-                self.value = 'null'
+                value = 'null'
             else:
                 raise Exception('null is not allowed')
-        if self.value:
-            self._check_choices(self.value)
+        if value:
+            self._check_choices(value)
+        return value
+    
+    def check_value(self):
+        self.value = self._check_value(self.value)
         return self.value
     
+    def encode(self, value):
+        return self._check_value(value)
+    
     def clean(self):
-        self.value = self.check_value()
+        self.value = self.encode(self.value)
         return self.value
     
     def deserialize_value_check_null(self, value, redis_root):
@@ -61,22 +86,39 @@ class RedisField:
                 else:
                     raise Exception(f'{value} can not be deserialized like {self.__class__.__name__}')
     
-    def deserialize_value(self, value, redis_root):
+    def decode(self, value, redis_root):
         self.deserialize_value_check_null(value, redis_root)
         return value
+    
+    def deserialize_value(self, value, redis_root):
+        return self.decode(value, redis_root)
+    
+    def get_index_score(self, value):
+        return None
+    
+    def get_index_filter_score(self, filter_by):
+        return None
+    
+    def get_index_member(self, value):
+        if value in ['null', None]:
+            return 'null'
+        return f'{value}'
+    
+    def get_index_filter_member(self, filter_by):
+        return self.get_index_member(filter_by)
 
 
 class RedisString(RedisField):
+    index_type = 'exact'
     
-    def clean(self):
-        self.value = self.check_value()
-        if self.value not in [None, 'null']:
-            self.value = f'{self.value}'
-        return super().clean()
+    def encode(self, value):
+        value = self._check_value(value)
+        if value not in [None, 'null']:
+            value = f'{value}'
+        return self._check_value(value)
     
-    def deserialize_value(self, value, redis_root):
+    def decode(self, value, redis_root):
         self.deserialize_value_check_null(value, redis_root)
-        value = super().deserialize_value(value, redis_root)
         if value not in ['null', None]:
             value = f'{value}'
         else:
@@ -85,17 +127,17 @@ class RedisString(RedisField):
 
 
 class RedisNumber(RedisField):
+    index_type = 'range'
     
-    def clean(self):
-        self.value = self.check_value()
-        if self.value not in [None, 'null']:
-            check_types(self.value, (int, float))
-        return super().clean()
+    def encode(self, value):
+        value = self._check_value(value)
+        if value not in [None, 'null']:
+            check_types(value, (int, float))
+        return self._check_value(value)
     
-    def deserialize_value(self, value, redis_root):
+    def decode(self, value, redis_root):
         self.deserialize_value_check_null(value, redis_root)
         if value not in ['null', None]:
-            value = super().deserialize_value(value, redis_root)
             if type(value) == str:
                 if '.' in value:
                     value = float(value)
@@ -106,9 +148,20 @@ class RedisNumber(RedisField):
         else:
             value = None
         return value
+    
+    def get_index_score(self, value):
+        if value in ['null', None]:
+            return None
+        return float(value)
+    
+    def get_index_filter_score(self, filter_by):
+        if type(filter_by) not in [int, float]:
+            return None
+        return float(filter_by)
 
 
 class RedisId(RedisNumber):
+    index_type = None
     
     def __init__(self, *args, **kwargs):
         kwargs['null'] = False
@@ -116,43 +169,61 @@ class RedisId(RedisNumber):
 
 
 class RedisBool(RedisNumber):
+    index_type = 'exact'
     
     def __init__(self, *args, **kwargs):
         kwargs['choices'] = {True: 'Yes', False: 'No'}
         super().__init__(*args, **kwargs)
     
-    def clean(self):
-        self.value = self.check_value()
-        if self.value not in [None, 'null']:
-            check_types(self.value, bool)
-            self.value = int(self.value)
-        return super().clean()
+    def encode(self, value):
+        value = self._check_value(value)
+        if value not in [None, 'null']:
+            check_types(value, bool)
+            value = int(value)
+        return self._check_value(value)
     
-    def deserialize_value(self, value, redis_root):
+    def decode(self, value, redis_root):
         self.deserialize_value_check_null(value, redis_root)
         if value not in ['null', None]:
-            value = super().deserialize_value(value, redis_root)
+            if type(value) == str:
+                value = float(value) if '.' in value else int(value)
             check_types(value, int)
             value = bool(value)
         return value
+    
+    def get_index_filter_member(self, filter_by):
+        if filter_by in ['null', None]:
+            return 'null'
+        return f'{int(filter_by)}'
 
 
 class RedisDecimal(RedisString):
+    index_type = 'range'
     
-    def clean(self):
-        self.value = self.check_value()
-        if self.value not in [None, 'null']:
-            check_types(self.value, (int, float, decimal.Decimal))
-        return super().clean()
+    def encode(self, value):
+        value = self._check_value(value)
+        if value not in [None, 'null']:
+            check_types(value, (int, float, decimal.Decimal))
+            value = f'{value}'
+        return self._check_value(value)
     
-    def deserialize_value(self, value, redis_root):
+    def decode(self, value, redis_root):
         self.deserialize_value_check_null(value, redis_root)
         if value not in ['null', None]:
-            value = super().deserialize_value(value, redis_root)
-            value = decimal.Decimal(value)
+            value = decimal.Decimal(f'{value}')
         else:
             value = None
         return value
+    
+    def get_index_score(self, value):
+        if value in ['null', None]:
+            return None
+        return float(value)
+    
+    def get_index_filter_score(self, filter_by):
+        if type(filter_by) not in [int, float, decimal.Decimal]:
+            return None
+        return float(filter_by)
 
 
 class RedisJson(RedisField):
@@ -165,18 +236,16 @@ class RedisJson(RedisField):
         self.json_allowed_types = allowed_types
         return self.json_allowed_types
     
-    def clean(self):
-        self.value = self.check_value()
-        if self.value not in [None, 'null']:
-            check_types(self.value, self.json_allowed_types)
-            json_string = json.dumps(self.value)
-            self.value = json_string
-        return super().clean()
+    def encode(self, value):
+        value = self._check_value(value)
+        if value not in [None, 'null']:
+            check_types(value, self.json_allowed_types)
+            value = json.dumps(value)
+        return self._check_value(value)
     
-    def deserialize_value(self, value, redis_root):
+    def decode(self, value, redis_root):
         self.deserialize_value_check_null(value, redis_root)
         if value not in ['null', None]:
-            value = super().deserialize_value(value, redis_root)
             check_types(value, str)
             value = json.loads(value)
             check_types(value, self.json_allowed_types)
@@ -187,79 +256,80 @@ class RedisJson(RedisField):
 
 class RedisDict(RedisJson):
     
-    def clean(self):
-        self.set_json_allowed_types(dict)
-        return super().clean()
-    
-    def deserialize_value(self, value, redis_root):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
         self.set_json_allowed_types(dict)
-        self.deserialize_value_check_null(value, redis_root)
-        if value not in ['null', None]:
-            value = super().deserialize_value(value, redis_root)
-        else:
-            value = None
-        return value
 
 
 class RedisList(RedisJson):
     
-    def clean(self):
-        self.set_json_allowed_types(list)
-        return super().clean()
-    
-    def deserialize_value(self, value, redis_root):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
         self.set_json_allowed_types(list)
-        self.deserialize_value_check_null(value, redis_root)
-        if value not in ['null', None]:
-            value = super().deserialize_value(value, redis_root)
-        else:
-            value = None
-        return value
 
 
 class RedisDateTime(RedisString):
+    index_type = 'range'
     
-    def clean(self):
-        self.value = self.check_value()
-        if self.value not in [None, 'null']:
-            check_types(self.value, datetime.datetime)
-            string_datetime = self.value.replace(tzinfo=pytz.UTC).strftime('%Y.%m.%d-%H:%M:%S+%Z')
-            self.value = string_datetime
-        return super().clean()
+    def encode(self, value):
+        value = self._check_value(value)
+        if value not in [None, 'null']:
+            check_types(value, datetime.datetime)
+            value = value.replace(tzinfo=pytz.UTC).strftime('%Y.%m.%d-%H:%M:%S+%Z')
+        return self._check_value(value)
     
-    def deserialize_value(self, value, redis_root):
+    def decode(self, value, redis_root):
         self.deserialize_value_check_null(value, redis_root)
         if value not in ['null', None]:
-            value = super().deserialize_value(value, redis_root)
-            check_types(value, str)
+            value = f'{value}'
             value = datetime.datetime.strptime(value, '%Y.%m.%d-%H:%M:%S+%Z').replace(tzinfo=pytz.UTC)
         else:
             value = None
         return value
+    
+    def get_index_score(self, value):
+        if value in ['null', None]:
+            return None
+        return datetime.datetime.strptime(value, '%Y.%m.%d-%H:%M:%S+%Z').replace(tzinfo=pytz.UTC).timestamp()
+    
+    def get_index_filter_score(self, filter_by):
+        if not isinstance(filter_by, datetime.datetime):
+            return None
+        return filter_by.replace(tzinfo=pytz.UTC).timestamp()
 
 
 class RedisDate(RedisString):
+    index_type = 'range'
     
-    def clean(self):
-        self.value = self.check_value()
-        if self.value not in [None, 'null']:
-            check_types(self.value, datetime.date)
-            string_date = self.value.strftime('%Y.%m.%d+%Z')
-            self.value = string_date
-        return super().clean()
+    def encode(self, value):
+        value = self._check_value(value)
+        if value not in [None, 'null']:
+            check_types(value, datetime.date)
+            value = value.strftime('%Y.%m.%d+%Z')
+        return self._check_value(value)
     
-    def deserialize_value(self, value, redis_root):
+    def decode(self, value, redis_root):
         self.deserialize_value_check_null(value, redis_root)
         if value not in ['null', None]:
-            value = super().deserialize_value(value, redis_root)
-            check_types(value, str)
-            value = datetime.datetime.strptime(value, '%Y.%m.%d+%Z').date()
+            value = f'{value}'
+            value = datetime.datetime.strptime(value.split('+')[0], '%Y.%m.%d').date()
         else:
             value = None
         return value
+    
+    def get_index_score(self, value):
+        if value in ['null', None]:
+            return None
+        return datetime.datetime.strptime(value.split('+')[0], '%Y.%m.%d').date().toordinal()
+    
+    def get_index_filter_score(self, filter_by):
+        if not isinstance(filter_by, datetime.date) or isinstance(filter_by, datetime.datetime):
+            return None
+        return filter_by.toordinal()
 
 
 class RedisForeignKey(RedisNumber):
+    index_type = 'exact'
     
     def __init__(self, model=None, *args, **kwargs):
         model = check_callable(model)
@@ -289,26 +359,28 @@ class RedisForeignKey(RedisNumber):
                     f'{self.value} type is not dict, please provide serialized instance or dict like ' + "{'id': 1, ...}")
         return self.value
     
-    def clean(self):
-        self.value = self.check_value()
-        if self.value not in [None, 'null']:
-            self.value = get_ids_from_untyped_data(self.value)[0]
-        return super().clean()
+    def encode(self, value):
+        value = self._check_value(value)
+        if value not in [None, 'null']:
+            value = get_ids_from_untyped_data(value)[0]
+            check_types(value, (int, float))
+        return self._check_value(value)
     
-    def deserialize_value(self, value, redis_root):
+    def decode(self, value, redis_root):
         self.deserialize_value_check_null(value, redis_root)
         if value not in ['null', None]:
-            value = super().deserialize_value(value, redis_root)
+            if type(value) == str:
+                value = float(value) if '.' in value else int(value)
             check_types(value, int)
-            instance_id = value
-            instance_qs = redis_root.get(self.model, return_dict=True, id=instance_id)
-            if instance_id in instance_qs.keys():
-                value = instance_qs[instance_id]
-            else:
-                value = {'id': value}
+            value = {'id': value}
         else:
             value = None
         return value
+    
+    def get_index_filter_member(self, filter_by):
+        if filter_by in ['null', None]:
+            return 'null'
+        return f'{get_ids_from_untyped_data(filter_by)[0]}'
 
 
 class RedisManyToMany(RedisList):
@@ -328,26 +400,724 @@ class RedisManyToMany(RedisList):
             self.model = model
             super().__init__(*args, **kwargs)
     
-    def clean(self):
-        self.value = self.check_value()
-        if self.value not in [None, 'null']:
-            self.value = get_ids_from_untyped_data(self.value)
-        return super().clean()
+    def encode(self, value):
+        value = self._check_value(value)
+        if value not in [None, 'null']:
+            value = get_ids_from_untyped_data(value)
+        return super().encode(value)
     
-    def deserialize_value(self, value, redis_root):
+    def decode(self, value, redis_root):
         self.deserialize_value_check_null(value, redis_root)
         if value not in ['null', None]:
-            value = super().deserialize_value(value, redis_root)
-            instances_ids = value
-            instances = redis_root.get(self.model, id__in=instances_ids)
-            value = instances
+            value = super().decode(value, redis_root)
+            value = [{'id': instance_id} for instance_id in value]
         
         return value
 
 
+### AGGREGATES ###
+
+
+# Sums are added without rounding, the default context keeps only 28 digits
+AGGREGATE_DECIMAL_CONTEXT = decimal.Context(prec=decimal.MAX_PREC)
+
+
+class RedisAggregate:
+    function = None
+    numeric = False
+    comparable = False
+    
+    def __init__(self, field_name):
+        check_types(field_name, str)
+        self.field_name = field_name
+    
+    def get_name(self):
+        return f'{self.field_name}__{self.function}'
+    
+    def check_field(self, field):
+        allowed = not isinstance(field, RedisJson)
+        if self.numeric and (not isinstance(field, (RedisNumber, RedisDecimal)) or isinstance(field, (RedisBool, RedisForeignKey))):
+            allowed = False
+        if self.comparable and isinstance(field, RedisForeignKey):
+            allowed = False
+        if not allowed:
+            raise Exception(f'{self.__class__.__name__} can not be used with {field.__class__.__name__} ({self.field_name})')
+    
+    def resolve(self, state, field):
+        return None
+
+
+class Count(RedisAggregate):
+    function = 'count'
+    
+    def resolve(self, state, field):
+        return state['count']
+
+
+class Sum(RedisAggregate):
+    function = 'sum'
+    numeric = True
+    
+    def resolve(self, state, field):
+        value = None
+        if state['count']:
+            if isinstance(field, RedisDecimal):
+                value = state['sum']
+            elif state['places']:
+                value = float(state['sum'])
+            else:
+                value = int(state['sum'])
+        return value
+
+
+class Avg(RedisAggregate):
+    function = 'avg'
+    numeric = True
+    
+    def resolve(self, state, field):
+        value = None
+        if state['count']:
+            if isinstance(field, RedisDecimal):
+                value = state['sum'] / state['count']
+            else:
+                value = float(state['sum']) / state['count']
+        return value
+
+
+class Min(RedisAggregate):
+    function = 'min'
+    comparable = True
+    
+    def resolve(self, state, field):
+        return state['min']
+
+
+class Max(RedisAggregate):
+    function = 'max'
+    comparable = True
+    
+    def resolve(self, state, field):
+        return state['max']
+
+
 ### REDIS ROOT ###
 
 
+# Checks return nil when redis can not tell the python result, the filter
+# script keeps those instances and the aggregate script hands their ids back
+LUA_CHECK_FUNCTION = r'''
+local function is_null(value)
+    return value == nil or value == false or value == cjson.null or value == 'null'
+end
+
+local function is_ascii(value)
+    return string.find(value, '[\128-\255]') == nil
+end
+
+local function check(value, filter_type, filter_by)
+    if filter_type == 'isnull' then
+        return is_null(value) == filter_by
+    end
+    if is_null(value) then
+        return false
+    end
+    if filter_type == 'in' then
+        local checked = false
+        for _, item in ipairs(filter_by) do
+            local item_checked = check(value, 'exact', item)
+            if item_checked then
+                return true
+            elseif item_checked == nil then
+                checked = nil
+            end
+        end
+        return checked
+    end
+    if type(filter_by) == 'number' then
+        local number = tonumber(value)
+        if number == nil then
+            return false
+        elseif math.abs(number) >= 2 ^ 53 or math.abs(filter_by) >= 2 ^ 53 then
+            return nil
+        elseif filter_type == 'exact' then
+            return number == filter_by
+        elseif filter_type == 'gt' then
+            return number > filter_by
+        elseif filter_type == 'gte' then
+            return number >= filter_by
+        elseif filter_type == 'lt' then
+            return number < filter_by
+        elseif filter_type == 'lte' then
+            return number <= filter_by
+        end
+        return true
+    end
+    if type(value) ~= 'string' then
+        return false
+    end
+    if string.sub(filter_type, 1, 1) == 'i' then
+        if not (is_ascii(value) and is_ascii(filter_by)) then
+            return nil
+        end
+        value = string.lower(value)
+        filter_by = string.lower(filter_by)
+        filter_type = string.sub(filter_type, 2)
+    end
+    if filter_type == 'exact' then
+        return value == filter_by
+    elseif filter_type == 'contains' then
+        return string.find(value, filter_by, 1, true) ~= nil
+    elseif filter_type == 'startswith' then
+        return string.sub(value, 1, #filter_by) == filter_by
+    elseif filter_type == 'endswith' then
+        return filter_by == '' or string.sub(value, -#filter_by) == filter_by
+    end
+    return true
+end
+'''
+
+LUA_JSON_MEMBER_FUNCTION = r'''
+local function get_json_member(payload, field_name)
+    local position = string.find(payload, '"' .. field_name .. '": ', 1, true)
+    if position == nil then
+        return false
+    end
+    position = position + #field_name + 4
+    if string.sub(payload, position, position) == '"' then
+        local finish = position + 1
+        while true do
+            finish = string.find(payload, '["\\]', finish)
+            if string.sub(payload, finish, finish) == '"' then
+                break
+            end
+            finish = finish + 2
+        end
+        return cjson.decode(string.sub(payload, position, finish))
+    end
+    local token = string.match(payload, '^[^,}]+', position)
+    if token == 'null' then
+        return false
+    elseif token == 'true' then
+        return 'True'
+    elseif token == 'false' then
+        return 'False'
+    end
+    return token
+end
+'''
+
+LUA_FILTER_SCRIPT = LUA_CHECK_FUNCTION + r'''
+local prefix = ARGV[1]
+local save_type = ARGV[2]
+local predicates = cjson.decode(ARGV[3])
+local ids = {}
+if ARGV[4] == 'range' then
+    ids = redis.call('ZRANGEBYSCORE', KEYS[1], ARGV[5], '+inf', 'LIMIT', 0, tonumber(ARGV[6]))
+else
+    for i = 5, #ARGV do
+        ids[#ids + 1] = ARGV[i]
+    end
+end
+local result = {ids[#ids] or '', #ids}
+for _, instance_id in ipairs(ids) do
+    local key = prefix .. instance_id
+    local fields = nil
+    local payload = nil
+    if save_type == 'hash' then
+        payload = redis.call('HGETALL', key)
+        if #payload > 0 then
+            fields = {}
+            for i = 1, #payload, 2 do
+                fields[payload[i]] = payload[i + 1]
+            end
+        end
+    else
+        payload = redis.call('GET', key)
+        if payload then
+            fields = cjson.decode(payload)
+        end
+    end
+    if fields then
+        local allowed = true
+        for _, predicate in ipairs(predicates) do
+            if check(fields[predicate[1]], predicate[2], predicate[3]) == false then
+                allowed = false
+                break
+            end
+        end
+        if allowed then
+            result[#result + 1] = instance_id
+            result[#result + 1] = payload
+        end
+    end
+end
+return result
+'''
+
+LUA_INDEX_QUERY_SCRIPT = r'''
+local function parse_bound(bound)
+    local exclusive = string.sub(bound, 1, 1) == '('
+    if exclusive then
+        bound = string.sub(bound, 2)
+    end
+    local value
+    if bound == '-inf' then
+        value = -math.huge
+    elseif bound == '+inf' or bound == 'inf' then
+        value = math.huge
+    else
+        value = tonumber(bound)
+    end
+    return value, exclusive
+end
+
+local function in_range(score, scores_range)
+    if not score then
+        return false
+    end
+    score = tonumber(score)
+    if scores_range.min_exclusive then
+        if score <= scores_range.min then
+            return false
+        end
+    elseif score < scores_range.min then
+        return false
+    end
+    if scores_range.max_exclusive then
+        if score >= scores_range.max then
+            return false
+        end
+    elseif score > scores_range.max then
+        return false
+    end
+    return true
+end
+
+local return_ids = ARGV[1] == 'ids'
+local ranges_count = tonumber(ARGV[2])
+local scores_ranges = {}
+for i = 1, ranges_count do
+    local scores_range = {key = KEYS[i], min_bound = ARGV[2 * i + 1], max_bound = ARGV[2 * i + 2]}
+    scores_range.min, scores_range.min_exclusive = parse_bound(scores_range.min_bound)
+    scores_range.max, scores_range.max_exclusive = parse_bound(scores_range.max_bound)
+    scores_ranges[i] = scores_range
+end
+local position = 2 * ranges_count + 3
+local groups_count = tonumber(ARGV[position])
+local members_groups = {}
+local key_position = ranges_count + 1
+for i = 1, groups_count do
+    local members_group = {}
+    for j = 1, tonumber(ARGV[position + i]) do
+        members_group[j] = KEYS[key_position]
+        key_position = key_position + 1
+    end
+    members_groups[i] = members_group
+end
+
+if groups_count == 0 and ranges_count == 1 then
+    if return_ids then
+        return redis.call('ZRANGEBYSCORE', scores_ranges[1].key, scores_ranges[1].min_bound, scores_ranges[1].max_bound)
+    end
+    return redis.call('ZCOUNT', scores_ranges[1].key, scores_ranges[1].min_bound, scores_ranges[1].max_bound)
+end
+if groups_count == 1 and ranges_count == 0 and #members_groups[1] == 1 then
+    if return_ids then
+        return redis.call('SMEMBERS', members_groups[1][1])
+    end
+    return redis.call('SCARD', members_groups[1][1])
+end
+
+local candidates
+local starting_group = nil
+local starting_range = nil
+local smallest_size = nil
+for i, members_group in ipairs(members_groups) do
+    local size = 0
+    for _, key in ipairs(members_group) do
+        size = size + redis.call('SCARD', key)
+    end
+    if smallest_size == nil or size < smallest_size then
+        smallest_size = size
+        starting_group = i
+    end
+end
+if starting_group == nil then
+    for i, scores_range in ipairs(scores_ranges) do
+        local size = redis.call('ZCOUNT', scores_range.key, scores_range.min_bound, scores_range.max_bound)
+        if smallest_size == nil or size < smallest_size then
+            smallest_size = size
+            starting_range = i
+        end
+    end
+end
+if smallest_size == 0 then
+    if return_ids then
+        return {}
+    end
+    return 0
+end
+if starting_group ~= nil then
+    if #members_groups[starting_group] == 1 then
+        candidates = redis.call('SMEMBERS', members_groups[starting_group][1])
+    else
+        candidates = redis.call('SUNION', unpack(members_groups[starting_group]))
+    end
+else
+    local scores_range = scores_ranges[starting_range]
+    candidates = redis.call('ZRANGEBYSCORE', scores_range.key, scores_range.min_bound, scores_range.max_bound)
+end
+
+local matched_ids = {}
+for _, instance_id in ipairs(candidates) do
+    local allowed = true
+    for i, members_group in ipairs(members_groups) do
+        if allowed and i ~= starting_group then
+            local member = false
+            for _, key in ipairs(members_group) do
+                if not member and redis.call('SISMEMBER', key, instance_id) == 1 then
+                    member = true
+                end
+            end
+            allowed = member
+        end
+    end
+    for i, scores_range in ipairs(scores_ranges) do
+        if allowed and i ~= starting_range then
+            allowed = in_range(redis.call('ZSCORE', scores_range.key, instance_id), scores_range)
+        end
+    end
+    if allowed then
+        matched_ids[#matched_ids + 1] = instance_id
+    end
+end
+if return_ids then
+    return matched_ids
+end
+return #matched_ids
+'''
+
+LUA_AGGREGATE_SCRIPT = LUA_CHECK_FUNCTION + LUA_JSON_MEMBER_FUNCTION + r'''
+local function to_raw(value)
+    if value == nil or value == false or value == cjson.null then
+        return nil
+    end
+    if type(value) == 'number' then
+        if value == math.floor(value) and math.abs(value) < 2 ^ 53 then
+            return string.format('%.0f', value)
+        end
+        for _, precision in ipairs({15, 16}) do
+            local raw = string.format('%.' .. precision .. 'g', value)
+            if tonumber(raw) == value then
+                return raw
+            end
+        end
+        return string.format('%.17g', value)
+    end
+    return tostring(value)
+end
+
+-- Sums are scaled integers, added as doubles while they stay exact and
+-- carried over to base 10^7 limbs past 2^53
+local function add_digits(limbs, digits)
+    local position = 1
+    local carry = 0
+    local finish = #digits
+    while finish > 0 or carry > 0 do
+        local start = math.max(finish - 6, 1)
+        local chunk = 0
+        if finish > 0 then
+            chunk = tonumber(string.sub(digits, start, finish))
+        end
+        local total = (limbs[position] or 0) + chunk + carry
+        limbs[position] = total % 10000000
+        carry = math.floor(total / 10000000)
+        position = position + 1
+        finish = start - 1
+    end
+end
+
+local function to_digits(limbs)
+    local parts = {}
+    for position = #limbs, 1, -1 do
+        if position == #limbs then
+            parts[#parts + 1] = string.format('%d', limbs[position])
+        else
+            parts[#parts + 1] = string.format('%07d', limbs[position])
+        end
+    end
+    if #parts == 0 then
+        return '0'
+    end
+    return table.concat(parts)
+end
+
+local function flush_number(state)
+    for _, name in ipairs({'positive', 'negative'}) do
+        if state['small_' .. name] > 0 then
+            add_digits(state[name], string.format('%.0f', state['small_' .. name]))
+            state['small_' .. name] = 0
+        end
+    end
+end
+
+local function add_number(state, raw, number)
+    if #raw <= 15 and not string.find(raw, '[eE]') then
+        local dot = string.find(raw, '.', 1, true)
+        local fraction_length = dot and #raw - dot or 0
+        if fraction_length <= state.scale then
+            local digits = dot and tonumber((string.gsub(raw, '[.-]', ''))) or math.abs(number)
+            local name = number < 0 and 'negative' or 'positive'
+            local small = state['small_' .. name] + digits * 10 ^ (state.scale - fraction_length)
+            if small < 2 ^ 53 then
+                state['small_' .. name] = small
+                return
+            end
+        end
+    end
+    local sign, mantissa, exponent = string.match(raw, '^([+-]?)([%d.]+)[eE]?([+-]?%d*)$')
+    if mantissa == nil then
+        return
+    end
+    local integer, fraction = string.match(mantissa, '^(%d*)%.?(%d*)$')
+    if integer == nil then
+        return
+    end
+    local digits = integer .. fraction
+    local scale = #fraction - (tonumber(exponent) or 0)
+    if scale < 0 then
+        digits = digits .. string.rep('0', -scale)
+        scale = 0
+    end
+    if scale > state.scale then
+        flush_number(state)
+        for _, name in ipairs({'positive', 'negative'}) do
+            local limbs = {}
+            add_digits(limbs, to_digits(state[name]) .. string.rep('0', scale - state.scale))
+            state[name] = limbs
+        end
+        state.scale = scale
+    end
+    digits = digits .. string.rep('0', state.scale - scale)
+    local name = sign == '-' and 'negative' or 'positive'
+    local small = #digits <= 15 and state['small_' .. name] + tonumber(digits)
+    if small and small < 2 ^ 53 then
+        state['small_' .. name] = small
+    else
+        add_digits(state[name], digits)
+    end
+end
+
+-- Doubles tie past 2^53, plain decimal raws are then compared digit by digit
+local function compare_raw(raw, other_raw)
+    local sign, integer, fraction = string.match(raw, '^(-?)(%d+)%.?(%d*)$')
+    local other_sign, other_integer, other_fraction = string.match(other_raw, '^(-?)(%d+)%.?(%d*)$')
+    if integer == nil or other_integer == nil or sign ~= other_sign then
+        return 0
+    end
+    local result = 0
+    if #integer ~= #other_integer then
+        result = #integer > #other_integer and 1 or -1
+    else
+        local width = math.max(#fraction, #other_fraction)
+        local digits = integer .. fraction .. string.rep('0', width - #fraction)
+        local other_digits = other_integer .. other_fraction .. string.rep('0', width - #other_fraction)
+        if digits ~= other_digits then
+            result = digits > other_digits and 1 or -1
+        end
+    end
+    if sign == '-' then
+        result = -result
+    end
+    return result
+end
+
+local prefix = ARGV[1]
+local save_type = ARGV[2]
+local operation = ARGV[3]
+local fields = cjson.decode(ARGV[4])
+local predicates = cjson.decode(ARGV[5])
+local ids = {}
+if ARGV[6] == 'range' then
+    ids = redis.call('ZRANGEBYSCORE', KEYS[1], ARGV[7], '+inf', 'LIMIT', 0, tonumber(ARGV[8]))
+else
+    for i = 7, #ARGV do
+        ids[#ids + 1] = ARGV[i]
+    end
+end
+local field_names = {}
+local states = {}
+for i, field in ipairs(fields) do
+    field_names[i] = field[1]
+    states[i] = {count = 0, positive = {}, negative = {}, small_positive = 0, small_negative = 0, scale = 0, groups = {}}
+end
+local read_names = {}
+local read_positions = {}
+for _, field_name in ipairs(field_names) do
+    read_names[#read_names + 1] = field_name
+    read_positions[field_name] = #read_names
+end
+for _, predicate in ipairs(predicates) do
+    if read_positions[predicate[1]] == nil then
+        read_names[#read_names + 1] = predicate[1]
+        read_positions[predicate[1]] = #read_names
+    end
+end
+local uncertain = {}
+for _, instance_id in ipairs(ids) do
+    local key = prefix .. instance_id
+    local values = nil
+    if save_type == 'hash' then
+        if redis.call('EXISTS', key) == 1 then
+            values = redis.call('HMGET', key, unpack(read_names))
+        end
+    elseif save_type == 'fields' then
+        values = {}
+        for i, field_name in ipairs(read_names) do
+            values[i] = redis.call('GET', key .. ':' .. field_name)
+        end
+    else
+        local payload = redis.call('GET', key)
+        if payload then
+            local instance = cjson.decode(payload)
+            values = {}
+            for i, field_name in ipairs(read_names) do
+                values[i] = instance[field_name]
+            end
+            for i, field in ipairs(fields) do
+                if field[2] == 'number' then
+                    values[i] = get_json_member(payload, field[1])
+                end
+            end
+        end
+    end
+    local allowed = values ~= nil
+    if allowed then
+        for _, predicate in ipairs(predicates) do
+            local checked = check(values[read_positions[predicate[1]]], predicate[2], predicate[3])
+            if checked == false then
+                allowed = false
+                break
+            elseif checked == nil then
+                allowed = nil
+            end
+        end
+        if allowed == nil then
+            uncertain[#uncertain + 1] = instance_id
+        end
+    end
+    if allowed then
+        for i = 1, #fields do
+            local raw = to_raw(values[i])
+            local state = states[i]
+            if operation == 'group' then
+                raw = raw or 'null'
+                state.groups[raw] = (state.groups[raw] or 0) + 1
+            elseif raw ~= nil and raw ~= 'null' then
+                local comparable = raw
+                if fields[i][2] == 'number' then
+                    comparable = tonumber(raw)
+                end
+                if comparable ~= nil then
+                    state.count = state.count + 1
+                    if fields[i][2] == 'number' then
+                        add_number(state, raw, comparable)
+                    end
+                    if state.min == nil or comparable < state.min
+                            or (comparable == state.min and compare_raw(raw, state.min_raw) < 0) then
+                        state.min = comparable
+                        state.min_raw = raw
+                    end
+                    if state.max == nil or comparable > state.max
+                            or (comparable == state.max and compare_raw(raw, state.max_raw) > 0) then
+                        state.max = comparable
+                        state.max_raw = raw
+                    end
+                end
+            end
+        end
+    end
+end
+local result = {ids[#ids] or '', #ids, uncertain}
+for i, state in ipairs(states) do
+    if operation == 'group' then
+        local groups = {}
+        for raw, count in pairs(state.groups) do
+            groups[#groups + 1] = raw
+            groups[#groups + 1] = count
+        end
+        result[#result + 1] = groups
+    else
+        flush_number(state)
+        result[#result + 1] = {
+            state.count,
+            to_digits(state.positive),
+            to_digits(state.negative),
+            state.scale,
+            state.min_raw or false,
+            state.max_raw or false,
+        }
+    end
+end
+return result
+'''
+
+LUA_INDEXES_SCRIPT = LUA_JSON_MEMBER_FUNCTION + r'''
+local save_type = ARGV[1]
+local prefix = ARGV[2]
+local index_prefix = ARGV[3]
+local ids_key = ARGV[4]
+local groups_prefix = ARGV[5]
+local deleting = ARGV[6] == 'delete'
+local rows = cjson.decode(ARGV[7])
+for _, row in ipairs(rows) do
+    local instance_id = row[1]
+    local key = prefix .. instance_id
+    if deleting or redis.call('ZSCORE', ids_key, instance_id) then
+        local payload = false
+        if save_type == 'instances' and #row[2] > 0 then
+            payload = redis.call('GET', key)
+        end
+        for _, field in ipairs(row[2]) do
+            local field_name = field[1]
+            local member = field[2]
+            local old_member = false
+            if save_type == 'hash' then
+                old_member = redis.call('HGET', key, field_name)
+            elseif save_type == 'fields' then
+                old_member = redis.call('GET', key .. ':' .. field_name)
+            elseif payload then
+                old_member = get_json_member(payload, field_name)
+            end
+            if old_member and old_member ~= member then
+                redis.call('SREM', index_prefix .. field_name .. ':' .. old_member, instance_id)
+            end
+            if member ~= cjson.null then
+                redis.call('SADD', index_prefix .. field_name .. ':' .. member, instance_id)
+                redis.call('SADD', groups_prefix .. field_name, member)
+            end
+        end
+        for _, field in ipairs(row[3]) do
+            if field[2] == cjson.null then
+                redis.call('ZREM', index_prefix .. field[1], instance_id)
+            else
+                redis.call('ZADD', index_prefix .. field[1], field[2], instance_id)
+            end
+        end
+    end
+end
+return #rows
+'''
+
+WRITE_BEHIND_ROOTS = weakref.WeakSet()
+
+
+@atexit.register
+def flush_write_behind_roots():
+    for redis_root in list(WRITE_BEHIND_ROOTS):
+        redis_root._flush_write_behind()
+
+
 class RedisRoot:
     
     ### INIT ###
@@ -360,7 +1130,15 @@ class RedisRoot:
         save_consistency=False,
         use_keys=True,
         solo_usage=True,
-        save_type='instances'
+        save_type='instances',
+        ids_block_size=1,
+        nb_backend='asyncio',
+        nb_pool_size=4,
+        nb_max_pending=None,
+        write_behind=False,
+        write_behind_max_size=1000,
+        write_behind_interval=1.0,
+        filter_engine='python'
     ):
         connection_pool = check_callable(connection_pool)
         prefix = check_callable(prefix)
@@ -371,7 +1149,33 @@ class RedisRoot:
         check_types(save_consistency, bool)
         check_types(use_keys, bool)
         check_types(solo_usage, bool)
-        allowed_save_types = ['fields', 'instances']
+        check_types(ids_block_size, int)
+        if ids_block_size < 1:
+            raise Exception(f'ids_block_size must be positive, got {ids_block_size}')
+        allowed_nb_backends = ['asyncio', 'thread']
+        if nb_backend not in allowed_nb_backends:
+            raise Exception(f'Non-blocking backend {nb_backend} is not allowed. Allowed only: {", ".join(allowed_nb_backends)}')
+        check_types(nb_pool_size, int)
+        if nb_pool_size < 1:
+            raise Exception(f'nb_pool_size must be positive, got {nb_pool_size}')
+        if nb_max_pending is None:
+            nb_max_pending = nb_pool_size * 4
+        check_types(nb_max_pending, int)
+        if nb_max_pending < 1:
+            raise Exception(f'nb_max_pending must be positive, got {nb_max_pending}')
+        check_types(write_behind, bool)
+        check_types(write_behind_max_size, int)
+        if write_behind_max_size < 1:
+            raise Exception(f'write_behind_max_size must be positive, got {write_behind_max_size}')
+        check_types(write_behind_interval, (int, float))
+        if write_behind_interval <= 0:
+            raise Exception(f'write_behind_interval must be positive, got {write_behind_interval}')
+        allowed_filter_engines = ['python', 'lua']
+        if filter_engine not in allowed_filter_engines:
+            raise Exception(f'Filter engine {filter_engine} is not allowed. Allowed only: {", ".join(allowed_filter_engines)}')
+        if filter_engine == 'lua' and save_type == 'fields':
+            raise Exception('Filter engine lua is not allowed with save type fields. Allowed only: instances, hash')
+        allowed_save_types = ['fields', 'instances', 'hash']
         if save_type not in allowed_save_types:
             raise Exception(f'Save type {save_type} is not allowed. Allowed only: {", ".join(allowed_save_types)}')
         self.registered_models = []
@@ -387,11 +1191,36 @@ class RedisRoot:
         self.ignore_deserialization_errors = ignore_deserialization_errors
         self.save_consistency = save_consistency
         self.use_keys = use_keys
-        self.creating = {}
         self.solo_usage = solo_usage
         self.max_models_ids = {}
+        self.ids_block_size = ids_block_size
+        self.reserved_ids = {}
+        self.ids_lock = threading.Lock()
         self.save_type = save_type
-        self.set_wait_creating(False)
+        self.models_codecs = {}
+        self.models_encoders = {}
+        self.models_decoders = {}
+        self.nb_backend = nb_backend
+        self.nb_pool_size = nb_pool_size
+        self.nb_executor = None
+        self.nb_semaphore = threading.BoundedSemaphore(nb_max_pending)
+        self.nb_pending = set()
+        self.nb_errors = []
+        self.nb_lock = threading.Lock()
+        self.write_behind = write_behind
+        self.write_behind_max_size = write_behind_max_size
+        self.write_behind_interval = write_behind_interval
+        self.write_behind_buffer = {}
+        self.write_behind_lock = threading.RLock()
+        self.write_behind_thread = None
+        self.write_behind_stop = threading.Event()
+        if self.write_behind:
+            WRITE_BEHIND_ROOTS.add(self)
+        self.filter_engine = filter_engine
+        self.lua_filter_script = None
+        self.index_query_script = None
+        self.aggregate_script = None
+        self.indexes_script = None
     
     @property
     def redis_instance(self):
@@ -429,6 +1258,7 @@ class RedisRoot:
             if issubclass(model, RedisModel):
                 if model not in self.registered_models:
                     self.registered_models.append(model)
+                    self._compile_model_codec(model)
             else:
                 raise Exception(f'{model.__name__} class is not RedisModel')
     
@@ -440,237 +1270,958 @@ class RedisRoot:
         
         return sorted(instances, key=(lambda instance: instance[field_name]), reverse=reverse)
     
-    def get_wait_creating(self):
-        if self.solo_usage:
-            return self.is_creating
-        else:
-            return bool(int(self.redis_instance.get(f'__creating__:{self.prefix}')))
+    def get_and_reserve_new_id(self, model):
+        new_id = self.reserve_ids(model, 1)[0]
+        return new_id
     
-    def set_wait_creating(self, is_creating):
-        if self.solo_usage:
-            self.is_creating = is_creating
-        else:
-            self.redis_instance.set(f'__creating__:{self.prefix}', int(is_creating))
+    def reserve_ids(self, model, count):
+        with self.ids_lock:
+            if self.solo_usage:
+                if model not in self.max_models_ids.keys():
+                    self.max_models_ids[model] = 0
+                max_id = self.max_models_ids[model]
+                ids = range(max_id + 1, max_id + count + 1)
+                self.max_models_ids[model] = max_id + count
+            else:
+                ids = self._pop_reserved_ids(model, count)
+                if len(ids) < count:
+                    block_size = max(count - len(ids), self.ids_block_size)
+                    max_id = self.redis_instance.incrby(f'max_id:{self.prefix}:{model.__name__}', block_size)
+                    ids = self._add_ids_block(model, ids, count, max_id, block_size)
+        return list(ids)
     
-    def wait_creation(self):
-        while self.get_wait_creating():
-            pass
-        self.set_wait_creating(True)
+    def _pop_reserved_ids(self, model, count):
+        reserved_ids = self.reserved_ids.get(model, range(0))
+        self.reserved_ids[model] = reserved_ids[count:]
+        return reserved_ids[:count]
     
-    def get_and_reserve_new_id(self, model):
-        
-        def really_new():
-            new_id = self._get_model_new_id(model)
-            self.creating[model] = [new_id]
-            return new_id
-        
-        self.wait_creation()
-        if model not in self.creating.keys():
-            new_id = really_new()
-        elif not len(self.creating[model]):
-            new_id = really_new()
+    def _add_ids_block(self, model, ids, count, max_id, block_size):
+        # Leftover of the new block is kept, it may replace a concurrent one
+        # of the async root, which only leaves a gap in the ids
+        needed_count = count - len(ids)
+        new_ids = range(max_id - block_size + 1, max_id + 1)
+        self.reserved_ids[model] = new_ids[needed_count:]
+        return [*ids, *new_ids[:needed_count]]
+    
+    ### NON-BLOCKING ###
+    
+    def _run_nb(self, func, *args):
+        if self.nb_backend == 'thread':
+            self.nb_semaphore.acquire()
+            try:
+                pending = self._get_nb_executor().submit(func, *args)
+            except BaseException:
+                self.nb_semaphore.release()
+                raise
         else:
-            new_id = self.creating[model][-1] + 1
-        self.set_wait_creating(False)
-        return new_id
+            pending = asyncio.get_event_loop().create_task(self._run_nb_async(func, *args))
+        with self.nb_lock:
+            self.nb_pending.add(pending)
+        pending.add_done_callback(self._nb_done)
+    
+    async def _run_nb_async(self, func, *args):
+        func(*args)
+    
+    def _get_nb_executor(self):
+        with self.nb_lock:
+            if self.nb_executor is None:
+                self.nb_executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.nb_pool_size,
+                    thread_name_prefix=f'{self.__class__.__name__}:{self.prefix}'
+                )
+            return self.nb_executor
+    
+    def _nb_done(self, pending):
+        with self.nb_lock:
+            self.nb_pending.discard(pending)
+            if not pending.cancelled() and pending.exception() is not None:
+                self.nb_errors.append(pending.exception())
+        if isinstance(pending, concurrent.futures.Future):
+            self.nb_semaphore.release()
+    
+    def flush(self):
+        with self.nb_lock:
+            pending = list(self.nb_pending)
+        threads_pending = [
+            pending_write
+            for pending_write in pending
+            if isinstance(pending_write, concurrent.futures.Future)
+        ]
+        tasks_pending = [
+            pending_write
+            for pending_write in pending
+            if not isinstance(pending_write, concurrent.futures.Future)
+        ]
+        if threads_pending:
+            concurrent.futures.wait(threads_pending)
+        if tasks_pending:
+            loop = asyncio.get_event_loop()
+            if not loop.is_running():
+                loop.run_until_complete(asyncio.wait(tasks_pending))
+        try:
+            self._flush_write_behind()
+        except BaseException as ex:
+            with self.nb_lock:
+                self.nb_errors.append(ex)
+        with self.nb_lock:
+            errors = self.nb_errors
+            self.nb_errors = []
+        if errors:
+            raise Exception(f'{len(errors)} non-blocking writes failed, first error: {errors[0]!r}')
+    
+    def join(self):
+        try:
+            self.flush()
+        finally:
+            with self.nb_lock:
+                nb_executor = self.nb_executor
+                self.nb_executor = None
+            if nb_executor is not None:
+                nb_executor.shutdown(wait=True)
+            with self.write_behind_lock:
+                write_behind_thread = self.write_behind_thread
+                self.write_behind_thread = None
+            if write_behind_thread is not None:
+                self.write_behind_stop.set()
+                write_behind_thread.join()
+    
+    ### WRITE BEHIND ###
+    
+    def _buffer_update(self, model, data_to_update):
+        model_name = model.__name__
+        with self.write_behind_lock:
+            for instance_id, fields_to_update in data_to_update.items():
+                buffered = self.write_behind_buffer.get((model_name, instance_id))
+                if buffered is None:
+                    self.write_behind_buffer[(model_name, instance_id)] = {
+                        'model': model,
+                        'fields': dict(fields_to_update),
+                    }
+                else:
+                    buffered['fields'].update(fields_to_update)
+            buffer_full = len(self.write_behind_buffer) >= self.write_behind_max_size
+            if not buffer_full and self.write_behind_thread is None:
+                self.write_behind_stop.clear()
+                self.write_behind_thread = threading.Thread(
+                    target=self._write_behind_loop,
+                    name=f'{self.__class__.__name__}:{self.prefix}:write_behind',
+                    daemon=True
+                )
+                self.write_behind_thread.start()
+        if buffer_full:
+            self._flush_write_behind()
+    
+    def _write_behind_loop(self):
+        while not self.write_behind_stop.wait(self.write_behind_interval):
+            try:
+                self._flush_write_behind()
+            except BaseException as ex:
+                with self.nb_lock:
+                    self.nb_errors.append(ex)
+    
+    def _flush_write_behind(self):
+        if not self.write_behind_buffer:
+            return
+        with self.write_behind_lock:
+            if self.write_behind_buffer:
+                models_data_to_update = {}
+                for (model_name, instance_id), buffered in self.write_behind_buffer.items():
+                    models_data_to_update.setdefault(buffered['model'], {})[instance_id] = buffered['fields']
+                pipeline = self.redis_instance.pipeline()
+                for model, data_to_update in models_data_to_update.items():
+                    self._queue_update(pipeline, model, data_to_update)
+                pipeline.execute()
+                self.write_behind_buffer = {}
     
-    def remove_creating(self, model, instance_id):
-        self.wait_creation()
-        self.creating[model] = list(
-            filter(lambda some_instance_id: some_instance_id != instance_id, self.creating[model].copy()))
-        self.set_wait_creating(False)
+    def _apply_write_behind(self, model_name, raw_instances):
+        if self.write_behind_buffer:
+            with self.write_behind_lock:
+                for instance_id in raw_instances.keys():
+                    buffered = self.write_behind_buffer.get((model_name, instance_id))
+                    if buffered is not None:
+                        raw_instances[instance_id] = {**raw_instances[instance_id], **buffered['fields']}
+        return raw_instances
     
     ### GET ###
     
-    def get(self, model, return_dict=False, **filters):
-        instances = self._get_model_instances(model, filters)
+    def get(self, model, return_dict=False, depth=None, lazy=False, only=None, **filters):
+        identity_map = RedisIdentityMap(self) if lazy else None
+        field_names = self._get_loaded_field_names(model, only, [filters])
+        instances = self._get_model_instances(model, filters, depth, identity_map, field_names)
+        if only is not None:
+            instances = self._project_instances(instances, only)
         result = self._return_with_format(instances, return_dict)
         return result
     
-    def _get_model_instances(self, model, filters):
+    def values_list(self, model, *field_names, flat=False, depth=None, **filters):
+        if flat and len(field_names) != 1:
+            raise Exception(f'flat=True needs exactly one field name, got {len(field_names)}')
+        instances = self.get(model, return_dict=True, depth=depth, only=list(field_names), **filters)
+        rows = [
+            tuple(
+                instance_id if field_name == 'id' else instance_fields.get(field_name)
+                for field_name in field_names
+            )
+            for instance_id, instance_fields in instances.items()
+        ]
+        if flat:
+            rows = [row[0] for row in rows]
+        return rows
+    
+    def _get_model_instances(self, model, filters, depth=None, identity_map=None, field_names=None):
         instances = {}
         if self.save_type == 'fields':
-            instances = self._get_stored_type_fields_model_instances(model, filters)
-        elif self.save_type == 'instances':
-            instances = self._get_stored_type_instances_model_instances(model, filters)
+            instances = self._get_stored_type_fields_model_instances(model, filters, field_names)
+        elif self.save_type in ['instances', 'hash']:
+            instances = self._get_stored_type_instances_model_instances(model, filters, field_names)
+        if not self._relations_needed_for_filtering(model, [filters]):
+            instances = self._load_relations(model, instances, depth, identity_map)
         if self.save_consistency:
-            instances = self._check_fields_existence(model, instances)
+            instances = self._check_fields_existence(model, instances, field_names)
         return instances
     
-    def _get_stored_type_fields_model_instances(self, model, filters):
+    def _get_loaded_field_names(self, model, only, filters_list):
+        # Requested fields plus the ones filters need, None loads everything
+        if only is None:
+            return None
+        fields = model._get_fields()
+        field_names = ['id']
+        for field_name in only:
+            if field_name not in fields.keys():
+                raise Exception(f'{model.__name__} has no field {field_name}')
+            if field_name not in field_names:
+                field_names.append(field_name)
+        for filters in filters_list:
+            for filter_param in filters.keys():
+                fields_to_filter, filter_type = self._split_filtering(filter_param)
+                if fields_to_filter[0] in fields.keys() and fields_to_filter[0] not in field_names:
+                    field_names.append(fields_to_filter[0])
+        return field_names
+    
+    def _project_instances(self, instances, only):
+        projected_instances = {
+            instance_id: {
+                field_name: instance_fields[field_name]
+                for field_name in only
+                if field_name in instance_fields.keys()
+            }
+            for instance_id, instance_fields in instances.items()
+        }
+        return projected_instances
+    
+    def query(self, model):
+        return RedisQuerySet(self, model)
+    
+    def batch(self, transaction=True):
+        return RedisBatch(self, transaction)
+    
+    def iterate(self, model, batch_size=1000, depth=None, lazy=False, **filters):
+        filters_list = [filters] if filters else []
+        ids_batches = self._get_query_ids_batches(model, filters_list, [], batch_size)
+        identity_map = RedisIdentityMap(self) if lazy else None
+        for instance_id, instance_fields in self._iterate_instances(
+            model, ids_batches, filters_list, depth=depth, identity_map=identity_map
+        ):
+            yield {
+                'id': instance_id,
+                **instance_fields
+            }
+    
+    def _get_query_ids_batches(self, model, filters_list, excludes_list, batch_size, reverse=False):
+        ids = self._get_query_ids(model, filters_list, excludes_list)
+        if ids is None:
+            ids_batches = self._iterate_model_ids(model.__name__, batch_size, reverse)
+        else:
+            if reverse:
+                ids = ids[::-1]
+            ids_batches = (
+                ids[batch_start:batch_start + batch_size]
+                for batch_start in range(0, len(ids), batch_size)
+            )
+        return ids_batches
+    
+    def _get_ordered_query_ids_batches(self, model, filters_list, excludes_list, field_name, batch_size, reverse=False):
+        index_key = self._get_index_key(model.__name__, field_name)
+        ids = self._get_query_ids(model, filters_list, excludes_list)
+        if ids is None:
+            return self._iterate_index_ids(model, field_name, batch_size, reverse)
+        pipeline = self.redis_instance.pipeline(transaction=False)
+        for instance_id in ids:
+            pipeline.zscore(index_key, instance_id)
+        scores = pipeline.execute() if ids else []
+        ordered_ids = self._sort_scored_ids(model, field_name, [
+            (instance_id, score)
+            for instance_id, score in zip(ids, scores)
+            if score is not None
+        ], reverse)
+        ids_batches = (
+            ordered_ids[batch_start:batch_start + batch_size]
+            for batch_start in range(0, len(ordered_ids), batch_size)
+        )
+        return ids_batches
+    
+    def _slice_ids_batches(self, ids_batches, offset, stop, batch_size):
+        ids = itertools.islice(itertools.chain.from_iterable(ids_batches), offset, stop)
+        while True:
+            batch_ids = list(itertools.islice(ids, batch_size))
+            if not batch_ids:
+                break
+            yield batch_ids
+    
+    def _get_query_ids(self, model, filters_list, excludes_list):
+        ids = None
+        for filters in filters_list:
+            if self.save_type == 'fields':
+                filtered_ids = self._get_fields_filtered_ids(model, filters)
+            else:
+                filtered_ids = self._get_index_filtered_ids(model, filters)
+            if filtered_ids is not None:
+                ids = filtered_ids if ids is None else sorted(set(ids) & set(filtered_ids))
+        if self.save_type == 'fields' and excludes_list:
+            if ids is None:
+                ids = self._get_model_ids(model.__name__)
+            excluded_ids = set()
+            for excludes in excludes_list:
+                excluded_ids |= set(self._get_fields_filtered_ids(model, excludes))
+            ids = [instance_id for instance_id in ids if instance_id not in excluded_ids]
+        return ids
+    
+    def _iterate_instances(self, model, ids_batches, filters_list=(), excludes_list=(), depth=None, identity_map=None, field_names=None):
+        relations_needed = self._relations_needed_for_filtering(model, [*filters_list, *excludes_list])
+        compiled_filters_list = [self._compile_filters(filters) for filters in filters_list]
+        compiled_excludes_list = [self._compile_filters(excludes) for excludes in excludes_list]
+        for batch_ids in ids_batches:
+            if self.save_type == 'fields':
+                instances = self._get_instances_data_by_ids(model, batch_ids, field_names)
+            else:
+                instances = self._get_filtered_instances(model, batch_ids, filters_list, field_names)
+                if relations_needed:
+                    instances = self._resolve_relations(model, instances)
+                instances = {
+                    instance_id: instance_fields
+                    for instance_id, instance_fields in instances.items()
+                    if all(self._instance_allowed(instance_fields, filters) for filters in compiled_filters_list)
+                    and not any(self._instance_allowed(instance_fields, excludes) for excludes in compiled_excludes_list)
+                }
+            if not relations_needed:
+                instances = self._load_relations(model, instances, depth, identity_map)
+            if self.save_consistency:
+                instances = self._check_fields_existence(model, instances, field_names)
+            for instance_id in batch_ids:
+                if instance_id in instances.keys():
+                    yield instance_id, instances[instance_id]
+    
+    def _instance_allowed(self, instance_fields, compiled_filters):
+        for field_name, predicates in compiled_filters.items():
+            if field_name in instance_fields.keys():
+                field_value = instance_fields[field_name]
+                for predicate in predicates:
+                    if not predicate(field_value):
+                        return False
+        return True
+    
+    def _get_stored_type_fields_model_instances(self, model, filters, field_names=None):
         if not filters:
-            instances = self._get_instances_data_by_ids(model)
+            instances = self._get_instances_data_by_ids(model, field_names=field_names)
         else:
-            # print()
-            # print(filters)
-            cleaned_filters = self._clean_filters(model, filters)
-            # print(cleaned_filters)
-            cleaned_filters_with_filtered_ids = self._get_cleaned_filters_with_filtered_ids(cleaned_filters)
-            # print(cleaned_filters_with_filtered_ids)
-            starting_model_filtered_ids = self._get_starting_model_filtered_ids(cleaned_filters_with_filtered_ids)
-            # print(starting_model_filtered_ids)
-            instances = self._get_instances_data_by_ids(model, starting_model_filtered_ids)
+            starting_model_filtered_ids = self._get_fields_filtered_ids(model, filters)
+            instances = self._get_instances_data_by_ids(model, starting_model_filtered_ids, field_names)
         return instances
     
-    def _get_instances_data_by_ids(self, model, ids=None):
+    def _get_fields_filtered_ids(self, model, filters):
+        self._flush_write_behind()
+        # print()
+        # print(filters)
+        index_filtered_ids = self._get_index_filtered_ids(model, filters)
+        cleaned_filters = self._clean_filters(model, filters)
+        # print(cleaned_filters)
+        cleaned_filters_with_filtered_ids = self._get_cleaned_filters_with_filtered_ids(
+            cleaned_filters,
+            index_filtered_ids
+        )
+        # print(cleaned_filters_with_filtered_ids)
+        starting_model_filtered_ids = self._get_starting_model_filtered_ids(
+            cleaned_filters_with_filtered_ids,
+            index_filtered_ids
+        )
+        # print(starting_model_filtered_ids)
+        return starting_model_filtered_ids
+    
+    def _get_instances_data_by_ids(self, model, ids=None, field_names=None):
         model_name = model.__name__
-        instances_data = {}
         if ids is None:
-            raw_instances_data = self.fast_get_keys_values(f'{self.prefix}:{model_name}:*')
-            for raw_instance_key, raw_instance_value in raw_instances_data.items():
-                instance_id = int(raw_instance_key.split(':')[-2])
-                instance_field_name = raw_instance_key.split(':')[-1]
+            ids = self._get_model_ids(model_name)
+        if field_names is None:
+            field_names = list(model._get_fields().keys())
+        keys = [
+            f'{self.prefix}:{model_name}:{instance_id}:{field_name}'
+            for instance_id in ids
+            for field_name in field_names
+        ]
+        values = self.redis_instance.mget(keys) if keys else []
+        instances_data = {}
+        for key, value in zip(keys, values):
+            if value is not None:
+                prefix, model_name, instance_id, field_name = key.split(':')
+                instance_id = int(instance_id)
                 if instance_id not in instances_data.keys():
                     instances_data[instance_id] = {}
-                instances_data[instance_id][instance_field_name] = raw_instance_value
-        else:
-            for instance_id in ids:
-                raw_fields_data = self.fast_get_keys_values(f'{self.prefix}:{model_name}:{instance_id}:*')
-                for field_key, field_value in raw_fields_data.items():
-                    if instance_id not in instances_data.keys():
-                        instances_data[instance_id] = {}
-                    instances_data[instance_id][field_key.split(':')[-1]] = field_value
+                instances_data[instance_id][field_name] = value
+        instances_data = self._apply_write_behind(model_name, instances_data)
+        decoders = self._get_model_decoders(model)
         instances_data = {
             instance_id: {
-                field_name: self._deserialize_instance_field(model, field_name, field_value)
+                field_name: decoders[field_name](field_value)
                 for field_name, field_value in raw_instance_fields.items()
+                if field_name in field_names
             }
             for instance_id, raw_instance_fields in instances_data.copy().items()
         }
         return instances_data
     
-    def _get_model_new_id(self, model):
-        if self.solo_usage:
-            if model not in self.max_models_ids.keys():
-                self.max_models_ids[model] = 0
-            max_id = self.max_models_ids[model]
-            new_id = max_id + 1
-            self.max_models_ids[model] = new_id
-        else:
-            stored_max_id = self.redis_instance.get(f'max_id:{self.prefix}:{model.__name__}')
-            max_id = 0
-            if stored_max_id:
-                max_id = int(stored_max_id)
-            new_id = max_id + 1
-            self.redis_instance.set(f'max_id:{self.prefix}:{model.__name__}', new_id)
-        return new_id
-    
-    def _get_stored_type_instances_model_instances(self, model, filters):
-        instances_with_allowed = self._get_stored_json_instance_with_allowed(model, filters)
-        instances = self._get_instances_from_instances_with_allowed(instances_with_allowed)
+    def _get_stored_type_instances_model_instances(self, model, filters, field_names=None):
+        instances = self._get_filtered_instances(model, self._get_index_filtered_ids(model, filters), [filters], field_names)
+        if self._relations_needed_for_filtering(model, [filters]):
+            instances = self._resolve_relations(model, instances)
+        compiled_filters = self._compile_filters(filters)
+        instances = {
+            instance_id: instance_fields
+            for instance_id, instance_fields in instances.items()
+            if self._instance_allowed(instance_fields, compiled_filters)
+        }
         return instances
     
-    def _get_stored_json_instance_with_allowed(self, model, filters):
-        model_name = model.__name__
-        instances = self._get_instances_by_key(f'{self.prefix}:{model_name}:*')
-        instances_with_allowed = {}
-        for instance_id, instance_fields in instances.items():
-            for field_name, field_value in instance_fields.items():
-                allowed = self._filter_field_name(field_name, field_value, filters)
-                if instance_id not in instances_with_allowed.keys():
-                    instances_with_allowed[instance_id] = {}
-                instances_with_allowed[instance_id][field_name] = {
-                    'value': field_value,
-                    'allowed': allowed
-                }
-        return instances_with_allowed
-    
-    def _get_instances_from_instances_with_allowed(self, instances_with_allowed):
-        instances = {}
-        for instance_id, instance_fields in instances_with_allowed.items():
-            instance_allowed = all([
-                instance_field_data['allowed']
-                for instance_field_data in instance_fields.values()
-            ])
-            if instance_allowed and instance_id not in instances.keys():
-                instances[instance_id] = {
-                    instance_field_name: instance_field_data['value']
-                    for instance_field_name, instance_field_data in instance_fields.items()
-                }
+    def _get_filtered_instances(self, model, ids, filters_list, field_names=None):
+        predicates = []
+        if self.filter_engine == 'lua':
+            predicates = self._compile_lua_filters(model, filters_list)
+        if predicates:
+            raw_instances = self._get_lua_filtered_raw_instances(model.__name__, ids, predicates)
+            instances = self._decode_raw_instances(model, raw_instances, field_names)
+        else:
+            instances = self._get_instances_by_ids(model, ids, field_names)
         return instances
     
-    def _get_instances_by_key(self, key):
-        raw_instances = self.fast_get_keys_values(key)
+    def _get_instances_by_ids(self, model, ids=None, field_names=None):
+        raw_instances = self._get_raw_instances_by_ids(model.__name__, ids, field_names)
+        return self._decode_raw_instances(model, raw_instances, field_names)
+    
+    def _decode_raw_instances(self, model, raw_instances, field_names=None):
+        decoders = self._get_model_decoders(model)
         instances = {}
-        for instance_key, fields_json in raw_instances.items():
-            prefix, model_name, instance_id = instance_key.split(':')
-            model = self._get_registered_model_by_name(model_name)
-            instance_id = int(instance_id)
-            fields_dict = json.loads(fields_json)
-            for field_name, raw_value in fields_dict.items():
-                value = self._deserialize_instance_field(model, field_name, raw_value)
-                if instance_id not in instances.keys():
-                    instances[instance_id] = {}
-                instances[instance_id][field_name] = value
+        for instance_id, fields_dict in raw_instances.items():
+            instances[instance_id] = {
+                field_name: (
+                    decoders[field_name](raw_value)
+                    if field_name in decoders.keys()
+                    else self._deserialize_instance_field(model, field_name, raw_value)
+                )
+                for field_name, raw_value in fields_dict.items()
+                if field_names is None or field_name in field_names
+            }
         return instances
     
-    def _check_fields_existence(self, model, instances):
-        checked_instances = {}
-        fields = model.get_class_fields()
-        if 'id' not in fields.keys():
-            fields['id'] = RedisString(null=True)
-        for instance_id, instance_fields in instances.items():
-            checked_instances[instance_id] = {}
-            for field_name, field in fields.items():
-                if field_name in instance_fields.keys():
-                    checked_instances[instance_id][field_name] = instance_fields[field_name]
+    def _get_raw_instances_by_ids(self, model_name, ids=None, field_names=None):
+        if ids is None:
+            ids = self._get_model_ids(model_name)
+        keys = [
+            f'{self.prefix}:{model_name}:{instance_id}'
+            for instance_id in ids
+        ]
+        if self.save_type == 'hash':
+            pipeline = self.redis_instance.pipeline(transaction=False)
+            for key in keys:
+                if field_names is None:
+                    pipeline.hgetall(key)
                 else:
-                    checked_instances[instance_id][field_name] = None
+                    pipeline.hmget(key, field_names)
+            values = pipeline.execute() if keys else []
+            if field_names is not None:
+                values = [
+                    {
+                        field_name: value
+                        for field_name, value in zip(field_names, hash_values)
+                        if value is not None
+                    }
+                    for hash_values in values
+                ]
+        else:
+            values = self.redis_instance.mget(keys) if keys else []
+        return self._apply_write_behind(model_name, self._parse_raw_instances(ids, values))
+    
+    def _parse_raw_instances(self, ids, values):
+        if self.save_type == 'hash':
+            raw_instances = {
+                instance_id: fields_dict
+                for instance_id, fields_dict in zip(ids, values)
+                if fields_dict
+            }
+        else:
+            raw_instances = {
+                instance_id: json.loads(fields_json)
+                for instance_id, fields_json in zip(ids, values)
+                if fields_json is not None
+            }
+        return raw_instances
+    
+    def _check_fields_existence(self, model, instances, field_names=None):
+        field_names = list(model._get_fields().keys()) if field_names is None else list(field_names)
+        if 'id' not in field_names:
+            field_names.append('id')
+        checked_instances = {
+            instance_id: {
+                field_name: instance_fields.get(field_name)
+                for field_name in field_names
+            }
+            for instance_id, instance_fields in instances.items()
+        }
         return checked_instances
     
-    ### COUNT ###
+    ### RELATIONS ###
     
-    def count(self, model, **filters):
-        count = 0
-        if not filters:
-            raw_instances_data = []
-            if self.save_type == 'fields':
-                raw_instances_data = self.fast_get_keys(f'{self.prefix}:{model.__name__}:*:id')
-            elif self.save_type == 'instances':
-                raw_instances_data = self.fast_get_keys(f'{self.prefix}:{model.__name__}:*')
-            count = len(raw_instances_data)
+    def _load_relations(self, model, instances, depth=None, identity_map=None):
+        if identity_map is not None:
+            instances = self._make_relations_lazy(model, instances, identity_map)
         else:
-            if self.save_type == 'fields':
-                cleaned_filters = self._clean_filters(model, filters)
-                cleaned_filters_with_filtered_ids = self._get_cleaned_filters_with_filtered_ids(cleaned_filters)
-                starting_model_filtered_ids = self._get_starting_model_filtered_ids(cleaned_filters_with_filtered_ids)
-                count = len(starting_model_filtered_ids)
-            elif self.save_type == 'instances':
-                model_name = model.__name__
-                instances = self._get_instances_by_key(f'{self.prefix}:{model_name}:*')
-                instances_with_allowed = {}
-                for instance_id, instance_fields in instances.items():
-                    all_fields_allowed = [True, *[
-                        self._filter_field_name(field_name, field_value, filters)
-                        for field_name, field_value in instance_fields.items()
-                    ]]
-                    if all(all_fields_allowed):
-                        count += 1
-        return count
+            instances = self._resolve_relations(model, instances, depth)
+        return instances
     
-    ### DESERIALIZE ###
+    def _make_relations_lazy(self, model, instances, identity_map):
+        relations = self._get_relation_fields(model)
+        for instance_fields in instances.values():
+            for field_name, field in relations.items():
+                value = instance_fields.get(field_name)
+                if isinstance(value, dict) and 'id' in value.keys():
+                    instance_fields[field_name] = identity_map.get_instance(field.model, value['id'])
+                elif isinstance(value, list):
+                    instance_fields[field_name] = [
+                        identity_map.get_instance(field.model, instance_id)
+                        for instance_id in sorted(set(self._get_relation_ids(value)))
+                    ]
+        return instances
     
-    def _deserialize_instance_field(self, model, field_name, raw_value):
-        value = raw_value
-        saved_field_instance = self._get_field_instance_by_name(model, field_name)
-        if issubclass(saved_field_instance.__class__, RedisField):
-            value = self._deserialize_value_by_field_instance(saved_field_instance, raw_value)
-        return value
+    def _get_relation_fields(self, model):
+        relations = {
+            field_name: field
+            for field_name, field in model._get_fields().items()
+            if isinstance(field, (RedisForeignKey, RedisManyToMany))
+        }
+        return relations
     
-    def _get_registered_model_by_name(self, model_name):
-        found = False
-        model = None
-        for registered_model in self.registered_models:
-            if registered_model.__name__ == model_name and not found:
-                found = True
-                model = registered_model
-        if not found:
-            if self.ignore_deserialization_errors:
-                print(f'{datetime.datetime.now()} - {model_name} not found in registered models, ignoring')
-                model = model_name
-            else:
-                raise Exception(f'{model_name} not found in registered models')
-        return model
+    def _resolve_relations(self, model, instances, depth=None, resolved=None):
+        if depth == 0 or not instances:
+            return instances
+        relations = self._get_relation_fields(model)
+        if not relations:
+            return instances
+        if resolved is None:
+            resolved = {}
+        next_depth = None if depth is None else depth - 1
+        for related_model, ids in self._collect_related_ids(instances, relations).items():
+            related_instances = resolved.setdefault((related_model, next_depth), {})
+            ids_to_fetch = sorted(ids - related_instances.keys())
+            if ids_to_fetch:
+                fetched_instances = self._get_related_instances_by_ids(related_model, ids_to_fetch)
+                related_instances.update(fetched_instances)
+                self._resolve_relations(related_model, fetched_instances, next_depth, resolved)
+        return self._stitch_relations(instances, relations, resolved, next_depth)
+    
+    def _collect_related_ids(self, instances, relations):
+        related_ids = {}
+        for instance_fields in instances.values():
+            for field_name, field in relations.items():
+                related_ids.setdefault(field.model, set()).update(
+                    self._get_relation_ids(instance_fields.get(field_name))
+                )
+        return related_ids
+    
+    def _stitch_relations(self, instances, relations, resolved, next_depth):
+        for instance_fields in instances.values():
+            for field_name, field in relations.items():
+                value = instance_fields.get(field_name)
+                related_instances = resolved.get((field.model, next_depth), {})
+                if isinstance(value, dict) and 'id' in value.keys():
+                    instance_fields[field_name] = related_instances.get(value['id'], {'id': value['id']})
+                elif isinstance(value, list):
+                    instance_fields[field_name] = [
+                        related_instances[instance_id]
+                        for instance_id in sorted(set(self._get_relation_ids(value)))
+                        if instance_id in related_instances.keys()
+                    ]
+        return instances
+    
+    def _get_relation_ids(self, value):
+        if isinstance(value, dict) and 'id' in value.keys():
+            return [value['id']]
+        elif isinstance(value, list):
+            return [
+                related_value['id']
+                for related_value in value
+                if isinstance(related_value, dict) and 'id' in related_value.keys()
+            ]
+        return []
+    
+    def _get_related_instances_by_ids(self, model, ids):
+        if self.save_type == 'fields':
+            instances = self._get_instances_data_by_ids(model, ids)
+        else:
+            instances = self._get_instances_by_ids(model, ids)
+        if self.save_consistency:
+            instances = self._check_fields_existence(model, instances)
+        return instances
+    
+    def _relations_needed_for_filtering(self, model, filters_list):
+        if self.save_type == 'fields':
+            return False
+        class_fields = model._get_fields()
+        for filters in filters_list:
+            for filter_param in filters.keys():
+                fields_to_filter, filter_type = self._split_filtering(filter_param)
+                if isinstance(class_fields.get(fields_to_filter[0]), (RedisForeignKey, RedisManyToMany)):
+                    return True
+        return False
+    
+    ### LUA FILTERS ###
+    
+    def _get_lua_filter_script(self):
+        if self.lua_filter_script is None:
+            self.lua_filter_script = self.redis_instance.register_script(LUA_FILTER_SCRIPT)
+        return self.lua_filter_script
+    
+    def _compile_lua_filters(self, model, filters_list):
+        class_fields = model._get_fields()
+        predicates = []
+        for filters in filters_list:
+            for filter_param, filter_by in filters.items():
+                fields_to_filter, filter_type = self._split_filtering(filter_param)
+                if len(fields_to_filter) == 1 and fields_to_filter[0] in class_fields.keys():
+                    predicate = self._compile_lua_filter(
+                        fields_to_filter[0],
+                        class_fields[fields_to_filter[0]],
+                        filter_type,
+                        filter_by
+                    )
+                    if predicate is not None:
+                        predicates.append(predicate)
+        return predicates
+    
+    def _compile_lua_filter(self, field_name, field, filter_type, filter_by):
+        if type(field) == RedisString:
+            allowed_filter_types = ['exact', 'iexact', 'contains', 'icontains', 'startswith', 'istartswith',
+                                    'endswith', 'iendswith', 'in', 'isnull']
+            allowed_types = (str,)
+        elif type(field) in [RedisNumber, RedisId]:
+            allowed_filter_types = ['exact', 'in', 'gt', 'gte', 'lt', 'lte', 'isnull']
+            allowed_types = (int, float)
+        else:
+            return None
+        if filter_type not in allowed_filter_types:
+            return None
+        if filter_type == 'isnull':
+            if not isinstance(filter_by, bool):
+                return None
+            filter_values = []
+        elif filter_type == 'in':
+            if not isinstance(filter_by, (list, tuple, set)):
+                return None
+            filter_values = filter_by = list(filter_by)
+        else:
+            filter_values = [filter_by]
+        for filter_value in filter_values:
+            if isinstance(filter_value, bool) or not isinstance(filter_value, allowed_types):
+                return None
+        return [field_name, filter_type, filter_by]
+    
+    def _get_lua_filtered_raw_instances(self, model_name, ids, predicates, batch_size=1000):
+        self._flush_write_behind()
+        lua_filter_script = self._get_lua_filter_script()
+        keys = [self._get_ids_index_key(model_name)]
+        args = [f'{self.prefix}:{model_name}:', self.save_type, json.dumps(predicates)]
+        matched_ids = []
+        values = []
+        if ids is None:
+            bound = '-inf'
+            while True:
+                result = lua_filter_script(keys=keys, args=[*args, 'range', bound, batch_size])
+                self._collect_lua_filter_result(result, matched_ids, values)
+                if result[1] < batch_size:
+                    break
+                bound = f'({result[0]}'
+        else:
+            for batch_start in range(0, len(ids), batch_size):
+                batch_ids = ids[batch_start:batch_start + batch_size]
+                result = lua_filter_script(keys=keys, args=[*args, 'ids', *batch_ids])
+                self._collect_lua_filter_result(result, matched_ids, values)
+        return self._apply_write_behind(model_name, self._parse_raw_instances(matched_ids, values))
+    
+    def _collect_lua_filter_result(self, result, matched_ids, values):
+        for position in range(2, len(result), 2):
+            matched_ids.append(int(result[position]))
+            value = result[position + 1]
+            if self.save_type == 'hash':
+                value = dict(zip(value[::2], value[1::2]))
+            values.append(value)
+    
+    ### COUNT ###
+    
+    def count(self, model, **filters):
+        count = 0
+        if not filters:
+            count = self.redis_instance.zcard(self._get_ids_index_key(model.__name__))
+        else:
+            count = self._get_index_count(model, [filters])
+        if count is None:
+            if self.save_type == 'fields':
+                count = len(self._get_fields_filtered_ids(model, filters))
+            elif self.save_type in ['instances', 'hash']:
+                count = len(self._get_stored_type_instances_model_instances(
+                    model, filters, self._get_loaded_field_names(model, [], [filters])
+                ))
+        return count
+    
+    ### AGGREGATES ###
+    
+    def aggregate(self, model, *aggregates, **filters):
+        fields = model._get_fields()
+        for aggregate in aggregates:
+            check_types(aggregate, RedisAggregate)
+            if aggregate.field_name not in fields.keys():
+                raise Exception(f'{model.__name__} has no field {aggregate.field_name}')
+            aggregate.check_field(fields[aggregate.field_name])
+        self._flush_write_behind()
+        field_names = list(dict.fromkeys(aggregate.field_name for aggregate in aggregates))
+        states = {}
+        if not filters:
+            summed_field_names = [aggregate.field_name for aggregate in aggregates if aggregate.numeric]
+            for field_name in field_names:
+                if field_name not in summed_field_names and self._can_order_by_index(model, field_name):
+                    states[field_name] = self._get_index_aggregate_state(model, field_name)
+        field_names = [field_name for field_name in field_names if field_name not in states.keys()]
+        if field_names:
+            ids, predicates, script_filters = self._get_aggregate_plan(model, filters)
+            for field_name in field_names:
+                states[field_name] = self._get_aggregate_state([])
+            uncertain_ids = []
+            for results, batch_uncertain_ids in self._iterate_lua_aggregate_results(model, field_names, 'aggregate', ids, predicates):
+                uncertain_ids.extend(batch_uncertain_ids)
+                for field_name, result in zip(field_names, results):
+                    self._merge_aggregate_state(states[field_name], self._parse_aggregate_result(model, field_name, result))
+            for instance in self._get_uncertain_aggregate_instances(model, uncertain_ids, script_filters):
+                for field_name in field_names:
+                    self._merge_aggregate_state(states[field_name], self._get_aggregate_state([instance.get(field_name)]))
+        result = {
+            aggregate.get_name(): aggregate.resolve(states[aggregate.field_name], fields[aggregate.field_name])
+            for aggregate in aggregates
+        }
+        return result
+    
+    def group_count(self, model, field_name, **filters):
+        field = model._get_fields().get(field_name)
+        if field is None:
+            raise Exception(f'{model.__name__} has no field {field_name}')
+        if isinstance(field, RedisJson):
+            raise Exception(f'group_count can not be used with {field.__class__.__name__} ({field_name})')
+        self._flush_write_behind()
+        groups = None
+        if not filters and field.index and field.index_type == 'exact':
+            groups = self._get_index_groups(model, field_name)
+        if groups is None:
+            groups = {}
+            ids, predicates, script_filters = self._get_aggregate_plan(model, filters)
+            uncertain_ids = []
+            for results, batch_uncertain_ids in self._iterate_lua_aggregate_results(model, [field_name], 'group', ids, predicates):
+                uncertain_ids.extend(batch_uncertain_ids)
+                raw_groups = results[0]
+                for raw, count in zip(raw_groups[::2], raw_groups[1::2]):
+                    group_key = self._get_group_key(self._decode_aggregate_raw(model, field_name, raw))
+                    groups[group_key] = groups.get(group_key, 0) + count
+            for instance in self._get_uncertain_aggregate_instances(model, uncertain_ids, script_filters):
+                group_key = self._get_group_key(instance.get(field_name))
+                groups[group_key] = groups.get(group_key, 0) + 1
+        return groups
+    
+    def _get_aggregate_plan(self, model, filters):
+        # Filters the indexes can not answer are checked by the aggregate
+        # script, so the instances never leave redis
+        ids = None
+        script_filters = {}
+        if filters:
+            if self.save_type == 'fields':
+                ids = self._get_fields_filtered_ids(model, filters)
+            else:
+                index_filters = {}
+                for filter_param, filter_by in filters.items():
+                    if self._get_index_query_plan(model, [{filter_param: filter_by}]) is not None:
+                        index_filters[filter_param] = filter_by
+                    elif self._compile_lua_filters(model, [{filter_param: filter_by}]):
+                        script_filters[filter_param] = filter_by
+                    else:
+                        raise Exception(
+                            f'{filter_param} can not be used to aggregate {model.__name__}, '
+                            f'only indexed fields and lua engine filters are allowed'
+                        )
+                if index_filters:
+                    ids = self._get_index_query_ids(model, [index_filters])
+        return ids, self._compile_lua_filters(model, [script_filters]), script_filters
+    
+    def _get_uncertain_aggregate_instances(self, model, ids, script_filters):
+        instances = []
+        if ids:
+            compiled_filters = self._compile_filters(script_filters)
+            instances = [
+                instance_fields
+                for instance_fields in self._get_instances_by_ids(model, sorted(map(int, ids))).values()
+                if self._instance_allowed(instance_fields, compiled_filters)
+            ]
+        return instances
+    
+    def _get_aggregate_script(self):
+        if self.aggregate_script is None:
+            self.aggregate_script = self.redis_instance.register_script(LUA_AGGREGATE_SCRIPT)
+        return self.aggregate_script
+    
+    def _iterate_lua_aggregate_results(self, model, field_names, operation, ids=None, predicates=None, batch_size=1000):
+        model_name = model.__name__
+        fields = model._get_fields()
+        aggregate_script = self._get_aggregate_script()
+        keys = [self._get_ids_index_key(model_name)]
+        args = [f'{self.prefix}:{model_name}:', self.save_type, operation, json.dumps([
+            [field_name, 'number' if isinstance(fields[field_name], (RedisNumber, RedisDecimal)) else 'string']
+            for field_name in field_names
+        ]), json.dumps(predicates or [])]
+        if ids is None:
+            bound = '-inf'
+            while True:
+                result = aggregate_script(keys=keys, args=[*args, 'range', bound, batch_size])
+                yield result[3:], result[2]
+                if result[1] < batch_size:
+                    break
+                bound = f'({result[0]}'
+        else:
+            for batch_start in range(0, len(ids), batch_size):
+                batch_ids = ids[batch_start:batch_start + batch_size]
+                result = aggregate_script(keys=keys, args=[*args, 'ids', *batch_ids])
+                yield result[3:], result[2]
+    
+    def _get_index_aggregate_state(self, model, field_name):
+        # Sorted set ends give min and max, only their values are read. Scores
+        # are floats, so every member sharing an end score is compared
+        index_key = self._get_index_key(model.__name__, field_name)
+        pipeline = self.redis_instance.pipeline(transaction=False)
+        pipeline.zrange(index_key, 0, 0, withscores=True)
+        pipeline.zrange(index_key, -1, -1, withscores=True)
+        pipeline.zcard(index_key)
+        first_members, last_members, count = pipeline.execute()
+        pipeline = self.redis_instance.pipeline(transaction=False)
+        for instance_id, score in [*first_members, *last_members]:
+            pipeline.zrangebyscore(index_key, score, score)
+        state = self._get_aggregate_state([])
+        ids = sorted({int(instance_id) for end_ids in pipeline.execute() for instance_id in end_ids})
+        for results, uncertain_ids in self._iterate_lua_aggregate_results(model, [field_name], 'aggregate', ids):
+            self._merge_aggregate_state(state, self._parse_aggregate_result(model, field_name, results[0]))
+        state['count'] = count
+        state['sum'] = None
+        return state
+    
+    def _get_index_groups(self, model, field_name):
+        # Members are listed in the groups set kept next to the index, rows
+        # indexed before it existed make the counts disagree and fall back to a scan
+        model_name = model.__name__
+        members = sorted(self.redis_instance.smembers(self._get_index_groups_key(model_name, field_name)))
+        pipeline = self.redis_instance.pipeline(transaction=False)
+        for member in members:
+            pipeline.scard(self._get_index_member_key(model_name, field_name, member))
+        pipeline.zcard(self._get_ids_index_key(model_name))
+        *counts, ids_count = pipeline.execute()
+        groups = None
+        if sum(counts) == ids_count:
+            groups = {}
+            for raw, count in zip(members, counts):
+                if count:
+                    group_key = self._get_group_key(self._decode_aggregate_raw(model, field_name, raw))
+                    groups[group_key] = groups.get(group_key, 0) + count
+        return groups
+    
+    def _get_aggregate_state(self, values):
+        state = {'count': 0, 'sum': decimal.Decimal(0), 'places': 0, 'min': None, 'max': None}
+        for value in values:
+            if value not in ['null', None]:
+                state['count'] += 1
+                if isinstance(value, (int, float, decimal.Decimal)) and not isinstance(value, bool):
+                    number = decimal.Decimal(f'{value}')
+                    state['sum'] = AGGREGATE_DECIMAL_CONTEXT.add(state['sum'], number)
+                    state['places'] = max(state['places'], -number.as_tuple().exponent)
+                try:
+                    if state['min'] is None or value < state['min']:
+                        state['min'] = value
+                    if state['max'] is None or value > state['max']:
+                        state['max'] = value
+                except TypeError:
+                    pass
+        return state
+    
+    def _parse_aggregate_result(self, model, field_name, result):
+        count, raw_positive_sum, raw_negative_sum, scale, raw_min, raw_max = result
+        aggregate_sum = decimal.Decimal(f'{int(raw_positive_sum) - int(raw_negative_sum)}e-{scale}')
+        state = {
+            'count': count,
+            'sum': aggregate_sum,
+            'places': max(-aggregate_sum.as_tuple().exponent, 0),
+            'min': self._decode_aggregate_raw(model, field_name, raw_min),
+            'max': self._decode_aggregate_raw(model, field_name, raw_max),
+        }
+        return state
+    
+    def _merge_aggregate_state(self, state, other_state):
+        state['count'] += other_state['count']
+        state['sum'] = AGGREGATE_DECIMAL_CONTEXT.add(state['sum'], other_state['sum'])
+        state['places'] = max(state['places'], other_state['places'])
+        if other_state['min'] is not None and (state['min'] is None or other_state['min'] < state['min']):
+            state['min'] = other_state['min']
+        if other_state['max'] is not None and (state['max'] is None or other_state['max'] > state['max']):
+            state['max'] = other_state['max']
+        return state
+    
+    def _decode_aggregate_raw(self, model, field_name, raw):
+        value = None
+        if raw not in ['null', None]:
+            value = self._deserialize_instance_field(model, field_name, raw)
+        return value
+    
+    def _get_group_key(self, value):
+        if isinstance(value, dict) and 'id' in value.keys():
+            value = value['id']
+        elif value == 'null':
+            value = None
+        return value
+    
+    ### DESERIALIZE ###
+    
+    def _deserialize_instance_field(self, model, field_name, raw_value):
+        if isinstance(model, type) and issubclass(model, RedisModel):
+            decode = self._get_model_decoders(model).get(field_name)
+            if decode is not None:
+                return decode(raw_value)
+        value = raw_value
+        saved_field_instance = self._get_field_instance_by_name(model, field_name)
+        if issubclass(saved_field_instance.__class__, RedisField):
+            value = self._deserialize_value_by_field_instance(saved_field_instance, raw_value)
+        return value
+    
+    def _get_registered_model_by_name(self, model_name):
+        found = False
+        model = None
+        for registered_model in self.registered_models:
+            if registered_model.__name__ == model_name and not found:
+                found = True
+                model = registered_model
+        if not found:
+            if self.ignore_deserialization_errors:
+                print(f'{datetime.datetime.now()} - {model_name} not found in registered models, ignoring')
+                model = model_name
+            else:
+                raise Exception(f'{model_name} not found in registered models')
+        return model
     
     def _get_field_instance_by_name(self, model, field_name):
         try:
@@ -696,6 +2247,64 @@ class RedisRoot:
                 raise Exception(f'{raw_value} can not be deserialized like {field_instance.__class__.__name__}')
         return value
     
+    ### CODECS ###
+    
+    def _compile_model_codec(self, model):
+        codec = tuple(
+            (field_name, self._get_field_encoder(field), self._get_field_decoder(field))
+            for field_name, field in model._get_fields().items()
+        )
+        self.models_codecs[model] = codec
+        self.models_encoders[model] = {field_name: encode for field_name, encode, decode in codec}
+        self.models_decoders[model] = {field_name: decode for field_name, encode, decode in codec}
+        return codec
+    
+    def _get_model_codec(self, model):
+        if model not in self.models_codecs.keys():
+            self._compile_model_codec(model)
+        return self.models_codecs[model]
+    
+    def _get_model_encoders(self, model):
+        if model not in self.models_encoders.keys():
+            self._compile_model_codec(model)
+        return self.models_encoders[model]
+    
+    def _get_model_decoders(self, model):
+        if model not in self.models_decoders.keys():
+            self._compile_model_codec(model)
+        return self.models_decoders[model]
+    
+    def _get_field_encoder(self, field):
+        if type(field).clean is RedisField.clean:
+            return field.encode
+        
+        def encode(value):
+            field_instance = deepcopy(field)
+            field_instance.value = value
+            return field_instance.clean()
+        
+        return encode
+    
+    def _get_field_decoder(self, field):
+        if type(field).deserialize_value is RedisField.deserialize_value:
+            deserialize_value = field.decode
+        else:
+            deserialize_value = field.deserialize_value
+        
+        def decode(raw_value):
+            try:
+                value = deserialize_value(raw_value, self)
+            except BaseException as ex:
+                if self.ignore_deserialization_errors:
+                    print(
+                        f'{datetime.datetime.now()} - {raw_value} can not be deserialized like {field.__class__.__name__}, ignoring')
+                    value = raw_value
+                else:
+                    raise Exception(f'{raw_value} can not be deserialized like {field.__class__.__name__}')
+            return value
+        
+        return decode
+    
     ### FILTER ###
     
     def _clean_filters(self, starting_model, filters):
@@ -705,7 +2314,7 @@ class RedisRoot:
             filtering_models = [starting_model]
             filtering_field_names = []
             for field_to_filter_name in field_to_filter_names:
-                filtering_model_fields = filtering_models[-1].get_class_fields()
+                filtering_model_fields = filtering_models[-1]._get_fields()
                 field = filtering_model_fields[field_to_filter_name]
                 if field.__class__ in [RedisForeignKey, RedisManyToMany]:
                     filtering_field_names.append(field_to_filter_name)
@@ -748,25 +2357,25 @@ class RedisRoot:
             fields_to_filter = [filter_field_name]
         return fields_to_filter, filter_type
     
-    def _get_cleaned_filters_with_filtered_ids(self, cleaned_filters):
+    def _get_cleaned_filters_with_filtered_ids(self, cleaned_filters, starting_ids=None):
         cleaned_filters_with_filtered_ids = {}
         for relations_data, filter_data in cleaned_filters.items():
             filtered_ids = []
-            filtering_model_name = json.loads(relations_data)['model_names'][-1]
+            real_relations_data = json.loads(relations_data)
+            filtering_model_name = real_relations_data['model_names'][-1]
+            ids = None if real_relations_data['field_names'] else starting_ids
             for field_name, filters in filter_data.items():
-                stored_data = self.fast_get_keys_values(
-                    f'{self.prefix}:{filtering_model_name}:*:{field_name}'
-                )
+                stored_data = self._get_field_values(filtering_model_name, field_name, ids)
                 model = self._get_registered_model_by_name(filtering_model_name)
                 field_filtered_ids = []
-                for instance_key, instance_value in stored_data.items():
+                checks = [
+                    self._compile_filter_value(filter_type, filter_by)
+                    for filter_type, filter_by in filters.items()
+                ]
+                for instance_id, instance_value in stored_data.items():
                     value = self._deserialize_instance_field(model, field_name, instance_value)
-                    allowed = (
-                        self._filter_value(value, filter_type, filter_by)
-                        for filter_type, filter_by in filters.items()
-                    )
-                    if all(allowed):
-                        field_filtered_ids.append(int(instance_key.split(':')[-2]))
+                    if all(check(value) for check in checks):
+                        field_filtered_ids.append(instance_id)
                 filtered_ids.append(field_filtered_ids)
             if filtered_ids:
                 filtered_ids = list(reduce(
@@ -777,58 +2386,102 @@ class RedisRoot:
         
         return cleaned_filters_with_filtered_ids
     
-    def _filter_value(self, value, filter_type, filter_by):
-        allowed = True
+    def _compile_filters(self, filters):
+        compiled_filters = {}
+        for filter_param, filter_by in filters.items():
+            fields_to_filter, filter_type = self._split_filtering(filter_param)
+            if fields_to_filter[0] not in compiled_filters.keys():
+                compiled_filters[fields_to_filter[0]] = []
+            compiled_filters[fields_to_filter[0]].append(
+                self._compile_filter(fields_to_filter[1:], filter_type, filter_by)
+            )
+        return compiled_filters
+    
+    def _compile_filter(self, fields_to_filter, filter_type, filter_by):
+        check = self._compile_filter_value(filter_type, filter_by)
+        filter_by_is_datetime = isinstance(filter_by, datetime.datetime)
+        
+        def predicate(value):
+            for field_to_filter in fields_to_filter:
+                if value in ['null', None]:
+                    value = None
+                else:
+                    try:
+                        value = value[field_to_filter]
+                    except BaseException as ex:
+                        print(f'Exception: {ex}\n'
+                              f'Info: {field_to_filter}, {value}\n'
+                              f'Maybe: deep filtering is not included on this model')
+                        value = None
+            if filter_by_is_datetime and isinstance(value, datetime.datetime):
+                value = value.replace(tzinfo=pytz.UTC)
+            try:
+                allowed = check(value)
+            except:
+                allowed = False
+            return allowed
+        
+        return predicate
+    
+    def _compile_filter_value(self, filter_type, filter_by):
         if isinstance(filter_by, datetime.datetime):
             filter_by = filter_by.replace(tzinfo=pytz.UTC)
+        filter_by_lower = filter_by.lower() if isinstance(filter_by, str) else filter_by
         if filter_type == 'exact':
-            if value != filter_by:
-                allowed = False
+            return lambda value: value == filter_by
         elif filter_type == 'iexact':
-            if value.lower() != filter_by.lower():
-                allowed = False
+            return lambda value: value.lower() == filter_by_lower
         elif filter_type == 'contains':
-            if filter_by not in value:
-                allowed = False
+            return lambda value: filter_by in value
         elif filter_type == 'icontains':
-            if filter_by.lower() not in value.lower():
-                allowed = False
+            return lambda value: filter_by_lower in value.lower()
         elif filter_type == 'in':
-            if value not in filter_by:
-                allowed = False
+            return self._compile_filter_in(filter_by)
         elif filter_type == 'gt':
-            if value <= filter_by:
-                allowed = False
+            return lambda value: value > filter_by
         elif filter_type == 'gte':
-            if value < filter_by:
-                allowed = False
+            return lambda value: value >= filter_by
         elif filter_type == 'lt':
-            if value >= filter_by:
-                allowed = False
+            return lambda value: value < filter_by
         elif filter_type == 'lte':
-            if value > filter_by:
-                allowed = False
+            return lambda value: value <= filter_by
         elif filter_type == 'startswith':
-            if not value.startswith(filter_by):
-                allowed = False
+            return lambda value: value.startswith(filter_by)
         elif filter_type == 'istartswith':
-            if not value.lower().startswith(filter_by.lower()):
-                allowed = False
+            return lambda value: value.lower().startswith(filter_by_lower)
         elif filter_type == 'endswith':
-            if not value.endswith(filter_by):
-                allowed = False
+            return lambda value: value.endswith(filter_by)
         elif filter_type == 'iendswith':
-            if not value.lower().endswith(filter_by.lower()):
-                allowed = False
+            return lambda value: value.lower().endswith(filter_by_lower)
         elif filter_type == 'range':
-            if value not in range(filter_by):
-                allowed = False
+            try:
+                filter_range = range(filter_by)
+            except TypeError:
+                return lambda value: value in range(filter_by)
+            return lambda value: value in filter_range
         elif filter_type == 'isnull':
-            if (value in ['null', None]) != filter_by:
-                allowed = False
-        return allowed
+            return lambda value: (value in ['null', None]) == filter_by
+        return lambda value: True
     
-    def _get_starting_model_filtered_ids(self, cleaned_filters_with_filtered_ids):
+    def _compile_filter_in(self, filter_by):
+        filter_by_set = None
+        if isinstance(filter_by, (list, tuple, set, frozenset)):
+            try:
+                filter_by_set = frozenset(filter_by)
+            except TypeError:
+                pass
+        if filter_by_set is None:
+            return lambda value: value in filter_by
+        
+        def check(value):
+            try:
+                return value in filter_by_set
+            except TypeError:
+                return value in filter_by
+        
+        return check
+    
+    def _get_starting_model_filtered_ids(self, cleaned_filters_with_filtered_ids, starting_ids=None):
         starting_filtered_ids = []
         for relations_data, filtered_ids in cleaned_filters_with_filtered_ids.items():
             allowed_ids = filtered_ids.copy()
@@ -836,11 +2489,12 @@ class RedisRoot:
             while real_relations_data['field_names']:
                 field_name = real_relations_data['field_names'].pop(-1)
                 model_name = real_relations_data['model_names'].pop(-1)
-                all_stored_model_fields = self.fast_get_keys_values(f'{self.prefix}:{model_name}:*:{field_name}')
+                ids = None if real_relations_data['model_names'] else starting_ids
+                all_stored_model_fields = self._get_field_values(model_name, field_name, ids)
                 allowed_ids = [
-                    int(instance_key.split(':')[-2])
-                    for instance_key, instance_value in all_stored_model_fields.items()
-                    if int(instance_value) in allowed_ids
+                    instance_id
+                    for instance_id, instance_value in all_stored_model_fields.items()
+                    if instance_value != 'null' and int(instance_value) in allowed_ids
                 ]
             starting_filtered_ids.append(allowed_ids)
         if starting_filtered_ids:
@@ -850,130 +2504,125 @@ class RedisRoot:
             )))
         return starting_filtered_ids
     
-    def _filter_field_name(self, field_name, value, raw_filters):
-        allowed_list = [True]
-        for filter_param in raw_filters.keys():
-            filter_by = raw_filters[filter_param]
-            fields_to_filter, filter_type = self._split_filtering(filter_param)
-            if field_name == fields_to_filter[0]:
-                fields_to_filter = fields_to_filter[1:]
-                allowed_list.append(self._filter(value, fields_to_filter, filter_type, filter_by))
-        allowed = all(allowed_list)
-        return allowed
-    
-    def _filter(self, value, fields_to_filter, filter_type, filter_by):
-        for field_to_filter in fields_to_filter:
-            if value in ['null', None]:
-                value = None
-            else:
-                try:
-                    value = value[field_to_filter]
-                except BaseException as ex:
-                    print(f'Exception: {ex}\n'
-                          f'Info: {field_to_filter}, {value}\n'
-                          f'Maybe: deep filtering is not included on this model')
-                    value = None
-        if isinstance(value, datetime.datetime) and isinstance(filter_by, datetime.datetime):
-            value = value.replace(tzinfo=pytz.UTC)
-            filter_by = filter_by.replace(tzinfo=pytz.UTC)
-        try:
-            allowed = self._filter_value(value, filter_type, filter_by)
-        except:
-            allowed = False
-        return allowed
-    
     ### UPDATE ###
     
     def update(self, model, instances=None, return_dict=False, **fields_to_update):
         updated_instances, data_to_update = self._collect_update(model, instances, fields_to_update)
-        self._confirm_update(data_to_update)
+        self._confirm_update(model, data_to_update)
         result = self._return_with_format(updated_instances, return_dict)
         return result
     
     def update_nb(self, model, instances=None, return_dict=False, **fields_to_update):
         updated_instances, data_to_update = self._collect_update(model, instances, fields_to_update)
-        asyncio.get_event_loop().create_task(
-            self._confirm_update_async(data_to_update)
-        )
+        self._run_nb(self._confirm_update, model, data_to_update)
+        result = self._return_with_format(updated_instances, return_dict)
+        return result
+    
+    def bulk_update(self, model, instances_data, return_dict=False):
+        updated_instances, data_to_update = self._collect_bulk_update(model, instances_data)
+        self._confirm_update(model, data_to_update)
         result = self._return_with_format(updated_instances, return_dict)
         return result
     
     def _collect_update(self, model, instances, fields_to_update):
-        model_name = model.__name__
         if instances is not None:
             ids_to_update = get_ids_from_untyped_data(instances)
         else:
-            ids_to_update = None
-        if ids_to_update is not None:
-            updated_instances = self.get(model, return_dict=True, id__in=ids_to_update)
+            ids_to_update = self._get_model_ids(model.__name__)
+        return self._collect_rows_update(model, self._get_rows_to_update(model, ids_to_update, fields_to_update))
+    
+    def _collect_bulk_update(self, model, instances_data):
+        return self._collect_rows_update(model, self._get_bulk_rows_to_update(model, instances_data))
+    
+    def _get_rows_to_update(self, model, ids_to_update, fields_to_update):
+        cleaned_fields_to_update = self._clean_fields_to_update(model, fields_to_update)
+        rows_to_update = {
+            instance_id: (fields_to_update, cleaned_fields_to_update)
+            for instance_id in ids_to_update
+        }
+        return rows_to_update
+    
+    def _get_bulk_rows_to_update(self, model, instances_data):
+        rows_to_update = {}
+        for instance_data in instances_data:
+            if 'id' not in instance_data.keys():
+                raise Exception(f"{instance_data} has no key 'id', please provide dicts like " + "{'id': 1, ...}")
+            fields_to_update = {
+                field_name: value
+                for field_name, value in instance_data.items()
+                if field_name != 'id'
+            }
+            cleaned_fields_to_update = self._clean_fields_to_update(model, fields_to_update)
+            rows_to_update[instance_data['id']] = (fields_to_update, cleaned_fields_to_update)
+        return rows_to_update
+    
+    def _clean_fields_to_update(self, model, fields_to_update):
+        encoders = self._get_model_encoders(model)
+        cleaned_fields_to_update = {}
+        for field_name, value in fields_to_update.items():
+            if field_name in encoders.keys():
+                cleaned_fields_to_update[field_name] = encoders[field_name](value)
+            else:
+                saved_field_instance = self._get_field_instance_by_name(model, field_name)
+                saved_field_instance.value = value
+                cleaned_fields_to_update[field_name] = saved_field_instance.clean()
+        return cleaned_fields_to_update
+    
+    def _collect_rows_update(self, model, rows_to_update):
+        ids_to_update = list(rows_to_update.keys())
+        if self.save_type == 'fields':
+            loaded_data = self._resolve_relations(model, self._get_instances_data_by_ids(model, ids_to_update))
+        elif self.save_type == 'instances':
+            loaded_data = self._get_raw_instances_by_ids(model.__name__, ids_to_update)
         else:
-            updated_instances = self.get(model, return_dict=True)
-
+            loaded_data = self._resolve_relations(model, self._get_instances_by_ids(model, ids_to_update))
+        return self._build_rows_update(rows_to_update, loaded_data)
+    
+    def _build_rows_update(self, rows_to_update, loaded_data):
+        updated_instances = {}
         collected_data_to_update = {}
-        if self.save_type == 'fields':
-            for field_to_update_name, field_to_update_value in fields_to_update.items():
-                saved_field_instance = self._get_field_instance_by_name(model, field_to_update_name)
-                saved_field_instance.value = field_to_update_value
-                saved_field_instance.clean()
-                cleaned_field_to_update_value = saved_field_instance.value
-                updated_instances = {
-                    updated_instance_id: {**updated_instance_data, field_to_update_name: field_to_update_value}
-                    for updated_instance_id, updated_instance_data in updated_instances.items()
-                }
-                keys_to_update = self.collect_keys(model_name, ids_to_update, field_to_update_name)
-                update_mapping = {
-                    key: cleaned_field_to_update_value
-                    for key in keys_to_update
-                }
-                collected_data_to_update = {
-                    **collected_data_to_update,
-                    **update_mapping
-                }
+        if self.save_type in ['fields', 'hash']:
+            for instance_id, instance_data in loaded_data.items():
+                fields_to_update, cleaned_fields_to_update = rows_to_update[instance_id]
+                updated_instances[instance_id] = {**instance_data, **fields_to_update}
+                if cleaned_fields_to_update:
+                    collected_data_to_update[instance_id] = cleaned_fields_to_update
         elif self.save_type == 'instances':
-            instance_keys_to_update = self._get_instance_keys_to_update(instances, model_name)
-            for instance_key in instance_keys_to_update:
-                prefix, model_name, instance_id = instance_key.split(':')
-                instance_id = int(instance_id)
-                fields_to_write = self._update_serialize_fields(instance_key, model, fields_to_update)
-                collected_data_to_update[instance_key] = fields_to_write
+            for instance_id, instance_data in loaded_data.items():
+                fields_to_update, cleaned_fields_to_update = rows_to_update[instance_id]
+                fields_to_write = {
+                    field_name: cleaned_fields_to_update.get(field_name, field_data)
+                    for field_name, field_data in instance_data.items()
+                }
+                collected_data_to_update[instance_id] = fields_to_write
                 updated_instances[instance_id] = fields_to_write
         return updated_instances, collected_data_to_update
-
-    def _get_instance_keys_to_update(self, instances, model_name):
-        keys_to_update = []
-        if instances is None:
-            keys_to_update += list(self.fast_get_keys(f'{self.prefix}:{model_name}:*'))
-        else:
-            ids_to_update = get_ids_from_untyped_data(instances)
-            for instance_id in ids_to_update:
-                keys_to_update += list(self.fast_get_keys(f'{self.prefix}:{model_name}:{instance_id}'))
-        return keys_to_update
-
-    def _update_serialize_fields(self, instance_key, model, fields_to_update):
-        instance_data_json = self.redis_instance.get(instance_key)
-        instance_data = json.loads(instance_data_json)
-        serialized_data = {}
-        for field_name, field_data in instance_data.items():
-            saved_field_instance = self._get_field_instance_by_name(model, field_name)
-            if field_name in fields_to_update.keys():
-                saved_field_instance.value = fields_to_update[field_name]
-                cleaned_value = saved_field_instance.clean()
-            else:
-                cleaned_value = field_data
-            serialized_data[field_name] = cleaned_value
-        return serialized_data
     
-    def _confirm_update(self, data_to_update):
+    def _confirm_update(self, model, data_to_update):
         if data_to_update.keys():
-            if self.save_type == 'fields':
-                self.redis_instance.mset(data_to_update)
-            elif self.save_type == 'instances':
-                for instance_key, fields_to_update in data_to_update.items():
-                    fields_to_write_json = json.dumps(fields_to_update)
-                    self.redis_instance.set(instance_key, fields_to_write_json)
+            if self.write_behind:
+                return self._buffer_update(model, data_to_update)
+            pipeline = self.redis_instance.pipeline()
+            self._queue_update(pipeline, model, data_to_update)
+            pipeline.execute()
     
-    async def _confirm_update_async(self, data_to_update):
-        self._confirm_update(data_to_update)
+    def _queue_update(self, pipeline, model, data_to_update):
+        model_name = model.__name__
+        self._queue_update_indexes(pipeline, model, data_to_update)
+        if self.save_type == 'fields':
+            pipeline.mset({
+                f'{self.prefix}:{model_name}:{instance_id}:{field_name}': field_value
+                for instance_id, fields_to_update in data_to_update.items()
+                for field_name, field_value in fields_to_update.items()
+            })
+        elif self.save_type == 'instances':
+            pipeline.mset({
+                f'{self.prefix}:{model_name}:{instance_id}': json.dumps(fields_to_update)
+                for instance_id, fields_to_update in data_to_update.items()
+            })
+        elif self.save_type == 'hash':
+            for instance_id, fields_to_update in data_to_update.items():
+                pipeline.hset(f'{self.prefix}:{model_name}:{instance_id}', mapping=fields_to_update)
     
     
     
@@ -1064,37 +2713,34 @@ class RedisRoot:
     ### DELETE ###
     
     def delete(self, model, instances=None):
-        model_name = model.__name__
-        self._confirm_delete(model_name, instances)
+        self._confirm_delete(model, instances)
     
     def delete_nb(self, model, instances=None):
-        model_name = model.__name__
-        asyncio.get_event_loop().create_task(
-            self._confirm_delete_async(model_name, instances)
-        )
+        self._run_nb(self._confirm_delete, model, instances)
     
-    def _confirm_delete(self, model_name, instances):
+    def _confirm_delete(self, model, instances):
+        self._flush_write_behind()
+        model_name = model.__name__
+        if instances is None:
+            ids_to_delete = self._get_model_ids(model_name)
+        else:
+            ids_to_delete = get_ids_from_untyped_data(instances)
         if self.save_type == 'fields':
-            ids_to_delete = None
-            if instances is not None:
-                ids_to_delete = get_ids_from_untyped_data(instances)
-            keys_to_delete = self.collect_keys(model_name, ids_to_delete)
-            if keys_to_delete:
-                self.redis_instance.delete(*keys_to_delete)
-        elif self.save_type == 'instances':
-            if instances is None:
-                delete_keys = self.fast_get_keys(f'{self.prefix}:{model_name}:*')
-                if delete_keys:
-                    self.redis_instance.delete(*delete_keys)
-            else:
-                ids_to_delete = get_ids_from_untyped_data(instances)
-                for instance_id in ids_to_delete:
-                    delete_keys = self.fast_get_keys(f'{self.prefix}:{model_name}:{instance_id}')
-                    if delete_keys:
-                        self.redis_instance.delete(*delete_keys)
-        
-    async def _confirm_delete_async(self, model_name, instances):
-        self._confirm_delete(model_name, instances)
+            keys_to_delete = self.collect_keys(model, ids_to_delete)
+        else:
+            keys_to_delete = [
+                f'{self.prefix}:{model_name}:{instance_id}'
+                for instance_id in ids_to_delete
+            ]
+        if keys_to_delete:
+            pipeline = self.redis_instance.pipeline()
+            self._queue_delete(pipeline, model, ids_to_delete, keys_to_delete)
+            pipeline.execute()
+    
+    def _queue_delete(self, pipeline, model, ids_to_delete, keys_to_delete):
+        self._queue_delete_indexes(pipeline, model, ids_to_delete)
+        pipeline.delete(*keys_to_delete)
+        pipeline.zrem(self._get_ids_index_key(model.__name__), *ids_to_delete)
     
     
     ### CREATE ###
@@ -1109,8 +2755,52 @@ class RedisRoot:
         redis_instance = model(redis_root=self, **params).save_nb()
         return redis_instance
     
+    def bulk_create(self, model, params_list, batch_size=1000):
+        params_list = list(params_list)
+        ids = self.reserve_ids(model, len(params_list))
+        self.register_models([model])
+        created_instances = []
+        for batch_start in range(0, len(params_list), batch_size):
+            batch_end = batch_start + batch_size
+            pipeline = self.redis_instance.pipeline()
+            for instance_id, params in zip(ids[batch_start:batch_end], params_list[batch_start:batch_end]):
+                fields_dict, deserialized_fields = self._encode_instance(model, instance_id, params)
+                self._write_instance(pipeline, model, instance_id, fields_dict)
+                created_instances.append(deserialized_fields)
+            pipeline.execute()
+        self._resolve_relations(model, dict(zip(ids, created_instances)))
+        return created_instances
+    
+    def _encode_instance(self, model, instance_id, params):
+        fields_dict = {}
+        deserialized_fields = {}
+        for field_name, encode, decode in self._get_model_codec(model):
+            value = instance_id if field_name == 'id' else params.get(field_name)
+            try:
+                fields_dict[field_name] = encode(value)
+            except BaseException as ex:
+                raise Exception(f'{ex} ({model.__name__} -> {field_name})')
+            deserialized_fields[field_name] = decode(fields_dict[field_name])
+        return fields_dict, deserialized_fields
+    
+    def _write_instance(self, pipeline, model, instance_id, fields_dict):
+        model_name = model.__name__
+        instance_key = f'{self.prefix}:{model_name}:{instance_id}'
+        if self.save_type == 'fields':
+            pipeline.mset({
+                f'{instance_key}:{field_name}': field_value
+                for field_name, field_value in fields_dict.items()
+            })
+        elif self.save_type == 'instances':
+            fields_data = json.dumps(fields_dict)
+            pipeline.set(instance_key, fields_data)
+        elif self.save_type == 'hash':
+            pipeline.hset(instance_key, mapping=fields_dict)
+        pipeline.zadd(self._get_ids_index_key(model_name), {instance_id: instance_id})
+        self._write_indexes(pipeline, model, instance_id, fields_dict)
+    
     def _get_allowed_model_params(self, model, params):
-        model_attrs = model.get_class_fields()
+        model_attrs = model._get_fields()
         allowed_params = {
             param_name: params[param_name]
             for param_name in params.keys()
@@ -1146,17 +2836,1261 @@ class RedisRoot:
             keys = list(self.redis_instance.scan_iter(string))
         return keys
     
-    def collect_keys(self, model_name, ids=None, field_name=None):
-        collected_keys = []
-        field_name_query_string = '*' if field_name is None else field_name
+    def collect_keys(self, model, ids=None, field_name=None):
+        model_name = model.__name__
+        field_names = list(model._get_fields().keys()) if field_name is None else [field_name]
         if ids is None:
-            query_string = f'{self.prefix}:{model_name}:*:{field_name_query_string}'
-            collected_keys = list(self.fast_get_keys(query_string))
+            ids = self._get_model_ids(model_name)
         else:
-            for id in ids:
-                query_string = f'{self.prefix}:{model_name}:{id}:{field_name_query_string}'
-                collected_keys += list(self.fast_get_keys(query_string))
+            ids = self._get_existing_ids(model_name, ids)
+        collected_keys = [
+            f'{self.prefix}:{model_name}:{id}:{field_name}'
+            for id in ids
+            for field_name in field_names
+        ]
         return collected_keys
+    
+    ### IDS INDEX ###
+    
+    def _get_ids_index_key(self, model_name):
+        return f'ids:{self.prefix}:{model_name}'
+    
+    def _get_model_ids(self, model_name):
+        ids = self.redis_instance.zrange(self._get_ids_index_key(model_name), 0, -1)
+        return [int(instance_id) for instance_id in ids]
+    
+    def _iterate_model_ids(self, model_name, batch_size=1000, reverse=False):
+        ids_index_key = self._get_ids_index_key(model_name)
+        bound = '+inf' if reverse else '-inf'
+        while True:
+            if reverse:
+                ids = self.redis_instance.zrevrangebyscore(ids_index_key, bound, '-inf', start=0, num=batch_size)
+            else:
+                ids = self.redis_instance.zrangebyscore(ids_index_key, bound, '+inf', start=0, num=batch_size)
+            ids = [int(instance_id) for instance_id in ids]
+            if ids:
+                yield ids
+            if len(ids) < batch_size:
+                break
+            bound = f'({ids[-1]}'
+    
+    def _iterate_index_ids(self, model, field_name, batch_size=1000, reverse=False):
+        index_key = self._get_index_key(model.__name__, field_name)
+        bound = '+inf' if reverse else '-inf'
+        while True:
+            if reverse:
+                scored_ids = self.redis_instance.zrevrangebyscore(
+                    index_key, bound, '-inf', start=0, num=batch_size, withscores=True
+                )
+            else:
+                scored_ids = self.redis_instance.zrangebyscore(
+                    index_key, bound, '+inf', start=0, num=batch_size, withscores=True
+                )
+            if not scored_ids:
+                break
+            last_score = scored_ids[-1][1]
+            batch_full = len(scored_ids) == batch_size
+            if batch_full:
+                scored_ids = [
+                    *[scored_id for scored_id in scored_ids if scored_id[1] != last_score],
+                    *[
+                        (instance_id, last_score)
+                        for instance_id in self.redis_instance.zrangebyscore(index_key, last_score, last_score)
+                    ]
+                ]
+            yield self._sort_scored_ids(model, field_name, scored_ids, reverse)
+            if not batch_full:
+                break
+            bound = f'({last_score!r}'
+    
+    def _sort_scored_ids(self, model, field_name, scored_ids, reverse=False):
+        # Scores are floats, so ties that may hide different values are
+        # ordered by the stored values themselves
+        field = model._get_fields()[field_name]
+        sorted_scored_ids = sorted(
+            ((score, int(instance_id)) for instance_id, score in scored_ids),
+            key=(lambda scored_id: (-scored_id[0] if reverse else scored_id[0], scored_id[1]))
+        )
+        ids_groups = []
+        for score, group in itertools.groupby(sorted_scored_ids, key=(lambda scored_id: scored_id[0])):
+            ids_groups.append((score, [instance_id for group_score, instance_id in group]))
+        tied_ids = [
+            instance_id
+            for score, ids_group in ids_groups
+            if len(ids_group) > 1 and not self._is_exact_index_score(field, score)
+            for instance_id in ids_group
+        ]
+        ordered_ids = []
+        if tied_ids:
+            values = self._get_field_values_by_ids(model, field_name, tied_ids)
+            for score, ids_group in ids_groups:
+                if len(ids_group) > 1 and not self._is_exact_index_score(field, score):
+                    ids_group = sorted(ids_group, key=(
+                        lambda instance_id: (values.get(instance_id) is None, values.get(instance_id))
+                    ), reverse=reverse)
+                ordered_ids.extend(ids_group)
+        else:
+            ordered_ids = [instance_id for score, instance_id in sorted_scored_ids]
+        return ordered_ids
+    
+    def _is_exact_index_score(self, field, score):
+        return isinstance(field, (RedisNumber, RedisDate, RedisDateTime)) and abs(score) < 2 ** 53
+    
+    def _get_field_values_by_ids(self, model, field_name, ids):
+        model_name = model.__name__
+        if self.save_type == 'fields':
+            raw_values = self._get_field_values(model_name, field_name, ids)
+        else:
+            raw_values = {
+                instance_id: fields_dict.get(field_name)
+                for instance_id, fields_dict in self._get_raw_instances_by_ids(model_name, ids, [field_name]).items()
+            }
+        values = {
+            instance_id: self._deserialize_instance_field(model, field_name, raw_value)
+            for instance_id, raw_value in raw_values.items()
+        }
+        return values
+    
+    def _can_order_by_index(self, model, field_name):
+        if field_name not in self._get_indexed_fields(model, 'range').keys():
+            return False
+        self._flush_write_behind()
+        pipeline = self.redis_instance.pipeline(transaction=False)
+        pipeline.zcard(self._get_index_key(model.__name__, field_name))
+        pipeline.zcard(self._get_ids_index_key(model.__name__))
+        index_count, ids_count = pipeline.execute()
+        return index_count == ids_count
+    
+    def _get_existing_ids(self, model_name, ids):
+        ids_index_key = self._get_ids_index_key(model_name)
+        pipeline = self.redis_instance.pipeline(transaction=False)
+        for instance_id in ids:
+            pipeline.zscore(ids_index_key, instance_id)
+        scores = pipeline.execute()
+        existing_ids = [
+            instance_id
+            for instance_id, score in zip(ids, scores)
+            if score is not None
+        ]
+        return existing_ids
+    
+    def _get_field_values(self, model_name, field_name, ids=None):
+        if ids is None:
+            ids = self._get_model_ids(model_name)
+        keys = [
+            f'{self.prefix}:{model_name}:{instance_id}:{field_name}'
+            for instance_id in ids
+        ]
+        values = self.redis_instance.mget(keys) if keys else []
+        field_values = {
+            instance_id: value
+            for instance_id, value in zip(ids, values)
+            if value is not None
+        }
+        return field_values
+    
+    def rebuild_ids_index(self, models=None):
+        self._flush_write_behind()
+        if models is None:
+            models = self.registered_models
+        rebuilt = {}
+        for model in models:
+            model_name = model.__name__
+            if self.save_type == 'fields':
+                keys = self.fast_get_keys(f'{self.prefix}:{model_name}:*:id')
+            else:
+                keys = self.fast_get_keys(f'{self.prefix}:{model_name}:*')
+            ids = set()
+            for key in keys:
+                instance_id = key.split(':')[2]
+                if instance_id.isdigit():
+                    ids.add(int(instance_id))
+            ids_index_key = self._get_ids_index_key(model_name)
+            pipeline = self.redis_instance.pipeline()
+            pipeline.delete(ids_index_key)
+            if ids:
+                pipeline.zadd(ids_index_key, {instance_id: instance_id for instance_id in ids})
+            pipeline.execute()
+            rebuilt[model] = len(ids)
+        return rebuilt
+    
+    ### INDEXES ###
+    
+    def _get_index_key(self, model_name, field_name):
+        return f'index:{self.prefix}:{model_name}:{field_name}'
+    
+    def _get_index_member_key(self, model_name, field_name, member):
+        return f'index:{self.prefix}:{model_name}:{field_name}:{member}'
+    
+    def _get_index_groups_key(self, model_name, field_name):
+        return f'groups:{self.prefix}:{model_name}:{field_name}'
+    
+    def _get_indexed_fields(self, model, index_type=None):
+        indexed_fields = {
+            field_name: field
+            for field_name, field in model._get_fields().items()
+            if field.index and (index_type is None or field.index_type == index_type)
+        }
+        return indexed_fields
+    
+    def _write_indexes(self, pipeline, model, instance_id, fields_dict):
+        model_name = model.__name__
+        for field_name, field in self._get_indexed_fields(model).items():
+            if field_name in fields_dict.keys():
+                if field.index_type == 'range':
+                    index_key = self._get_index_key(model_name, field_name)
+                    score = field.get_index_score(fields_dict[field_name])
+                    if score is None:
+                        pipeline.zrem(index_key, instance_id)
+                    else:
+                        pipeline.zadd(index_key, {instance_id: score})
+                elif field.index_type == 'exact':
+                    member = field.get_index_member(fields_dict[field_name])
+                    pipeline.sadd(self._get_index_member_key(model_name, field_name, member), instance_id)
+                    pipeline.sadd(self._get_index_groups_key(model_name, field_name), member)
+    
+    def _queue_update_indexes(self, pipeline, model, data_to_update):
+        # Old members are read by the script inside the same transaction as the
+        # write, so concurrent updates can not leave stale exact index members
+        indexed_fields = self._get_indexed_fields(model)
+        rows = []
+        for instance_id, fields_to_update in data_to_update.items():
+            exact_fields = []
+            range_fields = []
+            for field_name, field in indexed_fields.items():
+                if field_name in fields_to_update.keys():
+                    if field.index_type == 'range':
+                        score = field.get_index_score(fields_to_update[field_name])
+                        range_fields.append([field_name, None if score is None else f'{float(score)!r}'])
+                    elif field.index_type == 'exact':
+                        exact_fields.append([field_name, field.get_index_member(fields_to_update[field_name])])
+            if exact_fields or range_fields:
+                rows.append([f'{instance_id}', exact_fields, range_fields])
+        self._queue_indexes_script(pipeline, model, 'update', rows)
+    
+    def _queue_delete_indexes(self, pipeline, model, ids):
+        model_name = model.__name__
+        for field_name in self._get_indexed_fields(model, 'range').keys():
+            pipeline.zrem(self._get_index_key(model_name, field_name), *ids)
+        exact_fields = [[field_name, None] for field_name in self._get_indexed_fields(model, 'exact').keys()]
+        if exact_fields:
+            rows = [[f'{instance_id}', exact_fields, []] for instance_id in ids]
+            self._queue_indexes_script(pipeline, model, 'delete', rows)
+    
+    def _queue_indexes_script(self, pipeline, model, operation, rows):
+        if rows:
+            model_name = model.__name__
+            indexes_script = self._get_indexes_script()
+            pipeline.scripts.add(indexes_script)
+            pipeline.evalsha(
+                indexes_script.sha,
+                0,
+                self.save_type,
+                f'{self.prefix}:{model_name}:',
+                f'index:{self.prefix}:{model_name}:',
+                self._get_ids_index_key(model_name),
+                self._get_index_groups_key(model_name, ''),
+                operation,
+                json.dumps(rows)
+            )
+    
+    def _get_indexes_script(self):
+        if self.indexes_script is None:
+            self.indexes_script = self.redis_instance.register_script(LUA_INDEXES_SCRIPT)
+        return self.indexes_script
+    
+    def _get_index_filtered_ids(self, model, filters):
+        index_filter_plan = self._get_index_filter_plan(model, filters)
+        if index_filter_plan is None:
+            return None
+        scores_ranges, members_keys, ids_lists = index_filter_plan
+        if [] in members_keys or [] in ids_lists:
+            return []
+        self._flush_write_behind()
+        pipeline = self.redis_instance.pipeline()
+        temporary_keys = self._queue_index_filter(pipeline, model, scores_ranges, members_keys, ids_lists)
+        return self._parse_index_filter(pipeline.execute(), scores_ranges, members_keys, ids_lists, temporary_keys)
+    
+    def _get_index_filter_plan(self, model, filters):
+        # The ids index is a zset scored by id, so id filters are answered
+        # by it like any other range index
+        model_name = model.__name__
+        indexed_fields = self._get_indexed_fields(model)
+        scores_ranges = []
+        members_keys = []
+        ids_lists = []
+        for filter_param, filter_by in filters.items():
+            fields_to_filter, filter_type = self._split_filtering(filter_param)
+            if fields_to_filter == ['id']:
+                if filter_type == 'in':
+                    ids = self._get_index_filter_ids(filter_by)
+                    if ids is not None:
+                        ids_lists.append(ids)
+                else:
+                    scores_range = self._get_index_scores_range(model._get_fields()['id'], filter_type, filter_by)
+                    if scores_range is not None:
+                        scores_ranges.append((self._get_ids_index_key(model_name), *scores_range))
+            elif len(fields_to_filter) == 1 and fields_to_filter[0] in indexed_fields.keys():
+                field_name = fields_to_filter[0]
+                field = indexed_fields[field_name]
+                if field.index_type == 'range':
+                    scores_range = self._get_index_scores_range(field, filter_type, filter_by)
+                    if scores_range is not None:
+                        scores_ranges.append((self._get_index_key(model_name, field_name), *scores_range))
+                elif field.index_type == 'exact':
+                    members = self._get_index_members(field, filter_type, filter_by)
+                    if members is not None:
+                        members_keys.append([
+                            self._get_index_member_key(model_name, field_name, member)
+                            for member in members
+                        ])
+        index_filter_plan = None
+        if scores_ranges or members_keys or ids_lists:
+            index_filter_plan = (scores_ranges, members_keys, ids_lists)
+        return index_filter_plan
+    
+    def _get_index_filter_ids(self, filter_by):
+        ids = None
+        if isinstance(filter_by, (list, tuple, set, frozenset)):
+            if all(type(instance_id) == int for instance_id in filter_by):
+                ids = sorted(set(filter_by))
+        return ids
+    
+    def _queue_index_filter(self, pipeline, model, scores_ranges, members_keys, ids_lists):
+        temporary_keys = []
+        for index_key, min_score, max_score in scores_ranges:
+            pipeline.zrangebyscore(index_key, min_score, max_score)
+        for ids in ids_lists:
+            for instance_id in ids:
+                pipeline.zscore(self._get_ids_index_key(model.__name__), instance_id)
+        if members_keys:
+            keys_to_intersect = []
+            for keys_to_union in members_keys:
+                if len(keys_to_union) == 1:
+                    keys_to_intersect.append(keys_to_union[0])
+                else:
+                    temporary_key = f'tmp:{self.prefix}:{uuid.uuid4().hex}'
+                    pipeline.sunionstore(temporary_key, keys_to_union)
+                    keys_to_intersect.append(temporary_key)
+                    temporary_keys.append(temporary_key)
+            pipeline.sinter(keys_to_intersect)
+            if temporary_keys:
+                pipeline.delete(*temporary_keys)
+        return temporary_keys
+    
+    def _parse_index_filter(self, results, scores_ranges, members_keys, ids_lists, temporary_keys):
+        ids_sets = [set(map(int, index_ids)) for index_ids in results[:len(scores_ranges)]]
+        position = len(scores_ranges)
+        for ids in ids_lists:
+            scores = results[position:position + len(ids)]
+            ids_sets.append({instance_id for instance_id, score in zip(ids, scores) if score is not None})
+            position += len(ids)
+        if members_keys:
+            ids_sets.append(set(map(int, results[position + len(temporary_keys)])))
+        filtered_ids = sorted(reduce(
+            lambda set_a, set_b: set_a & set_b,
+            ids_sets
+        ))
+        return filtered_ids
+    
+    def _get_index_members(self, field, filter_type, filter_by):
+        members = None
+        try:
+            if filter_type == 'exact':
+                members = [field.get_index_filter_member(filter_by)]
+            elif filter_type == 'in':
+                members = list(set(field.get_index_filter_member(value) for value in filter_by))
+            elif filter_type == 'isnull' and filter_by is True:
+                members = ['null']
+        except BaseException as ex:
+            members = None
+        return members
+    
+    def _get_index_scores_range(self, field, filter_type, filter_by):
+        # Bounds are always inclusive: scores are floats, so strict comparisons
+        # are left to the regular filtering of the fetched instances
+        scores_range = None
+        if filter_type == 'range':
+            if type(filter_by) == int:
+                min_score = field.get_index_filter_score(0)
+                max_score = field.get_index_filter_score(filter_by - 1)
+                if min_score is not None and max_score is not None:
+                    scores_range = (min_score, max_score)
+        elif filter_type in ['exact', 'gt', 'gte', 'lt', 'lte']:
+            score = field.get_index_filter_score(filter_by)
+            if score is not None:
+                if filter_type == 'exact':
+                    scores_range = (score, score)
+                elif filter_type in ['gt', 'gte']:
+                    scores_range = (score, '+inf')
+                else:
+                    scores_range = ('-inf', score)
+        return scores_range
+    
+    def _get_index_count(self, model, filters_list):
+        index_query_plan = self._get_index_query_plan(model, filters_list)
+        if index_query_plan is None:
+            return None
+        self._flush_write_behind()
+        keys, args = index_query_plan
+        return int(self._get_index_query_script()(keys=keys, args=['count', *args]))
+    
+    def _get_index_query_ids(self, model, filters_list):
+        index_query_plan = self._get_index_query_plan(model, filters_list)
+        if index_query_plan is None:
+            return None
+        self._flush_write_behind()
+        keys, args = index_query_plan
+        return sorted(map(int, self._get_index_query_script()(keys=keys, args=['ids', *args])))
+    
+    def _get_index_query_script(self):
+        if self.index_query_script is None:
+            self.index_query_script = self.redis_instance.register_script(LUA_INDEX_QUERY_SCRIPT)
+        return self.index_query_script
+    
+    def _get_index_query_plan(self, model, filters_list):
+        # Only filters the indexes answer exactly are resolved inside redis,
+        # anything else needs the instances to be checked in python
+        model_name = model.__name__
+        indexed_fields = self._get_indexed_fields(model)
+        scores_ranges = []
+        members_keys = []
+        allowed = bool(filters_list)
+        for filters in filters_list:
+            for filter_param, filter_by in filters.items():
+                fields_to_filter, filter_type = self._split_filtering(filter_param)
+                field = None
+                if len(fields_to_filter) == 1:
+                    field = indexed_fields.get(fields_to_filter[0])
+                if fields_to_filter == ['id']:
+                    scores_range = self._get_exact_index_scores_range(model._get_fields()['id'], filter_type, filter_by)
+                    if scores_range is None:
+                        allowed = False
+                    else:
+                        scores_ranges.append((self._get_ids_index_key(model_name), *scores_range))
+                elif field is None:
+                    allowed = False
+                elif allowed and field.index_type == 'range':
+                    scores_range = self._get_exact_index_scores_range(field, filter_type, filter_by)
+                    if scores_range is None:
+                        allowed = False
+                    else:
+                        scores_ranges.append((self._get_index_key(model_name, fields_to_filter[0]), *scores_range))
+                elif allowed and field.index_type == 'exact':
+                    members = self._get_exact_index_members(field, filter_type, filter_by)
+                    if members is None:
+                        allowed = False
+                    else:
+                        members_keys.append([
+                            self._get_index_member_key(model_name, fields_to_filter[0], member)
+                            for member in members
+                        ])
+        index_query_plan = None
+        if allowed:
+            keys = [index_key for index_key, min_score, max_score in scores_ranges]
+            args = [len(scores_ranges)]
+            for index_key, min_score, max_score in scores_ranges:
+                args.extend([min_score, max_score])
+            args.append(len(members_keys))
+            for keys_to_union in members_keys:
+                keys.extend(keys_to_union)
+                args.append(len(keys_to_union))
+            index_query_plan = (keys, args)
+        return index_query_plan
+    
+    def _get_exact_index_scores_range(self, field, filter_type, filter_by):
+        # Scores are floats, so decimals and numbers that do not fit into one
+        # exactly can not answer on their own
+        scores_range = None
+        if isinstance(field, (RedisNumber, RedisDate, RedisDateTime)):
+            score = field.get_index_filter_score(filter_by)
+            if isinstance(field, RedisNumber) and score is not None and score != filter_by:
+                score = None
+            if score is not None and self._is_exact_index_score(field, score):
+                score = f'{float(score)!r}'
+                if filter_type == 'exact':
+                    scores_range = (score, score)
+                elif filter_type == 'gt':
+                    scores_range = (f'({score}', '+inf')
+                elif filter_type == 'gte':
+                    scores_range = (score, '+inf')
+                elif filter_type == 'lt':
+                    scores_range = ('-inf', f'({score}')
+                elif filter_type == 'lte':
+                    scores_range = ('-inf', score)
+        return scores_range
+    
+    def _get_exact_index_members(self, field, filter_type, filter_by):
+        members = None
+        if isinstance(field, RedisBool):
+            allowed_types = (bool,)
+        elif isinstance(field, RedisString):
+            allowed_types = (str, type(None))
+        else:
+            allowed_types = None
+        if filter_type == 'isnull' and filter_by is True:
+            members = ['null']
+        elif allowed_types is not None:
+            if filter_type == 'exact' and isinstance(filter_by, allowed_types):
+                members = self._get_index_members(field, filter_type, filter_by)
+            elif filter_type == 'in' and isinstance(filter_by, (list, tuple, set, frozenset)):
+                if all(isinstance(value, allowed_types) for value in filter_by):
+                    members = self._get_index_members(field, filter_type, filter_by)
+        return members
+    
+    def rebuild_indexes(self, models=None):
+        if models is None:
+            models = self.registered_models
+        self.rebuild_ids_index(models)
+        for model in models:
+            model_name = model.__name__
+            indexed_fields = self._get_indexed_fields(model)
+            if indexed_fields:
+                if self.save_type == 'fields':
+                    raw_instances = {}
+                    for field_name in indexed_fields.keys():
+                        for instance_id, value in self._get_field_values(model_name, field_name).items():
+                            if instance_id not in raw_instances.keys():
+                                raw_instances[instance_id] = {}
+                            raw_instances[instance_id][field_name] = value
+                else:
+                    raw_instances = self._get_raw_instances_by_ids(model_name)
+                pipeline = self.redis_instance.pipeline()
+                for field_name, field in indexed_fields.items():
+                    if field.index_type == 'range':
+                        pipeline.delete(self._get_index_key(model_name, field_name))
+                    else:
+                        members_keys = self.fast_get_keys(self._get_index_member_key(model_name, field_name, '*'))
+                        pipeline.delete(self._get_index_groups_key(model_name, field_name), *members_keys)
+                for instance_id, fields_dict in raw_instances.items():
+                    self._write_indexes(pipeline, model, instance_id, fields_dict)
+                pipeline.execute()
+
+
+### ASYNC REDIS ROOT ###
+
+
+class AsyncRedisRoot(RedisRoot):
+    
+    ### INIT ###
+    
+    def __init__(self, *args, **kwargs):
+        if redis_asyncio is None:
+            raise Exception(f'{self.__class__.__name__} needs redis.asyncio, please install redis>=4.2.0')
+        super().__init__(*args, **kwargs)
+        allowed_save_types = ['instances', 'hash']
+        if self.save_type not in allowed_save_types:
+            raise Exception(
+                f'Save type {self.save_type} is not allowed in {self.__class__.__name__}. Allowed only: {", ".join(allowed_save_types)}')
+        if self.write_behind:
+            raise Exception(f'write_behind is not supported by {self.__class__.__name__}')
+        if self.filter_engine != 'python':
+            raise Exception(f'filter_engine {self.filter_engine} is not supported by {self.__class__.__name__}')
+    
+    @property
+    def redis_instance(self):
+        redis_instance = redis_asyncio.Redis(connection_pool=self.connection_pool)
+        return redis_instance
+    
+    def _get_connection_pool(self, connection_pool):
+        if isinstance(connection_pool, redis_asyncio.ConnectionPool):
+            connection_pool.connection_kwargs['decode_responses'] = True
+            self.connection_pool = connection_pool
+        else:
+            print(
+                f'{datetime.datetime.now()} - {self.__class__.__name__}: No connection_pool provided, trying default config...')
+            default_host = 'localhost'
+            default_port = 6379
+            default_db = 0
+            try:
+                connection_pool = redis_asyncio.ConnectionPool(
+                    decode_responses=True,
+                    host=default_host,
+                    port=default_port,
+                    db=default_db,
+                )
+                self.connection_pool = connection_pool
+            except BaseException as ex:
+                raise Exception(
+                    f'Default config ({default_host}:{default_port}, db={default_db}) failed, please provide connection_pool to {self.__class__.__name__}')
+        return self.connection_pool
+    
+    async def close(self):
+        await self.connection_pool.disconnect()
+    
+    ### NOT SUPPORTED ###
+    
+    # Sync helpers of RedisRoot that would call the async client without awaiting it
+    query = get_not_supported_method('query')
+    batch = get_not_supported_method('batch')
+    iterate = get_not_supported_method('iterate')
+    values_list = get_not_supported_method('values_list')
+    aggregate = get_not_supported_method('aggregate')
+    group_count = get_not_supported_method('group_count')
+    bulk_update = get_not_supported_method('bulk_update')
+    create_nb = get_not_supported_method('create_nb')
+    update_nb = get_not_supported_method('update_nb')
+    delete_nb = get_not_supported_method('delete_nb')
+    flush = get_not_supported_method('flush')
+    join = get_not_supported_method('join')
+    fast_get_keys = get_not_supported_method('fast_get_keys')
+    fast_get_keys_values = get_not_supported_method('fast_get_keys_values')
+    collect_keys = get_not_supported_method('collect_keys')
+    rebuild_ids_index = get_not_supported_method('rebuild_ids_index')
+    rebuild_indexes = get_not_supported_method('rebuild_indexes')
+    
+    ### UTILS ###
+    
+    async def get_and_reserve_new_id(self, model):
+        new_id = (await self.reserve_ids(model, 1))[0]
+        return new_id
+    
+    async def reserve_ids(self, model, count):
+        if self.solo_usage:
+            return super().reserve_ids(model, count)
+        with self.ids_lock:
+            ids = self._pop_reserved_ids(model, count)
+        if len(ids) < count:
+            block_size = max(count - len(ids), self.ids_block_size)
+            max_id = await self.redis_instance.incrby(f'max_id:{self.prefix}:{model.__name__}', block_size)
+            with self.ids_lock:
+                ids = self._add_ids_block(model, ids, count, max_id, block_size)
+        return list(ids)
+    
+    ### GET ###
+    
+    async def get(self, model, return_dict=False, depth=None, lazy=False, only=None, **filters):
+        if lazy:
+            raise Exception(f'lazy is not supported by {self.__class__.__name__}')
+        field_names = self._get_loaded_field_names(model, only, [filters])
+        ids = await self._get_index_filtered_ids_async(model, filters)
+        raw_instances = await self._get_raw_instances_by_ids_async(model.__name__, ids, field_names)
+        instances = self._decode_raw_instances(model, raw_instances, field_names)
+        relations_needed = self._relations_needed_for_filtering(model, [filters])
+        if relations_needed:
+            instances = await self._resolve_relations_async(model, instances)
+        compiled_filters = self._compile_filters(filters)
+        instances = {
+            instance_id: instance_fields
+            for instance_id, instance_fields in instances.items()
+            if self._instance_allowed(instance_fields, compiled_filters)
+        }
+        if not relations_needed:
+            instances = await self._resolve_relations_async(model, instances, depth)
+        if self.save_consistency:
+            instances = self._check_fields_existence(model, instances, field_names)
+        if only is not None:
+            instances = self._project_instances(instances, only)
+        result = self._return_with_format(instances, return_dict)
+        return result
+    
+    async def count(self, model, **filters):
+        if not filters:
+            count = await self.redis_instance.zcard(self._get_ids_index_key(model.__name__))
+        else:
+            count = await self._get_index_count_async(model, [filters])
+        if count is None:
+            count = len(await self.get(model, return_dict=True, depth=0, **filters))
+        return count
+    
+    ### UPDATE ###
+    
+    async def update(self, model, instances=None, return_dict=False, **fields_to_update):
+        if instances is not None:
+            ids_to_update = get_ids_from_untyped_data(instances)
+        else:
+            ids_to_update = await self._get_model_ids_async(model.__name__)
+        cleaned_fields_to_update = self._clean_fields_to_update(model, fields_to_update)
+        rows_to_update = {
+            instance_id: (fields_to_update, cleaned_fields_to_update)
+            for instance_id in ids_to_update
+        }
+        ids_to_update = list(rows_to_update.keys())
+        if self.save_type == 'hash':
+            loaded_data = await self._resolve_relations_async(model, self._decode_raw_instances(
+                model, await self._get_raw_instances_by_ids_async(model.__name__, ids_to_update)
+            ))
+        else:
+            loaded_data = await self._get_raw_instances_by_ids_async(model.__name__, ids_to_update)
+        updated_instances, data_to_update = self._build_rows_update(rows_to_update, loaded_data)
+        if data_to_update.keys():
+            pipeline = self.redis_instance.pipeline()
+            self._queue_update(pipeline, model, data_to_update)
+            await pipeline.execute()
+        result = self._return_with_format(updated_instances, return_dict)
+        return result
+    
+    ### DELETE ###
+    
+    async def delete(self, model, instances=None):
+        model_name = model.__name__
+        if instances is None:
+            ids_to_delete = await self._get_model_ids_async(model_name)
+        else:
+            ids_to_delete = get_ids_from_untyped_data(instances)
+        if ids_to_delete:
+            keys_to_delete = [
+                f'{self.prefix}:{model_name}:{instance_id}'
+                for instance_id in ids_to_delete
+            ]
+            pipeline = self.redis_instance.pipeline()
+            self._queue_delete(pipeline, model, ids_to_delete, keys_to_delete)
+            await pipeline.execute()
+    
+    ### CREATE ###
+    
+    async def create(self, model, **params):
+        params = self._get_allowed_model_params(model, params)
+        created_instances = await self.bulk_create(model, [params])
+        return created_instances[0]
+    
+    async def bulk_create(self, model, params_list, batch_size=1000):
+        params_list = list(params_list)
+        ids = await self.reserve_ids(model, len(params_list))
+        self.register_models([model])
+        created_instances = []
+        for batch_start in range(0, len(params_list), batch_size):
+            batch_end = batch_start + batch_size
+            pipeline = self.redis_instance.pipeline()
+            for instance_id, params in zip(ids[batch_start:batch_end], params_list[batch_start:batch_end]):
+                fields_dict, deserialized_fields = self._encode_instance(model, instance_id, params)
+                self._write_instance(pipeline, model, instance_id, fields_dict)
+                created_instances.append(deserialized_fields)
+            await pipeline.execute()
+        await self._resolve_relations_async(model, dict(zip(ids, created_instances)))
+        return created_instances
+    
+    ### RELATIONS ###
+    
+    async def _resolve_relations_async(self, model, instances, depth=None, resolved=None):
+        if depth == 0 or not instances:
+            return instances
+        relations = self._get_relation_fields(model)
+        if not relations:
+            return instances
+        if resolved is None:
+            resolved = {}
+        next_depth = None if depth is None else depth - 1
+        for related_model, ids in self._collect_related_ids(instances, relations).items():
+            related_instances = resolved.setdefault((related_model, next_depth), {})
+            ids_to_fetch = sorted(ids - related_instances.keys())
+            if ids_to_fetch:
+                raw_instances = await self._get_raw_instances_by_ids_async(related_model.__name__, ids_to_fetch)
+                fetched_instances = self._decode_raw_instances(related_model, raw_instances)
+                if self.save_consistency:
+                    fetched_instances = self._check_fields_existence(related_model, fetched_instances)
+                related_instances.update(fetched_instances)
+                await self._resolve_relations_async(related_model, fetched_instances, next_depth, resolved)
+        return self._stitch_relations(instances, relations, resolved, next_depth)
+    
+    ### IDS INDEX ###
+    
+    async def _get_model_ids_async(self, model_name):
+        ids = await self.redis_instance.zrange(self._get_ids_index_key(model_name), 0, -1)
+        return [int(instance_id) for instance_id in ids]
+    
+    async def _get_raw_instances_by_ids_async(self, model_name, ids=None, field_names=None):
+        if ids is None:
+            ids = await self._get_model_ids_async(model_name)
+        keys = [
+            f'{self.prefix}:{model_name}:{instance_id}'
+            for instance_id in ids
+        ]
+        if self.save_type == 'hash':
+            pipeline = self.redis_instance.pipeline(transaction=False)
+            for key in keys:
+                if field_names is None:
+                    pipeline.hgetall(key)
+                else:
+                    pipeline.hmget(key, field_names)
+            values = await pipeline.execute() if keys else []
+            if field_names is not None:
+                values = [
+                    {
+                        field_name: value
+                        for field_name, value in zip(field_names, hash_values)
+                        if value is not None
+                    }
+                    for hash_values in values
+                ]
+        else:
+            values = await self.redis_instance.mget(keys) if keys else []
+        return self._parse_raw_instances(ids, values)
+    
+    ### INDEXES ###
+    
+    async def _get_index_filtered_ids_async(self, model, filters):
+        index_filter_plan = self._get_index_filter_plan(model, filters)
+        if index_filter_plan is None:
+            return None
+        scores_ranges, members_keys, ids_lists = index_filter_plan
+        if [] in members_keys or [] in ids_lists:
+            return []
+        pipeline = self.redis_instance.pipeline()
+        temporary_keys = self._queue_index_filter(pipeline, model, scores_ranges, members_keys, ids_lists)
+        return self._parse_index_filter(await pipeline.execute(), scores_ranges, members_keys, ids_lists, temporary_keys)
+    
+    async def _get_index_count_async(self, model, filters_list):
+        index_query_plan = self._get_index_query_plan(model, filters_list)
+        if index_query_plan is None:
+            return None
+        keys, args = index_query_plan
+        return int(await self._get_index_query_script()(keys=keys, args=['count', *args]))
+
+
+### BATCH ###
+
+
+class RedisBatch:
+    
+    def __init__(self, redis_root, transaction=True):
+        check_types(transaction, bool)
+        self.redis_root = redis_root
+        self.transaction = transaction
+        self.pending = {}
+        self.created_instances = {}
+        self.deleted = []
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.execute()
+        else:
+            self.discard()
+        return False
+    
+    def create(self, model, **params):
+        params = self.redis_root._get_allowed_model_params(model, params)
+        return self.bulk_create(model, [params])[0]
+    
+    def bulk_create(self, model, params_list):
+        params_list = list(params_list)
+        ids = self.redis_root.reserve_ids(model, len(params_list))
+        self.redis_root.register_models([model])
+        created_instances = []
+        for instance_id, params in zip(ids, params_list):
+            fields_dict, deserialized_fields = self.redis_root._encode_instance(model, instance_id, params)
+            self.pending[(model.__name__, instance_id)] = {
+                'model': model,
+                'fields': fields_dict,
+                'created': True,
+            }
+            self.created_instances.setdefault(model, {})[instance_id] = deserialized_fields
+            created_instances.append(deserialized_fields)
+        return created_instances
+    
+    def update(self, model, instances=None, **fields_to_update):
+        ids_to_update = self._get_ids(model, instances)
+        self._update_rows(model, self.redis_root._get_rows_to_update(model, ids_to_update, fields_to_update))
+    
+    def bulk_update(self, model, instances_data):
+        self._update_rows(model, self.redis_root._get_bulk_rows_to_update(model, instances_data))
+    
+    def delete(self, model, instances=None):
+        model_name = model.__name__
+        deleted_ids = self._get_deleted_ids(model)
+        ids_to_delete = []
+        for instance_id in self._get_ids(model, instances):
+            if instance_id in deleted_ids:
+                continue
+            pending = self.pending.pop((model_name, instance_id), None)
+            if pending is not None and pending['created']:
+                self.created_instances[model].pop(instance_id, None)
+            else:
+                ids_to_delete.append(instance_id)
+        if ids_to_delete:
+            self.deleted.append((model, ids_to_delete))
+    
+    def execute(self):
+        redis_root = self.redis_root
+        redis_root._flush_write_behind()
+        pipeline = redis_root.redis_instance.pipeline(transaction=self.transaction)
+        commands_count = 0
+        for (model_name, instance_id), pending in self.pending.items():
+            if pending['created']:
+                redis_root._write_instance(pipeline, pending['model'], instance_id, pending['fields'])
+            else:
+                redis_root._queue_update(pipeline, pending['model'], {instance_id: pending['fields']})
+            commands_count += 1
+        for model, ids_to_delete in self.deleted:
+            if redis_root.save_type == 'fields':
+                keys_to_delete = redis_root.collect_keys(model, ids_to_delete)
+            else:
+                keys_to_delete = [
+                    f'{redis_root.prefix}:{model.__name__}:{instance_id}'
+                    for instance_id in ids_to_delete
+                ]
+            if keys_to_delete:
+                redis_root._queue_delete(pipeline, model, ids_to_delete, keys_to_delete)
+                commands_count += 1
+        if commands_count:
+            pipeline.execute()
+        for model, created_instances in self.created_instances.items():
+            redis_root._resolve_relations(model, created_instances)
+        self.discard()
+    
+    def discard(self):
+        self.pending = {}
+        self.created_instances = {}
+        self.deleted = []
+    
+    def _get_ids(self, model, instances):
+        if instances is not None:
+            return get_ids_from_untyped_data(instances)
+        ids = self.redis_root._get_model_ids(model.__name__)
+        deleted_ids = self._get_deleted_ids(model)
+        ids = [instance_id for instance_id in ids if instance_id not in deleted_ids]
+        ids += list(self.created_instances.get(model, {}).keys())
+        return ids
+    
+    def _get_deleted_ids(self, model):
+        return {
+            instance_id
+            for deleted_model, ids_to_delete in self.deleted
+            if deleted_model == model
+            for instance_id in ids_to_delete
+        }
+    
+    def _update_rows(self, model, rows_to_update):
+        model_name = model.__name__
+        deleted_ids = self._get_deleted_ids(model)
+        stored_rows_to_update = {}
+        for instance_id, (fields_to_update, cleaned_fields_to_update) in rows_to_update.items():
+            if instance_id in deleted_ids:
+                continue
+            pending = self.pending.get((model_name, instance_id))
+            if pending is not None:
+                pending['fields'].update(cleaned_fields_to_update)
+                if pending['created']:
+                    self.created_instances[model][instance_id].update(fields_to_update)
+            else:
+                stored_rows_to_update[instance_id] = (fields_to_update, cleaned_fields_to_update)
+        if stored_rows_to_update:
+            updated_instances, data_to_update = self.redis_root._collect_rows_update(
+                model, stored_rows_to_update
+            )
+            for instance_id, fields_to_write in data_to_update.items():
+                self.pending[(model_name, instance_id)] = {
+                    'model': model,
+                    'fields': dict(fields_to_write),
+                    'created': False,
+                }
+
+
+### LAZY RELATIONS ###
+
+
+class RedisIdentityMap:
+    
+    def __init__(self, redis_root):
+        self.redis_root = redis_root
+        self.instances = {}
+        self.loaded = {}
+    
+    def get_instance(self, model, instance_id):
+        model_instances = self.instances.setdefault(model, {})
+        if instance_id not in model_instances.keys():
+            model_instances[instance_id] = RedisLazyInstance(self, model, instance_id)
+        return model_instances[instance_id]
+    
+    def load(self, model, instance_id):
+        model_loaded = self.loaded.setdefault(model, {})
+        if instance_id not in model_loaded.keys():
+            ids_to_load = sorted(
+                pending_id
+                for pending_id in self.instances.get(model, {}).keys()
+                if pending_id not in model_loaded.keys()
+            )
+            if instance_id not in ids_to_load:
+                ids_to_load.append(instance_id)
+            instances = self.redis_root._get_related_instances_by_ids(model, ids_to_load)
+            instances = self.redis_root._make_relations_lazy(model, instances, self)
+            for loaded_id in ids_to_load:
+                model_loaded[loaded_id] = instances.get(loaded_id, {'id': loaded_id})
+        return model_loaded[instance_id]
+
+
+class RedisLazyInstance(dict):
+    
+    def __init__(self, identity_map, model, instance_id):
+        super().__init__(id=instance_id)
+        self._identity_map = identity_map
+        self._model = model
+        self._loaded = False
+    
+    def _load(self):
+        if not self._loaded:
+            super().update(self._identity_map.load(self._model, super().__getitem__('id')))
+            self._loaded = True
+        return self
+    
+    def __getitem__(self, key):
+        if key == 'id':
+            return super().__getitem__(key)
+        self._load()
+        return super().__getitem__(key)
+    
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(f'{self._model.__name__} has no field {name}')
+    
+    def get(self, key, default=None):
+        if key == 'id':
+            return super().get(key, default)
+        self._load()
+        return super().get(key, default)
+    
+    def __contains__(self, key):
+        if key == 'id':
+            return True
+        self._load()
+        return super().__contains__(key)
+    
+    def __iter__(self):
+        self._load()
+        return super().__iter__()
+    
+    def __len__(self):
+        self._load()
+        return super().__len__()
+    
+    def keys(self):
+        self._load()
+        return super().keys()
+    
+    def values(self):
+        self._load()
+        return super().values()
+    
+    def items(self):
+        self._load()
+        return super().items()
+    
+    def copy(self):
+        self._load()
+        return dict(self)
+    
+    def __eq__(self, other):
+        self._load()
+        if isinstance(other, RedisLazyInstance):
+            other._load()
+        return super().__eq__(other)
+    
+    def __ne__(self, other):
+        return not self.__eq__(other)
+    
+    def __repr__(self):
+        if not self._loaded:
+            return f'<{self._model.__name__} lazy instance id={super().__getitem__("id")}>'
+        return super().__repr__()
+
+
+### QUERYSET ###
+
+
+class RedisQuerySet:
+    
+    def __init__(self, redis_root, model, batch_size=1000):
+        self.redis_root = redis_root
+        self.model = model
+        self.batch_size = batch_size
+        self.filters = []
+        self.excludes = []
+        self.ordering = None
+        self.fields = None
+        self.depth = None
+        self.lazy_relations = False
+        self.offset = 0
+        self.limit = None
+        self._result_cache = None
+    
+    def _clone(self, **changes):
+        queryset = RedisQuerySet(self.redis_root, self.model, self.batch_size)
+        queryset.filters = list(self.filters)
+        queryset.excludes = list(self.excludes)
+        queryset.ordering = self.ordering
+        queryset.fields = self.fields
+        queryset.depth = self.depth
+        queryset.lazy_relations = self.lazy_relations
+        queryset.offset = self.offset
+        queryset.limit = self.limit
+        for attr_name, attr_value in changes.items():
+            setattr(queryset, attr_name, attr_value)
+        return queryset
+    
+    ### CHAINING ###
+    
+    def all(self):
+        return self._clone()
+    
+    def filter(self, **filters):
+        if not filters:
+            return self._clone()
+        return self._clone(filters=[*self.filters, filters])
+    
+    def exclude(self, **filters):
+        if not filters:
+            return self._clone()
+        return self._clone(excludes=[*self.excludes, filters])
+    
+    def order_by(self, field_name):
+        return self._clone(ordering=field_name)
+    
+    def only(self, *field_names):
+        return self._clone(fields=list(field_names))
+    
+    def select_related(self, depth=None):
+        return self._clone(depth=depth, lazy_relations=False)
+    
+    def lazy(self):
+        return self._clone(lazy_relations=True)
+    
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            if (item.start or 0) < 0 or (item.stop or 0) < 0 or item.step not in [None, 1]:
+                raise Exception('Negative indexing and slice steps are not supported')
+            start = item.start or 0
+            limit = None
+            if item.stop is not None:
+                limit = max(item.stop - start, 0)
+            if self.limit is not None:
+                limit = max(self.limit - start, 0) if limit is None else min(limit, max(self.limit - start, 0))
+            return self._clone(offset=self.offset + start, limit=limit)
+        elif isinstance(item, int):
+            if item < 0:
+                raise Exception('Negative indexing is not supported')
+            instances = list(self[item:item + 1])
+            if not instances:
+                raise IndexError(f'{self.model.__name__} queryset index out of range')
+            return instances[0]
+        else:
+            raise TypeError(f'{self.__class__.__name__} indices must be integers or slices, not {type(item).__name__}')
+    
+    ### EVALUATION ###
+    
+    def __iter__(self):
+        return iter(self._fetch_all())
+    
+    def __len__(self):
+        return len(self._fetch_all())
+    
+    def __bool__(self):
+        return self.exists()
+    
+    def first(self):
+        instances = list(self[:1])
+        return instances[0] if instances else None
+    
+    def values_list(self, *field_names, flat=False):
+        if flat and len(field_names) != 1:
+            raise Exception(f'flat=True needs exactly one field name, got {len(field_names)}')
+        rows = [
+            tuple(instance.get(field_name) for field_name in field_names)
+            for instance in self.only(*field_names)
+        ]
+        if flat:
+            rows = [row[0] for row in rows]
+        return rows
+    
+    def exists(self):
+        if self._result_cache is not None:
+            return bool(self._result_cache)
+        return bool(list(self[:1]._iterate()))
+    
+    def count(self):
+        count = None
+        if self._result_cache is not None:
+            count = len(self._result_cache)
+        elif not self.filters and not self.excludes:
+            count = self._limit_count(self.redis_root.count(self.model))
+        elif not self.excludes:
+            index_count = self.redis_root._get_index_count(self.model, self.filters)
+            if index_count is not None:
+                count = self._limit_count(index_count)
+        if count is None:
+            if self.redis_root.save_type == 'fields' and self.filters:
+                count = self._limit_count(len(self.redis_root._get_query_ids(self.model, self.filters, self.excludes)))
+            else:
+                count = sum(1 for instance in self._clone(depth=0, lazy_relations=False)._iterate(project=False))
+        return count
+    
+    def _fetch_all(self):
+        if self._result_cache is None:
+            self._result_cache = list(self._iterate())
+        return self._result_cache
+    
+    def _limit_count(self, count):
+        count = max(count - self.offset, 0)
+        if self.limit is not None:
+            count = min(count, self.limit)
+        return count
+    
+    def _iterate(self, project=True):
+        redis_root = self.redis_root
+        identity_map = RedisIdentityMap(redis_root) if self.lazy_relations else None
+        stop = None if self.limit is None else self.offset + self.limit
+        reverse = self.ordering is not None and self.ordering.startswith('-')
+        ordering_field_name = None if self.ordering is None else self.ordering.lstrip('-')
+        only = None
+        if not project:
+            only = []
+        elif self.fields is not None:
+            only = list(self.fields)
+        if only is not None and ordering_field_name not in [None, 'id']:
+            only.append(ordering_field_name)
+        field_names = redis_root._get_loaded_field_names(self.model, only, [*self.filters, *self.excludes])
+        if ordering_field_name in [None, 'id'] or redis_root._can_order_by_index(self.model, ordering_field_name):
+            batch_size = self.batch_size if stop is None else min(self.batch_size, max(stop, 10))
+            if ordering_field_name in [None, 'id']:
+                ids_batches = redis_root._get_query_ids_batches(
+                    self.model, self.filters, self.excludes, batch_size, reverse=reverse
+                )
+            else:
+                ids_batches = redis_root._get_ordered_query_ids_batches(
+                    self.model, self.filters, self.excludes, ordering_field_name, batch_size, reverse=reverse
+                )
+            offset = self.offset
+            if redis_root.save_type == 'fields' or (not self.filters and not self.excludes):
+                ids_batches = redis_root._slice_ids_batches(ids_batches, offset, stop, batch_size)
+                offset, stop = 0, None
+            instances = redis_root._iterate_instances(
+                self.model, ids_batches, self.filters, self.excludes, self.depth, identity_map, field_names
+            )
+            instances = (
+                {'id': instance_id, **instance_fields}
+                for instance_id, instance_fields in itertools.islice(instances, offset, stop)
+            )
+        else:
+            instances = [
+                {'id': instance_id, **instance_fields}
+                for instance_id, instance_fields in redis_root._iterate_instances(
+                    self.model,
+                    redis_root._get_query_ids_batches(self.model, self.filters, self.excludes, self.batch_size),
+                    self.filters,
+                    self.excludes,
+                    self.depth,
+                    identity_map,
+                    field_names
+                )
+            ]
+            instances = redis_root.order(instances, self.ordering)[self.offset:stop]
+        for instance in instances:
+            if project and self.fields is not None:
+                instance = {
+                    'id': instance['id'],
+                    **{
+                        field_name: instance[field_name]
+                        for field_name in self.fields
+                        if field_name in instance.keys()
+                    }
+                }
+            yield instance
 
 
 ### REDIS MODEL ###
@@ -1171,7 +4105,9 @@ class RedisModel:
         self.__model_data__ = {
             'redis_root': None,
             'name': None,
-            'fields': {},
+            'values': [],
+            'fields': None,
+            'extra': {},
             'meta': {},
         }
         
@@ -1186,15 +4122,33 @@ class RedisModel:
         else:
             raise Exception(f'{redis_root.__name__} type is {type(redis_root)}. Allowed only RedisRoot')
     
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.__fields__ = cls._collect_class_fields()
+        cls.__fields_positions__ = {field_name: position for position, field_name in enumerate(cls.__fields__)}
+    
     def _renew_fields(self):
-        class_fields = self.__class__.get_class_fields()
-        fields = {}
-        for field_name, field in class_fields.items():
-            fields[field_name] = self._get_initial_model_field(field_name)
-        self.__model_data__['fields'] = fields
+        self.__model_data__['values'] = [None] * len(self.__class__._get_fields())
+        self.__model_data__['fields'] = None
     
     @classmethod
     def get_class_fields(cls):
+        return dict(cls._get_fields())
+    
+    @classmethod
+    def _get_fields(cls):
+        if '__fields__' not in cls.__dict__:
+            cls.__fields__ = cls._collect_class_fields()
+        return cls.__fields__
+    
+    @classmethod
+    def _get_fields_positions(cls):
+        if '__fields_positions__' not in cls.__dict__:
+            cls.__fields_positions__ = {field_name: position for position, field_name in enumerate(cls._get_fields())}
+        return cls.__fields_positions__
+    
+    @classmethod
+    def _collect_class_fields(cls):
         field_names = dir(cls)
         fields = {}
         for field_name in field_names:
@@ -1203,112 +4157,133 @@ class RedisModel:
                 fields[field_name] = field_value
         return fields
     
-    def _get_initial_model_field(self, field_name):
-        name = self.get('name')
-        if field_name in dir(self.__class__):
-            return deepcopy(getattr(self.__class__, field_name))
-        else:
-            raise Exception(f'{name} has no field {field_name}')
+    def _get_instance_fields(self):
+        data = self.__model_data__
+        if data['fields'] is None:
+            positions = self.__class__._get_fields_positions()
+            fields = {}
+            for field_name, field in self.__class__._get_fields().items():
+                fields[field_name] = deepcopy(field)
+                fields[field_name].value = data['values'][positions[field_name]]
+            data['fields'] = fields
+        return data['fields']
+    
+    def _sync_fields_values(self):
+        data = self.__model_data__
+        if data['fields'] is not None:
+            for field_name, position in self.__class__._get_fields_positions().items():
+                data['values'][position] = data['fields'][field_name].value
     
     def _fill_fields_values(self, field_values_dict):
+        positions = self.__class__._get_fields_positions()
+        values = self.__model_data__['values']
         for name, value in field_values_dict.items():
-            fields = self.__model_data__['fields']
-            if name in fields.keys():
-                fields[name].value = value
+            if name in positions.keys():
+                values[positions[name]] = value
             else:
                 raise Exception(f'{self.__class__.__name__} has no field {name}')
     
     ### SAVE ###
     
     def save(self):
+        self._check_sync_redis_root('save')
         instance_key, fields_dict, deserialized_fields = self._serialize_data()
         self._set_fields(instance_key, fields_dict)
         return deserialized_fields
     
     def save_nb(self):
+        self._check_sync_redis_root('save_nb')
         instance_key, fields_dict, deserialized_fields = self._serialize_data()
-        asyncio.get_event_loop().create_task(
-            self._set_fields_async(instance_key, fields_dict)
-        )
+        self.get('redis_root')._run_nb(self._set_fields, instance_key, fields_dict)
         return deserialized_fields
     
-    def _serialize_data(self):
+    def _check_sync_redis_root(self, method_name):
+        redis_root = self.get('redis_root')
+        if isinstance(redis_root, AsyncRedisRoot):
+            raise Exception(
+                f'{method_name} is not supported by {redis_root.__class__.__name__}, '
+                f'use await redis_root.create({self.__class__.__name__}, ...)'
+            )
+    
+    def _serialize_data(self, instance_id=None):
         redis_root = self.get('redis_root')
         name = self.get('name')
-        fields = self.get('fields')
-        fields = dict(fields)
-        self._get_and_reserve_new_id()
-        fields['id'] = self.id
-        instance_key = f'{redis_root.prefix}:{name}:{self.id.value}'
+        self._sync_fields_values()
+        values = self.__model_data__['values']
+        fields = self.__model_data__['fields']
+        if instance_id is None:
+            self._get_and_reserve_new_id()
+        else:
+            self.set(id=instance_id)
+        instance_key = f'{redis_root.prefix}:{name}:{self.get("id")}'
         deserialized_fields = {}
         cleaned_fields = {}
-        for field_name, field in fields.items():
+        for position, (field_name, encode, decode) in enumerate(redis_root._get_model_codec(self.__class__)):
             try:
-                cleaned_value = field.clean()
+                cleaned_value = encode(values[position])
+                values[position] = cleaned_value
+                if fields is not None:
+                    fields[field_name].value = cleaned_value
                 cleaned_fields[field_name] = cleaned_value
-                deserialized_value = redis_root._deserialize_instance_field(self, field_name, cleaned_value)
-                deserialized_fields[field_name] = deserialized_value
+                deserialized_fields[field_name] = decode(cleaned_value)
             except BaseException as ex:
                 raise Exception(f'{ex} ({name} -> {field_name})')
+        if instance_id is None:
+            redis_root._resolve_relations(self.__class__, {self.get('id'): deserialized_fields})
         return instance_key, cleaned_fields, deserialized_fields
     
     def _get_and_reserve_new_id(self):
         redis_root = self.get('redis_root')
-        self.id.value = redis_root.get_and_reserve_new_id(self.__class__)
+        self.set(id=redis_root.get_and_reserve_new_id(self.__class__))
     
     def _set_fields(self, instance_key, fields_dict):
         redis_root = self.get('redis_root')
         prefix, model_name, instance_id = instance_key.split(':')
         instance_id = int(instance_id)
-        if redis_root.save_type == 'fields':
-            fields_dict = {
-                f'{instance_key}:{field_name}': field_value
-                for field_name, field_value in fields_dict.copy().items()
-            }
-            redis_root.redis_instance.mset(fields_dict)
-        elif redis_root.save_type == 'instances':
-            fields_data = json.dumps(fields_dict)
-            redis_root.redis_instance.set(instance_key, fields_data)
-        redis_root.remove_creating(self.__class__, instance_id)
-    
-    async def _set_fields_async(self, instance_key, fields_dict):
-        self._set_fields(instance_key, fields_dict)
+        pipeline = redis_root.redis_instance.pipeline()
+        redis_root._write_instance(pipeline, self.__class__, instance_id, fields_dict)
+        pipeline.execute()
     
     ### UTILS ###
     
     def set(self, force=False, **fields_with_values):
-        name = self.get('name')
-        fields = self.get('fields')
-        meta = self.get('meta')
+        data = self.__model_data__
+        positions = self.__class__._get_fields_positions()
+        meta = data['meta']
+        extra = data['extra']
         for field_name, value in fields_with_values.items():
-            if field_name in fields.keys():
-                field = fields[field_name]
-                field.value = value
-                return field.value
+            if field_name in positions.keys():
+                data['values'][positions[field_name]] = value
+                if data['fields'] is not None:
+                    data['fields'][field_name].value = value
+                return value
             elif field_name in meta.keys():
                 meta[field_name] = value
                 return meta[field_name]
+            elif field_name in extra.keys() or force:
+                extra[field_name] = value
+                return value
             else:
-                if force:
-                    fields[field_name] = value
-                else:
-                    raise Exception(f'{name} has no field {field_name}')
+                raise Exception(f'{data["name"]} has no field {field_name}')
     
     def get(self, field_name):
         data = self.__model_data__
-        fields = data['fields']
+        positions = self.__class__._get_fields_positions()
         meta = data['meta']
         redis_root = data['redis_root']
         name = data['name']
-        if field_name in fields.keys():
-            field = fields[field_name]
-            return field.value
+        if field_name in positions.keys():
+            if data['fields'] is not None:
+                return data['fields'][field_name].value
+            return data['values'][positions[field_name]]
         elif field_name in meta.keys():
             return meta[field_name]
+        elif field_name in data['extra'].keys():
+            return data['extra'][field_name]
         elif field_name == 'redis_root':
             return redis_root
         elif field_name == 'fields':
-            return fields
+            return self._get_instance_fields()
         elif field_name == 'name':
             return name
         elif field_name == 'meta':
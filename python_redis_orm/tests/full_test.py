@@ -2,6 +2,8 @@ import random
 import sys
 from time import sleep
 import asyncio
+import gc
+import multiprocessing
 import os
 
 
@@ -69,6 +71,20 @@ class ModelWithOverriddenSave(RedisModel):
         return super().save()
 
 
+class IndexedTaskChallenge(RedisModel):
+    bot_session = RedisForeignKey(model=BotSession, index=True)
+    task_id = RedisNumber(default=0, null=False, index=True)
+    status = RedisString(default='in_work', choices={
+        'in_work': 'В работе',
+        'completed': 'Завершён успешно',
+        'failed_bot': 'Зафейлил бот',
+    }, null=False, index=True)
+    checked = RedisBool(default=False, index=True)
+    price = RedisDecimal(default=0, index=True)
+    created = RedisDateTime(default=datetime.datetime.now, index=True)
+    deadline = RedisDate(default=datetime.date.today, index=True)
+
+
 class SomeAbstractModel(RedisModel):
     abstract_field = RedisString(default='hello')
 
@@ -666,6 +682,1705 @@ def inheritance_test(connection_pool, prefix):
     return have_exception
 
 
+def ids_index_test(connection_pool, prefix):
+    redis_root = RedisRoot(
+        prefix=prefix,
+        connection_pool=connection_pool,
+        ignore_deserialization_errors=True,
+    )
+    have_exception = False
+    try:
+        count = 100
+        reads_count = 20
+        unrelated_keys_count = 50000
+        for i in range(count):
+            redis_root.create(TaskChallenge, task_id=i)
+        
+        def measure_reads():
+            started_in = datetime.datetime.now()
+            for i in range(reads_count):
+                task_challenges = redis_root.get(TaskChallenge)
+                if len(task_challenges) != count or redis_root.count(TaskChallenge) != count:
+                    raise Exception('Wrong instances count')
+            ended_in = datetime.datetime.now()
+            return (ended_in - started_in).total_seconds()
+        
+        clean_time = measure_reads()
+        redis_instance = redis.Redis(connection_pool=connection_pool)
+        for i in range(0, unrelated_keys_count, 1000):
+            redis_instance.mset({
+                f'unrelated:{prefix}:{j}': j
+                for j in range(i, i + 1000)
+            })
+        flooded_time = measure_reads()
+        redis_root.delete(TaskChallenge, redis_root.get(TaskChallenge, task_id__lt=10))
+        redis_instance.delete(redis_root._get_ids_index_key(TaskChallenge.__name__))
+        redis_root.rebuild_ids_index([TaskChallenge])
+        if redis_root.count(TaskChallenge) != count - 10:
+            have_exception = True
+        flooded_percent = round((flooded_time / clean_time - 1) * 100, 2)
+        flooded_symbol = ('+' if flooded_percent > 0 else '')
+        print(f'{reads_count} reads of {count} instances: {clean_time}s, '
+              f'with {unrelated_keys_count} unrelated keys: {flooded_time}s ({flooded_symbol}{flooded_percent}%)')
+    except BaseException as ex:
+        print(ex)
+        have_exception = True
+    
+    clean_db_after_test(connection_pool, prefix)
+    return have_exception
+
+
+def create_task_challenges_worker(prefix, count, ids_block_size):
+    connection_pool = redis.ConnectionPool(
+        host=os.environ['REDIS_HOST'],
+        port=os.environ['REDIS_PORT'],
+        db=0,
+        decode_responses=True
+    )
+    redis_root = RedisRoot(
+        prefix=prefix,
+        connection_pool=connection_pool,
+        ignore_deserialization_errors=True,
+        solo_usage=False,
+        ids_block_size=ids_block_size
+    )
+    for i in range(count):
+        redis_root.create(TaskChallenge, task_id=i)
+
+
+def ids_allocation_test(connection_pool, prefix):
+    redis_root = RedisRoot(
+        prefix=prefix,
+        connection_pool=connection_pool,
+        ignore_deserialization_errors=True,
+        solo_usage=False
+    )
+    have_exception = False
+    try:
+        processes_count = 4
+        count = 250
+        for ids_block_size in [1, 50]:
+            processes = [
+                multiprocessing.Process(target=create_task_challenges_worker, args=(prefix, count, ids_block_size))
+                for i in range(processes_count)
+            ]
+            started_in = datetime.datetime.now()
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+            ended_in = datetime.datetime.now()
+            created_count = redis_root.count(TaskChallenge)
+            if created_count != processes_count * count:
+                have_exception = True
+            print(f'{processes_count} processes created {created_count}/{processes_count * count} instances '
+                  f'with ids_block_size = {ids_block_size} in {(ended_in - started_in).total_seconds()}s')
+            clean_db_after_test(connection_pool, prefix)
+    except BaseException as ex:
+        print(ex)
+        have_exception = True
+    
+    clean_db_after_test(connection_pool, prefix)
+    return have_exception
+
+
+def bulk_create_test(connection_pool, prefix):
+    redis_root = RedisRoot(
+        prefix=prefix,
+        connection_pool=connection_pool,
+        ignore_deserialization_errors=True,
+    )
+    have_exception = False
+    try:
+        count = 1000
+        params_list = [
+            {'task_id': i, 'status': 'completed'}
+            for i in range(count)
+        ]
+        started_in = datetime.datetime.now()
+        for params in params_list:
+            redis_root.create(TaskChallenge, **params)
+        ended_in = datetime.datetime.now()
+        create_time = (ended_in - started_in).total_seconds()
+        clean_db_after_test(connection_pool, prefix)
+        
+        started_in = datetime.datetime.now()
+        created_instances = redis_root.bulk_create(TaskChallenge, params_list, batch_size=300)
+        ended_in = datetime.datetime.now()
+        bulk_create_time = (ended_in - started_in).total_seconds()
+        task_challenges = redis_root.get(TaskChallenge, status='completed')
+        if len(created_instances) != count or len(task_challenges) != count:
+            have_exception = True
+        elif len(set(instance['id'] for instance in created_instances)) != count:
+            have_exception = True
+        elif sorted(task_challenges, key=lambda instance: instance['id']) != created_instances:
+            have_exception = True
+        bulk_percent = round((create_time / bulk_create_time - 1) * 100, 2)
+        bulk_symbol = ('+' if bulk_percent > 0 else '')
+        print(f'bulk_create gives {bulk_symbol}{bulk_percent}% efficiency')
+    except BaseException as ex:
+        print(ex)
+        have_exception = True
+    
+    clean_db_after_test(connection_pool, prefix)
+    return have_exception
+
+
+def bulk_update_test(connection_pool, prefix):
+    redis_root = RedisRoot(
+        prefix=prefix,
+        connection_pool=connection_pool,
+        ignore_deserialization_errors=True,
+    )
+    have_exception = False
+    try:
+        count = 500
+        task_challenges = redis_root.bulk_create(TaskChallenge, [{'task_id': i} for i in range(count)])
+        started_in = datetime.datetime.now()
+        for task_challenge in task_challenges:
+            redis_root.update(TaskChallenge, task_challenge, account_checks_count=task_challenge['task_id'])
+        ended_in = datetime.datetime.now()
+        update_time = (ended_in - started_in).total_seconds()
+        
+        started_in = datetime.datetime.now()
+        redis_root.bulk_update(TaskChallenge, [
+            {'id': task_challenge['id'], 'account_checks_count': task_challenge['task_id'] * 2, 'status': 'completed'}
+            for task_challenge in task_challenges
+        ])
+        ended_in = datetime.datetime.now()
+        bulk_update_time = (ended_in - started_in).total_seconds()
+        task_challenges = redis_root.get(TaskChallenge, status='completed')
+        if len(task_challenges) != count:
+            have_exception = True
+        elif any(task_challenge['account_checks_count'] != task_challenge['task_id'] * 2 for task_challenge in task_challenges):
+            have_exception = True
+        
+        redis_root.update(TaskChallenge, account_checks_count=1)
+        if redis_root.count(TaskChallenge, account_checks_count=1) != count:
+            have_exception = True
+        bulk_percent = round((update_time / bulk_update_time - 1) * 100, 2)
+        bulk_symbol = ('+' if bulk_percent > 0 else '')
+        print(f'bulk_update gives {bulk_symbol}{bulk_percent}% efficiency')
+    except BaseException as ex:
+        print(ex)
+        have_exception = True
+    
+    clean_db_after_test(connection_pool, prefix)
+    return have_exception
+
+
+def save_types_test(connection_pool, prefix):
+    have_exception = False
+    try:
+        count = 1000
+        reads_count = 5
+        redis_instance = redis.Redis(connection_pool=connection_pool)
+        
+        def get_used_memory():
+            keys = list(redis_instance.keys(f'*{prefix}*'))
+            pipeline = redis_instance.pipeline(transaction=False)
+            for key in keys:
+                pipeline.memory_usage(key)
+            return sum(pipeline.execute())
+        
+        for save_type in ['fields', 'instances', 'hash']:
+            redis_root = RedisRoot(
+                prefix=prefix,
+                connection_pool=connection_pool,
+                ignore_deserialization_errors=True,
+                save_type=save_type
+            )
+            redis_root.bulk_create(TaskChallenge, [{'task_id': i} for i in range(count)])
+            used_memory = get_used_memory()
+            started_in = datetime.datetime.now()
+            for i in range(reads_count):
+                task_challenges = redis_root.get(TaskChallenge)
+            ended_in = datetime.datetime.now()
+            read_time = (ended_in - started_in).total_seconds()
+            started_in = datetime.datetime.now()
+            for i in range(reads_count):
+                redis_root.update(TaskChallenge, task_challenges, account_checks_count=i)
+            ended_in = datetime.datetime.now()
+            update_time = (ended_in - started_in).total_seconds()
+            if redis_root.count(TaskChallenge, account_checks_count=reads_count - 1) != count:
+                have_exception = True
+            print(f'save_type = {save_type}: {used_memory} bytes, '
+                  f'{reads_count} reads took {read_time}s, {reads_count} updates took {update_time}s')
+            clean_db_after_test(connection_pool, prefix)
+    except BaseException as ex:
+        print(ex)
+        have_exception = True
+    
+    clean_db_after_test(connection_pool, prefix)
+    return have_exception
+
+
+def range_index_test(connection_pool, prefix):
+    have_exception = False
+    try:
+        count = 2000
+        started = datetime.datetime(2021, 1, 1)
+        params_list = [
+            {
+                'task_id': i,
+                'price': decimal.Decimal(i) / 10,
+                'created': started + datetime.timedelta(minutes=i),
+                'deadline': started.date() + datetime.timedelta(days=i),
+            }
+            for i in range(count)
+        ]
+        for save_type in ['instances', 'fields', 'hash']:
+            redis_root = RedisRoot(
+                prefix=prefix,
+                connection_pool=connection_pool,
+                ignore_deserialization_errors=True,
+                save_type=save_type
+            )
+            redis_root.bulk_create(IndexedTaskChallenge, params_list)
+            redis_root.bulk_create(TaskChallenge, [{'task_id': i} for i in range(count)])
+            checks = [
+                (redis_root.get(IndexedTaskChallenge, task_id__gte=count - 10), 10),
+                (redis_root.get(IndexedTaskChallenge, task_id__gt=count - 10), 9),
+                (redis_root.get(IndexedTaskChallenge, task_id=5), 1),
+                (redis_root.get(IndexedTaskChallenge, task_id__range=5), 5),
+                (redis_root.get(IndexedTaskChallenge, price__lt=decimal.Decimal('1.5')), 15),
+                (redis_root.get(IndexedTaskChallenge, created__gte=started + datetime.timedelta(minutes=count - 10)), 10),
+                (redis_root.get(IndexedTaskChallenge, deadline__lte=started.date() + datetime.timedelta(days=4)), 5),
+                (redis_root.get(IndexedTaskChallenge, task_id__lt=100, price__gte=5), 50),
+                (redis_root.count(IndexedTaskChallenge, task_id__lt=100), 100),
+            ]
+            for result, expected_count in checks:
+                if type(result) == list:
+                    result = len(result)
+                if result != expected_count:
+                    have_exception = True
+            redis_root.update(IndexedTaskChallenge, redis_root.get(IndexedTaskChallenge, task_id=5), task_id=count * 2)
+            if len(redis_root.get(IndexedTaskChallenge, task_id__gte=count * 2)) != 1:
+                have_exception = True
+            redis_root.delete(IndexedTaskChallenge, redis_root.get(IndexedTaskChallenge, task_id__gte=count * 2))
+            redis_root.redis_instance.delete(redis_root._get_index_key(IndexedTaskChallenge.__name__, 'task_id'))
+            redis_root.rebuild_indexes([IndexedTaskChallenge])
+            if redis_root.count(IndexedTaskChallenge, task_id__lt=10) != 9:
+                have_exception = True
+            
+            started_in = datetime.datetime.now()
+            redis_root.get(TaskChallenge, task_id__gte=count - 10)
+            ended_in = datetime.datetime.now()
+            not_indexed_time = (ended_in - started_in).total_seconds()
+            started_in = datetime.datetime.now()
+            redis_root.get(IndexedTaskChallenge, task_id__gte=count - 10)
+            ended_in = datetime.datetime.now()
+            indexed_time = (ended_in - started_in).total_seconds()
+            index_percent = round((not_indexed_time / indexed_time - 1) * 100, 2)
+            index_symbol = ('+' if index_percent > 0 else '')
+            print(f'save_type = {save_type}: range index gives {index_symbol}{index_percent}% efficiency')
+            clean_db_after_test(connection_pool, prefix)
+    except BaseException as ex:
+        print(ex)
+        have_exception = True
+    
+    clean_db_after_test(connection_pool, prefix)
+    return have_exception
+
+
+def exact_index_test(connection_pool, prefix):
+    have_exception = False
+    try:
+        count = 600
+        statuses = ['in_work', 'completed', 'failed_bot']
+        for save_type in ['instances', 'fields', 'hash']:
+            redis_root = RedisRoot(
+                prefix=prefix,
+                connection_pool=connection_pool,
+                ignore_deserialization_errors=True,
+                save_type=save_type
+            )
+            bot_sessions = [redis_root.create(BotSession) for i in range(3)]
+            params_list = [
+                {
+                    'task_id': i,
+                    'bot_session': (None if i % 10 == 0 else bot_sessions[i % 3]),
+                    'status': statuses[i % 3],
+                    'checked': (i % 2 == 0),
+                }
+                for i in range(count)
+            ]
+            redis_root.bulk_create(IndexedTaskChallenge, params_list)
+            
+            def expected(check):
+                return len([params for params in params_list if check(params)])
+            
+            checks = [
+                (redis_root.get(IndexedTaskChallenge, status='completed'), expected(lambda params: params['status'] == 'completed')),
+                (redis_root.get(IndexedTaskChallenge, status__in=['completed', 'failed_bot']), expected(lambda params: params['status'] != 'in_work')),
+                (redis_root.get(IndexedTaskChallenge, checked=True, status='in_work'), expected(lambda params: params['checked'] and params['status'] == 'in_work')),
+                (redis_root.get(IndexedTaskChallenge, bot_session=bot_sessions[1]), expected(lambda params: params['bot_session'] == bot_sessions[1])),
+                (redis_root.count(IndexedTaskChallenge, status='failed_bot', task_id__lt=300), expected(lambda params: params['status'] == 'failed_bot' and params['task_id'] < 300)),
+                (redis_root.get(IndexedTaskChallenge, status__in=[]), 0),
+            ]
+            if save_type != 'fields':
+                checks.append((redis_root.get(IndexedTaskChallenge, bot_session__isnull=True), expected(lambda params: params['bot_session'] is None)))
+            for result, expected_count in checks:
+                if type(result) == list:
+                    result = len(result)
+                if result != expected_count:
+                    have_exception = True
+            
+            redis_root.update(IndexedTaskChallenge, redis_root.get(IndexedTaskChallenge, status='in_work'), status='completed')
+            redis_root.bulk_update(IndexedTaskChallenge, [{'id': 1, 'status': 'in_work'}])
+            if redis_root.count(IndexedTaskChallenge, status='in_work') != 1:
+                have_exception = True
+            redis_root.delete(IndexedTaskChallenge, redis_root.get(IndexedTaskChallenge, status='completed'))
+            members_key = redis_root._get_index_member_key(IndexedTaskChallenge.__name__, 'status', 'completed')
+            if redis_root.redis_instance.scard(members_key) != 0:
+                have_exception = True
+            
+            redis_root.bulk_create(IndexedTaskChallenge, params_list)
+            started_in = datetime.datetime.now()
+            redis_root.get(IndexedTaskChallenge, status__iexact='completed')
+            ended_in = datetime.datetime.now()
+            not_indexed_time = (ended_in - started_in).total_seconds()
+            started_in = datetime.datetime.now()
+            redis_root.get(IndexedTaskChallenge, status='completed')
+            ended_in = datetime.datetime.now()
+            indexed_time = (ended_in - started_in).total_seconds()
+            index_percent = round((not_indexed_time / indexed_time - 1) * 100, 2)
+            index_symbol = ('+' if index_percent > 0 else '')
+            print(f'save_type = {save_type}: exact index gives {index_symbol}{index_percent}% efficiency')
+            clean_db_after_test(connection_pool, prefix)
+    except BaseException as ex:
+        print(ex)
+        have_exception = True
+    
+    clean_db_after_test(connection_pool, prefix)
+    return have_exception
+
+
+def queryset_test(connection_pool, prefix):
+    have_exception = False
+    try:
+        count = 300
+        statuses = ['in_work', 'completed', 'failed_bot']
+        for save_type in ['instances', 'fields', 'hash']:
+            redis_root = RedisRoot(
+                prefix=prefix,
+                connection_pool=connection_pool,
+                ignore_deserialization_errors=True,
+                save_type=save_type
+            )
+            params_list = [
+                {
+                    'task_id': i,
+                    'status': statuses[i % 3],
+                    'checked': (i % 2 == 0),
+                }
+                for i in range(count)
+            ]
+            redis_root.bulk_create(IndexedTaskChallenge, params_list)
+            
+            queryset = redis_root.query(IndexedTaskChallenge)
+            completed = queryset.filter(status='completed')
+            completed_checked = completed.exclude(checked=False)
+            if len(list(completed)) != count // 3:
+                have_exception = True
+            if completed_checked.count() != len([i for i in range(count) if i % 3 == 1 and i % 2 == 0]):
+                have_exception = True
+            if [instance['task_id'] for instance in completed_checked[:3]] != [4, 10, 16]:
+                have_exception = True
+            if completed_checked.order_by('-task_id').first()['task_id'] != 298:
+                have_exception = True
+            if completed.order_by('-id')[1]['task_id'] != 295:
+                have_exception = True
+            if list(queryset.filter(task_id__gte=10).only('status')[:1]) != [{'id': 11, 'status': 'completed'}]:
+                have_exception = True
+            if queryset.filter(status='completed', task_id__lt=0).exists() or not completed.exists():
+                have_exception = True
+            if queryset[10:].count() != count - 10 or len(queryset[10:20]) != 10:
+                have_exception = True
+            if queryset.filter(status__in=[]).first() is not None:
+                have_exception = True
+            clean_db_after_test(connection_pool, prefix)
+    except BaseException as ex:
+        print(ex)
+        have_exception = True
+    
+    clean_db_after_test(connection_pool, prefix)
+    return have_exception
+
+
+def iterate_test(connection_pool, prefix):
+    have_exception = False
+    try:
+        count = 2500
+        statuses = ['in_work', 'completed', 'failed_bot']
+        for save_type in ['instances', 'fields', 'hash']:
+            redis_root = RedisRoot(
+                prefix=prefix,
+                connection_pool=connection_pool,
+                ignore_deserialization_errors=True,
+                save_type=save_type
+            )
+            params_list = [
+                {
+                    'task_id': i,
+                    'status': statuses[i % 3],
+                }
+                for i in range(count)
+            ]
+            redis_root.bulk_create(IndexedTaskChallenge, params_list)
+            
+            iterated_ids = [instance['id'] for instance in redis_root.iterate(IndexedTaskChallenge, batch_size=300)]
+            if iterated_ids != list(range(1, count + 1)):
+                have_exception = True
+            completed = list(redis_root.iterate(IndexedTaskChallenge, batch_size=300, status='completed', task_id__gte=1000))
+            if len(completed) != len(redis_root.get(IndexedTaskChallenge, status='completed', task_id__gte=1000)):
+                have_exception = True
+            if not completed or any(instance['status'] != 'completed' for instance in completed):
+                have_exception = True
+            if list(redis_root.iterate(IndexedTaskChallenge, status__in=[])):
+                have_exception = True
+            
+            instances = redis_root.iterate(IndexedTaskChallenge, batch_size=100)
+            first_instance = next(instances)
+            redis_root.delete(IndexedTaskChallenge, redis_root.get(IndexedTaskChallenge, task_id__gte=200))
+            if first_instance['id'] != 1 or len([first_instance, *instances]) != 200:
+                have_exception = True
+
+            clean_db_after_test(connection_pool, prefix)
+    except BaseException as ex:
+        print(ex)
+        have_exception = True
+    
+    clean_db_after_test(connection_pool, prefix)
+    return have_exception
+
+
+def select_related_test(connection_pool, prefix):
+    have_exception = False
+    try:
+        for save_type in ['instances', 'fields', 'hash']:
+            redis_root = RedisRoot(
+                prefix=prefix,
+                connection_pool=connection_pool,
+                ignore_deserialization_errors=True,
+                save_type=save_type
+            )
+            bot_sessions = redis_root.bulk_create(BotSession, [{} for i in range(3)])
+            task_challenges = redis_root.bulk_create(TaskChallenge, [
+                {
+                    'bot_session': bot_sessions[i % 3],
+                    'task_id': i,
+                    'status': ('completed' if i % 2 else 'in_work'),
+                }
+                for i in range(30)
+            ])
+            redis_root.bulk_create(ForeignKeyCheckModel, [
+                {'task_challenge': task_challenges[i % 30]}
+                for i in range(300)
+            ])
+            
+            mget_calls_before = redis_root.redis_instance.info('commandstats').get('cmdstat_mget', {}).get('calls', 0)
+            instances = redis_root.get(ForeignKeyCheckModel)
+            mget_calls_after = redis_root.redis_instance.info('commandstats').get('cmdstat_mget', {}).get('calls', 0)
+            if save_type != 'hash' and mget_calls_after - mget_calls_before > 3:
+                have_exception = True
+            if instances[0]['task_challenge']['bot_session']['session_token'] != bot_sessions[0]['session_token']:
+                have_exception = True
+            
+            instances = redis_root.get(ForeignKeyCheckModel, depth=0)
+            if instances[1]['task_challenge'] != {'id': task_challenges[1]['id']}:
+                have_exception = True
+            instances = list(redis_root.iterate(ForeignKeyCheckModel, batch_size=50, depth=1))
+            if len(instances) != 300 or instances[2]['task_challenge']['bot_session'] != {'id': bot_sessions[2]['id']}:
+                have_exception = True
+            if save_type != 'fields':
+                instances = redis_root.query(ForeignKeyCheckModel).filter(task_challenge__status='completed').select_related(1)
+                if len(instances) != 150 or any(instance['task_challenge']['status'] != 'completed' for instance in instances):
+                    have_exception = True
+                if redis_root.count(ForeignKeyCheckModel, task_challenge__status='completed') != 150:
+                    have_exception = True
+            clean_db_after_test(connection_pool, prefix)
+    except BaseException as ex:
+        print(ex)
+        have_exception = True
+    
+    clean_db_after_test(connection_pool, prefix)
+    return have_exception
+
+
+def many_to_many_prefetch_test(connection_pool, prefix):
+    redis_root = RedisRoot(
+        prefix=prefix,
+        connection_pool=connection_pool,
+        ignore_deserialization_errors=True,
+    )
+    have_exception = False
+    try:
+        count = 10000
+        links_count = 20
+        task_challenges = redis_root.bulk_create(TaskChallenge, [{'task_id': i} for i in range(500)])
+        params_list = [
+            {'task_challenges': random.sample(task_challenges, links_count)}
+            for i in range(count)
+        ]
+        redis_root.bulk_create(ManyToManyCheckModel, params_list)
+        
+        mget_calls_before = redis_root.redis_instance.info('commandstats').get('cmdstat_mget', {}).get('calls', 0)
+        started_in = datetime.datetime.now()
+        instances = redis_root.get(ManyToManyCheckModel)
+        ended_in = datetime.datetime.now()
+        prefetch_time = (ended_in - started_in).total_seconds()
+        mget_calls_after = redis_root.redis_instance.info('commandstats').get('cmdstat_mget', {}).get('calls', 0)
+        if mget_calls_after - mget_calls_before > 3:
+            have_exception = True
+        if len(instances) != count:
+            have_exception = True
+        for instance, params in zip(instances, params_list):
+            if [task_challenge['id'] for task_challenge in instance['task_challenges']] != sorted(
+                task_challenge['id'] for task_challenge in params['task_challenges']
+            ):
+                have_exception = True
+        
+        started_in = datetime.datetime.now()
+        instances = redis_root.get(ManyToManyCheckModel, return_dict=True, depth=0)
+        for instance_id, instance_fields in instances.items():
+            redis_root._resolve_relations(ManyToManyCheckModel, {instance_id: instance_fields})
+        ended_in = datetime.datetime.now()
+        per_row_time = (ended_in - started_in).total_seconds()
+        prefetch_percent = round((per_row_time / prefetch_time - 1) * 100, 2)
+        prefetch_symbol = ('+' if prefetch_percent > 0 else '')
+        print(f'{count} rows x {links_count} links: prefetch gives {prefetch_symbol}{prefetch_percent}% efficiency')
+    except BaseException as ex:
+        print(ex)
+        have_exception = True
+    
+    clean_db_after_test(connection_pool, prefix)
+    return have_exception
+
+
+def lazy_relations_test(connection_pool, prefix):
+    have_exception = False
+    try:
+        for save_type in ['instances', 'fields', 'hash']:
+            redis_root = RedisRoot(
+                prefix=prefix,
+                connection_pool=connection_pool,
+                ignore_deserialization_errors=True,
+                save_type=save_type
+            )
+            bot_sessions = redis_root.bulk_create(BotSession, [{} for i in range(3)])
+            task_challenges = redis_root.bulk_create(TaskChallenge, [
+                {'bot_session': bot_sessions[i % 3], 'task_id': i}
+                for i in range(10)
+            ])
+            redis_root.bulk_create(ForeignKeyCheckModel, [
+                {'task_challenge': task_challenges[i % 10]}
+                for i in range(100)
+            ])
+            
+            instances = redis_root.get(ForeignKeyCheckModel, lazy=True)
+            if any(instance['task_challenge']['id'] != (i % 10) + 1 for i, instance in enumerate(instances)):
+                have_exception = True
+            if instances[0]['task_challenge'] is not instances[10]['task_challenge']:
+                have_exception = True
+            if instances[5]['task_challenge'].bot_session.session_token != bot_sessions[2]['session_token']:
+                have_exception = True
+            if instances[0] != redis_root.get(ForeignKeyCheckModel)[0]:
+                have_exception = True
+            instances = list(redis_root.query(ForeignKeyCheckModel).lazy()[:3])
+            redis_root.update(ForeignKeyCheckModel, instances[:2], task_challenge=instances[2]['task_challenge'])
+            if redis_root.get(ForeignKeyCheckModel, depth=1)[0]['task_challenge']['task_id'] != 2:
+                have_exception = True
+            clean_db_after_test(connection_pool, prefix)
+    except BaseException as ex:
+        print(ex)
+        have_exception = True
+    
+    clean_db_after_test(connection_pool, prefix)
+    return have_exception
+
+
+def codec_test(connection_pool, prefix):
+    redis_root = RedisRoot(
+        prefix=prefix,
+        connection_pool=connection_pool,
+        ignore_deserialization_errors=False,
+        save_type='instances'
+    )
+    have_exception = False
+    try:
+        count = 5000
+        params_list = [
+            {
+                'task_id': i,
+                'status': ('completed' if i % 2 else 'in_work'),
+                'checked': (i % 3 == 0),
+                'price': decimal.Decimal(f'{i}.5'),
+                'created': datetime.datetime(2021, 1, 1, 12, 30) + datetime.timedelta(minutes=i),
+                'deadline': datetime.date(2021, 1, 1) + datetime.timedelta(days=i % 100),
+            }
+            for i in range(count)
+        ]
+        created_instances = redis_root.bulk_create(IndexedTaskChallenge, params_list)
+        instance = IndexedTaskChallenge(redis_root=redis_root, **params_list[7]).save()
+        if {**instance, 'id': created_instances[7]['id']} != created_instances[7]:
+            have_exception = True
+        raw_instances = redis_root._get_raw_instances_by_ids(IndexedTaskChallenge.__name__)
+        lookup_instances = {
+            instance_id: {
+                field_name: redis_root._deserialize_value_by_field_instance(
+                    redis_root._get_field_instance_by_name(IndexedTaskChallenge, field_name),
+                    raw_value
+                )
+                for field_name, raw_value in raw_fields.items()
+            }
+            for instance_id, raw_fields in raw_instances.items()
+        }
+        
+        decoders = redis_root._get_model_decoders(IndexedTaskChallenge)
+        started_in = datetime.datetime.now()
+        codec_instances = {
+            instance_id: {
+                field_name: decoders[field_name](raw_value)
+                for field_name, raw_value in raw_fields.items()
+            }
+            for instance_id, raw_fields in raw_instances.items()
+        }
+        ended_in = datetime.datetime.now()
+        codec_rows_per_second = round(count / (ended_in - started_in).total_seconds())
+        print(f'decoding: {codec_rows_per_second} rows/sec with compiled codec')
+        
+        if lookup_instances != codec_instances:
+            have_exception = True
+        if [{'id': instance_id, **fields} for instance_id, fields in codec_instances.items()][:count] != created_instances:
+            have_exception = True
+    except BaseException as ex:
+        print(ex)
+        have_exception = True
+    
+    clean_db_after_test(connection_pool, prefix)
+    return have_exception
+
+
+def fields_metadata_test(connection_pool, prefix):
+    have_exception = False
+    try:
+        fields = InheritanceTestModel.get_class_fields()
+        if list(fields.keys()) != ['abstract_field', 'id', 'some_field']:
+            have_exception = True
+        fields.pop('some_field')
+        if InheritanceTestModel._get_fields() is not InheritanceTestModel.__dict__['__fields__']:
+            have_exception = True
+        if 'some_field' not in InheritanceTestModel._get_fields().keys():
+            have_exception = True
+        if 'some_field' in SomeAbstractModel._get_fields().keys():
+            have_exception = True
+        
+        count = 10000
+        started_in = datetime.datetime.now()
+        for i in range(count):
+            IndexedTaskChallenge._collect_class_fields()
+        ended_in = datetime.datetime.now()
+        collect_time = (ended_in - started_in).total_seconds()
+        started_in = datetime.datetime.now()
+        for i in range(count):
+            IndexedTaskChallenge._get_fields()
+        ended_in = datetime.datetime.now()
+        cached_time = (ended_in - started_in).total_seconds()
+        cache_percent = round((collect_time / cached_time - 1) * 100, 2)
+        cache_symbol = ('+' if cache_percent > 0 else '')
+        print(f'cached fields metadata gives {cache_symbol}{cache_percent}% efficiency')
+    except BaseException as ex:
+        print(ex)
+        have_exception = True
+    
+    clean_db_after_test(connection_pool, prefix)
+    return have_exception
+
+
+def model_values_test(connection_pool, prefix):
+    redis_root = RedisRoot(
+        prefix=prefix,
+        connection_pool=connection_pool,
+        ignore_deserialization_errors=True,
+    )
+    have_exception = False
+    try:
+        instance = IndexedTaskChallenge(redis_root=redis_root, task_id=5, status='completed')
+        if instance.get('task_id') != 5 or instance.get('checked') is not None:
+            have_exception = True
+        instance.set(checked=True)
+        instance.set(note='not stored', force=True)
+        saved_instance = instance.save()
+        if saved_instance['checked'] is not True or 'note' in saved_instance.keys():
+            have_exception = True
+        if instance.get('id') != saved_instance['id'] or instance.get('note') != 'not stored':
+            have_exception = True
+        if RedisModel.id.value is not None or IndexedTaskChallenge.task_id.value is not None:
+            have_exception = True
+        if 'task_id' not in instance.get('fields').keys():
+            have_exception = True
+        other_instance = IndexedTaskChallenge(redis_root=redis_root, task_id=6)
+        fields = other_instance.get('fields')
+        if fields['task_id'] is IndexedTaskChallenge._get_fields()['task_id'] or fields['task_id'].value != 6:
+            have_exception = True
+        fields['task_id'].value = 7
+        if IndexedTaskChallenge.task_id.value is not None or instance.get('fields')['task_id'].value == 7:
+            have_exception = True
+        if other_instance.get('task_id') != 7 or other_instance.save()['task_id'] != 7:
+            have_exception = True
+        other_instance.set(task_id=8)
+        if fields['task_id'].value != 8:
+            have_exception = True
+        
+        count = 10000
+        started_in = datetime.datetime.now()
+        for i in range(count):
+            IndexedTaskChallenge(redis_root=redis_root, task_id=i, status='completed')
+        ended_in = datetime.datetime.now()
+        instances_per_second = round(count / (ended_in - started_in).total_seconds())
+        print(f'{instances_per_second} model instances per second')
+    except BaseException as ex:
+        print(ex)
+        have_exception = True
+    
+    clean_db_after_test(connection_pool, prefix)
+    return have_exception
+
+
+def async_test(connection_pool, prefix):
+    have_exception = False
+    try:
+        
+        async def run_async_test(save_type):
+            test_failed = False
+            async_connection_pool = redis_asyncio.ConnectionPool(
+                host=connection_pool.connection_kwargs['host'],
+                port=connection_pool.connection_kwargs['port'],
+                db=connection_pool.connection_kwargs['db'],
+            )
+            redis_root = AsyncRedisRoot(
+                prefix=prefix,
+                connection_pool=async_connection_pool,
+                ignore_deserialization_errors=True,
+                save_type=save_type
+            )
+            bot_session = await redis_root.create(BotSession)
+            task_challenges = await asyncio.gather(*[
+                redis_root.create(
+                    IndexedTaskChallenge,
+                    bot_session=bot_session,
+                    task_id=i,
+                    status=('completed' if i % 2 else 'in_work')
+                )
+                for i in range(20)
+            ])
+            if len({task_challenge['id'] for task_challenge in task_challenges}) != 20:
+                test_failed = True
+            shared_redis_root = AsyncRedisRoot(
+                prefix=prefix,
+                connection_pool=async_connection_pool,
+                ignore_deserialization_errors=True,
+                save_type=save_type,
+                solo_usage=False,
+                ids_block_size=10
+            )
+            ids_lists = await asyncio.gather(*[shared_redis_root.reserve_ids(IndexedTaskChallenge, i) for i in range(1, 8)])
+            ids = [instance_id for ids_list in ids_lists for instance_id in ids_list]
+            if len(set(ids)) != 28 or not isinstance(shared_redis_root.reserved_ids[IndexedTaskChallenge], range):
+                test_failed = True
+            completed_task_challenges = await redis_root.get(IndexedTaskChallenge, status='completed')
+            if len(completed_task_challenges) != 10:
+                test_failed = True
+            if completed_task_challenges[0]['bot_session']['session_token'] != bot_session['session_token']:
+                test_failed = True
+            if await redis_root.count(IndexedTaskChallenge, task_id__gte=15) != 5:
+                test_failed = True
+            updated_task_challenges = await redis_root.update(IndexedTaskChallenge, completed_task_challenges, status='failed_bot')
+            if [task_challenge['task_id'] for task_challenge in updated_task_challenges] != list(range(1, 20, 2)):
+                test_failed = True
+            counts = await asyncio.gather(
+                redis_root.count(IndexedTaskChallenge, status='completed'),
+                redis_root.count(IndexedTaskChallenge, status='failed_bot'),
+            )
+            if counts != [0, 10]:
+                test_failed = True
+            await redis_root.delete(IndexedTaskChallenge, task_challenges[:5])
+            if await redis_root.count(IndexedTaskChallenge) != 15:
+                test_failed = True
+            sync_redis_root = RedisRoot(
+                prefix=prefix,
+                connection_pool=connection_pool,
+                ignore_deserialization_errors=True,
+                save_type=save_type
+            )
+            if sync_redis_root.count(IndexedTaskChallenge, status='failed_bot') != 8:
+                test_failed = True
+            reserved_id = await redis_root.get_and_reserve_new_id(IndexedTaskChallenge)
+            if type(reserved_id) != int or reserved_id <= task_challenges[-1]['id']:
+                test_failed = True
+            projected_task_challenges = await redis_root.get(IndexedTaskChallenge, only=['task_id'], status='failed_bot')
+            if projected_task_challenges != sync_redis_root.get(IndexedTaskChallenge, only=['task_id'], status='failed_bot'):
+                test_failed = True
+            if len(projected_task_challenges) != 8 or set(projected_task_challenges[0].keys()) != {'id', 'task_id'}:
+                test_failed = True
+            try:
+                await redis_root.get(IndexedTaskChallenge, lazy=True)
+                test_failed = True
+            except Exception:
+                pass
+            for method_name in [
+                'query', 'batch', 'iterate', 'values_list', 'aggregate', 'group_count', 'bulk_update',
+                'create_nb', 'update_nb', 'delete_nb', 'flush', 'join', 'fast_get_keys', 'fast_get_keys_values',
+                'collect_keys', 'rebuild_ids_index', 'rebuild_indexes',
+            ]:
+                try:
+                    getattr(redis_root, method_name)(IndexedTaskChallenge)
+                    test_failed = True
+                except Exception as ex:
+                    if 'is not supported by AsyncRedisRoot' not in f'{ex}':
+                        test_failed = True
+            for method_name in ['save', 'save_nb']:
+                try:
+                    getattr(IndexedTaskChallenge(redis_root=redis_root, task_id=100), method_name)()
+                    test_failed = True
+                except Exception as ex:
+                    if 'is not supported by AsyncRedisRoot' not in f'{ex}':
+                        test_failed = True
+            if await redis_root.count(IndexedTaskChallenge) != 15:
+                test_failed = True
+            await redis_root.close()
+            return test_failed
+        
+        loop = asyncio.new_event_loop()
+        for save_type in ['instances', 'hash']:
+            if loop.run_until_complete(run_async_test(save_type)):
+                have_exception = True
+            clean_db_after_test(connection_pool, prefix)
+        loop.close()
+        
+        try:
+            AsyncRedisRoot(prefix=prefix, save_type='fields')
+            have_exception = True
+        except Exception:
+            pass
+        try:
+            AsyncRedisRoot(prefix=prefix, save_type='hash', filter_engine='lua')
+            have_exception = True
+        except Exception:
+            pass
+    except BaseException as ex:
+        print(ex)
+        have_exception = True
+    
+    clean_db_after_test(connection_pool, prefix)
+    return have_exception
+
+
+def nb_thread_test(connection_pool, prefix):
+    have_exception = False
+    try:
+        redis_root = RedisRoot(
+            prefix=prefix,
+            connection_pool=connection_pool,
+            ignore_deserialization_errors=True,
+            nb_backend='thread',
+            nb_pool_size=2,
+            nb_max_pending=4
+        )
+        task_challenges = [
+            redis_root.create_nb(TaskChallenge, task_id=i)
+            for i in range(200)
+        ]
+        redis_root.flush()
+        if redis_root.count(TaskChallenge) != 200:
+            have_exception = True
+        redis_root.update_nb(TaskChallenge, task_challenges[:100], status='completed')
+        redis_root.delete_nb(TaskChallenge, task_challenges[150:])
+        redis_root.join()
+        if redis_root.count(TaskChallenge, status='completed') != 100 or redis_root.count(TaskChallenge) != 150:
+            have_exception = True
+        
+        broken_redis_root = RedisRoot(
+            prefix=prefix,
+            connection_pool=redis.ConnectionPool(host='localhost', port=1, decode_responses=True),
+            ignore_deserialization_errors=True,
+            nb_backend='thread'
+        )
+        broken_redis_root.create_nb(BotSession)
+        try:
+            broken_redis_root.join()
+            have_exception = True
+        except Exception:
+            pass
+        broken_redis_root.join()
+    except BaseException as ex:
+        print(ex)
+        have_exception = True
+    
+    clean_db_after_test(connection_pool, prefix)
+    return have_exception
+
+
+def write_behind_test(connection_pool, prefix):
+    have_exception = False
+    try:
+        for save_type in ['instances', 'fields', 'hash']:
+            redis_root = RedisRoot(
+                prefix=prefix,
+                connection_pool=connection_pool,
+                ignore_deserialization_errors=True,
+                save_type=save_type,
+                write_behind=True,
+                write_behind_max_size=10,
+                write_behind_interval=60
+            )
+            stored_redis_root = RedisRoot(
+                prefix=prefix,
+                connection_pool=connection_pool,
+                ignore_deserialization_errors=True,
+                save_type=save_type
+            )
+            stored_redis_root.register_models([IndexedTaskChallenge])
+            task_challenge = redis_root.create(IndexedTaskChallenge, task_id=0)
+            for i in range(100):
+                redis_root.update(IndexedTaskChallenge, [task_challenge], task_id=i, status='completed')
+            if len(redis_root.write_behind_buffer) != 1:
+                have_exception = True
+            if stored_redis_root.get(IndexedTaskChallenge)[0]['task_id'] != 0:
+                have_exception = True
+            if redis_root.get(IndexedTaskChallenge, status='in_work') or redis_root.write_behind_buffer:
+                have_exception = True
+            if stored_redis_root.get(IndexedTaskChallenge)[0]['task_id'] != 99:
+                have_exception = True
+            redis_root.update(IndexedTaskChallenge, [task_challenge], status='failed_bot')
+            if redis_root.update(IndexedTaskChallenge, [task_challenge], checked=True, return_dict=True) is None:
+                have_exception = True
+            redis_root.flush()
+            if stored_redis_root.count(IndexedTaskChallenge, status='completed') != 0:
+                have_exception = True
+            if stored_redis_root.count(IndexedTaskChallenge, status='failed_bot', checked=True) != 1:
+                have_exception = True
+            
+            task_challenges = redis_root.bulk_create(IndexedTaskChallenge, [{'task_id': i} for i in range(19)])
+            for task_challenge in task_challenges:
+                redis_root.update(IndexedTaskChallenge, [task_challenge], checked=True, status='completed')
+            if len(redis_root.write_behind_buffer) != 9:
+                have_exception = True
+            if stored_redis_root.count(IndexedTaskChallenge, status='completed') != 10:
+                have_exception = True
+            redis_root.delete(IndexedTaskChallenge, task_challenges)
+            if redis_root.write_behind_buffer or stored_redis_root.count(IndexedTaskChallenge) != 1:
+                have_exception = True
+            
+            redis_root.write_behind_interval = 0.05
+            redis_root.join()
+            redis_root.update(IndexedTaskChallenge, status='in_work')
+            sleep(0.5)
+            if stored_redis_root.count(IndexedTaskChallenge, status='in_work') != 1:
+                have_exception = True
+            redis_root.join()
+            
+            redis_root.write_behind_interval = 60
+            redis_root.update(IndexedTaskChallenge, status='completed')
+            flush_write_behind_roots()
+            if stored_redis_root.count(IndexedTaskChallenge, status='completed') != 1:
+                have_exception = True
+            redis_root.join()
+            roots_count = len(WRITE_BEHIND_ROOTS)
+            del redis_root
+            gc.collect()
+            if len(WRITE_BEHIND_ROOTS) != roots_count - 1:
+                have_exception = True
+            clean_db_after_test(connection_pool, prefix)
+    except BaseException as ex:
+        print(ex)
+        have_exception = True
+    
+    clean_db_after_test(connection_pool, prefix)
+    return have_exception
+
+
+def batch_test(connection_pool, prefix):
+    have_exception = False
+    try:
+        for save_type in ['instances', 'fields', 'hash']:
+            redis_root = RedisRoot(
+                prefix=prefix,
+                connection_pool=connection_pool,
+                ignore_deserialization_errors=True,
+                save_type=save_type
+            )
+            redis_root.register_models([BotSession, IndexedTaskChallenge])
+            
+            def get_exec_calls():
+                return redis_root.redis_instance.info('commandstats').get('cmdstat_exec', {}).get('calls', 0)
+            
+            exec_calls_before = get_exec_calls()
+            with redis_root.batch() as batch:
+                bot_session = batch.create(BotSession)
+                task_challenges = batch.bulk_create(IndexedTaskChallenge, [
+                    {'bot_session': bot_session, 'task_id': i}
+                    for i in range(10)
+                ])
+                batch.update(IndexedTaskChallenge, task_challenges[:5], status='completed')
+                batch.delete(IndexedTaskChallenge, task_challenges[9:])
+                if redis_root.count(IndexedTaskChallenge) != 0:
+                    have_exception = True
+            if get_exec_calls() - exec_calls_before != 1:
+                have_exception = True
+            if redis_root.count(IndexedTaskChallenge) != 9 or redis_root.count(IndexedTaskChallenge, status='completed') != 5:
+                have_exception = True
+            if task_challenges[0]['bot_session']['session_token'] != bot_session['session_token']:
+                have_exception = True
+            
+            with redis_root.batch() as batch:
+                batch.update(IndexedTaskChallenge, task_challenges[:2], status='failed_bot')
+                batch.update(IndexedTaskChallenge, task_challenges[:2], checked=True)
+                batch.bulk_update(IndexedTaskChallenge, [{'id': task_challenges[2]['id'], 'task_id': 100}])
+                batch.delete(IndexedTaskChallenge, task_challenges[8:9])
+                batch.create(IndexedTaskChallenge, task_id=200)
+            if redis_root.count(IndexedTaskChallenge, status='failed_bot', checked=True) != 2:
+                have_exception = True
+            if redis_root.count(IndexedTaskChallenge, status='completed') != 3 or redis_root.count(IndexedTaskChallenge, checked=False) != 7:
+                have_exception = True
+            if len(redis_root.get(IndexedTaskChallenge, task_id__gte=100)) != 2:
+                have_exception = True
+            
+            try:
+                with redis_root.batch() as batch:
+                    batch.update(IndexedTaskChallenge, status='in_work')
+                    batch.create(IndexedTaskChallenge)
+                    raise Exception('discard batch')
+            except Exception:
+                pass
+            if redis_root.count(IndexedTaskChallenge) != 9 or redis_root.count(IndexedTaskChallenge, status='in_work') != 4:
+                have_exception = True
+            
+            with redis_root.batch() as batch:
+                batch.delete(IndexedTaskChallenge, task_challenges[3:4])
+                batch.update(IndexedTaskChallenge, task_challenges[3:5], status='failed_bot')
+                created_task_challenge = batch.create(IndexedTaskChallenge, task_id=300)
+                batch.update(IndexedTaskChallenge, [created_task_challenge], status='completed', task_id=301)
+            if created_task_challenge['status'] != 'completed' or created_task_challenge['task_id'] != 301:
+                have_exception = True
+            if redis_root.get(IndexedTaskChallenge, id=task_challenges[3]['id']):
+                have_exception = True
+            if redis_root.count(IndexedTaskChallenge, status='failed_bot') != 3 or redis_root.count(IndexedTaskChallenge, status='completed') != 2:
+                have_exception = True
+            stored_task_challenge = redis_root.get(IndexedTaskChallenge, id=created_task_challenge['id'])[0]
+            if stored_task_challenge['status'] != 'completed' or stored_task_challenge['task_id'] != 301:
+                have_exception = True
+            clean_db_after_test(connection_pool, prefix)
+    except BaseException as ex:
+        print(ex)
+        have_exception = True
+    
+    clean_db_after_test(connection_pool, prefix)
+    return have_exception
+
+
+def lua_filter_test(connection_pool, prefix):
+    have_exception = False
+    try:
+        for save_type in ['instances', 'hash']:
+            redis_root = RedisRoot(
+                prefix=prefix,
+                connection_pool=connection_pool,
+                ignore_deserialization_errors=True,
+                save_type=save_type,
+                filter_engine='lua'
+            )
+            python_redis_root = RedisRoot(
+                prefix=prefix,
+                connection_pool=connection_pool,
+                ignore_deserialization_errors=True,
+                save_type=save_type
+            )
+            statuses = ['in_work', 'completed', 'failed_bot', 'failed_task_creator']
+            redis_root.bulk_create(TaskChallenge, [
+                {
+                    'task_id': i,
+                    'status': statuses[i % len(statuses)],
+                    'account_checks_count': (None if i % 7 == 0 else i % 10),
+                }
+                for i in range(2500)
+            ])
+            python_redis_root.register_models([TaskChallenge])
+            filters_list = [
+                {'status': 'completed'},
+                {'task_id__gte': 50, 'task_id__lt': 120},
+                {'status__in': ['completed', 'in_work'], 'task_id__gt': 2400},
+                {'status__icontains': 'FAILED_', 'account_checks_count__lte': 3},
+                {'status__startswith': 'fail', 'status__endswith': 'bot'},
+                {'account_checks_count__isnull': True},
+                {'account_checks_count__isnull': False, 'account_checks_count': 5},
+                {'task_id__in': [1, 2, 3000], 'status__iexact': 'COMPLETED'},
+                {'status__contains': 'work', 'created__lte': datetime.datetime.now()},
+                {'status': 'completed', 'task_id': '5'},
+            ]
+            evalsha_calls_before = redis_root.redis_instance.info('commandstats').get('cmdstat_evalsha', {}).get('calls', 0)
+            for filters in filters_list:
+                lua_ids = [instance['id'] for instance in redis_root.get(TaskChallenge, **filters)]
+                python_ids = [instance['id'] for instance in python_redis_root.get(TaskChallenge, **filters)]
+                if lua_ids != python_ids:
+                    have_exception = True
+                if redis_root.count(TaskChallenge, **filters) != len(python_ids):
+                    have_exception = True
+                if [instance['id'] for instance in redis_root.query(TaskChallenge).filter(**filters)] != python_ids:
+                    have_exception = True
+            evalsha_calls_after = redis_root.redis_instance.info('commandstats').get('cmdstat_evalsha', {}).get('calls', 0)
+            if evalsha_calls_after <= evalsha_calls_before:
+                have_exception = True
+            clean_db_after_test(connection_pool, prefix)
+        
+        try:
+            RedisRoot(prefix=prefix, connection_pool=connection_pool, save_type='fields', filter_engine='lua')
+            have_exception = True
+        except Exception:
+            pass
+    except BaseException as ex:
+        print(ex)
+        have_exception = True
+    
+    clean_db_after_test(connection_pool, prefix)
+    return have_exception
+
+
+def compiled_filters_test(connection_pool, prefix):
+    have_exception = False
+    try:
+        redis_root = RedisRoot(
+            prefix=prefix,
+            connection_pool=connection_pool,
+            ignore_deserialization_errors=True,
+        )
+        instance_fields = {
+            'status': 'Completed',
+            'task_id': 5,
+            'created': datetime.datetime(2021, 1, 1, 12),
+            'bot_session': {'id': 1, 'session_token': 'ABC'},
+            'task_challenges': [{'id': 1}, {'id': 2}],
+            'account_checks_count': None,
+        }
+        allowed_filters_list = [
+            {'status__iexact': 'COMPLETED', 'status__istartswith': 'comp', 'status__icontains': 'PLE'},
+            {'task_id__in': [1, 5], 'task_id__gte': 5, 'task_id__range': 6},
+            {'created__gte': datetime.datetime(2021, 1, 1, tzinfo=pytz.UTC)},
+            {'bot_session__session_token__iendswith': 'bc', 'account_checks_count__isnull': True},
+            {'task_challenges__in': [[{'id': 1}, {'id': 2}]], 'missing_field': 'ignored'},
+        ]
+        denied_filters_list = [
+            {'status': 'completed'},
+            {'task_id__in': {1, 2}},
+            {'task_id__range': (1, 10)},
+            {'created__lt': datetime.datetime(2021, 1, 1)},
+            {'account_checks_count__gt': 1},
+            {'bot_session__session_token': 'abc'},
+        ]
+        for filters in allowed_filters_list:
+            if not redis_root._instance_allowed(instance_fields, redis_root._compile_filters(filters)):
+                have_exception = True
+        for filters in denied_filters_list:
+            if redis_root._instance_allowed(instance_fields, redis_root._compile_filters(filters)):
+                have_exception = True
+    except BaseException as ex:
+        print(ex)
+        have_exception = True
+    
+    clean_db_after_test(connection_pool, prefix)
+    return have_exception
+
+
+def order_index_test(connection_pool, prefix):
+    have_exception = False
+    try:
+        for save_type in ['instances', 'fields', 'hash']:
+            redis_root = RedisRoot(
+                prefix=prefix,
+                connection_pool=connection_pool,
+                ignore_deserialization_errors=True,
+                save_type=save_type
+            )
+            redis_root.bulk_create(IndexedTaskChallenge, [
+                {
+                    'task_id': (i * 7) % 50,
+                    'status': ('completed' if i % 3 else 'in_work'),
+                    'price': decimal.Decimal(i % 13) / 4,
+                    'created': datetime.datetime(2021, 1, 1) + datetime.timedelta(hours=(i * 11) % 97),
+                }
+                for i in range(300)
+            ], batch_size=1000)
+            all_instances = redis_root.get(IndexedTaskChallenge)
+            for ordering in ['task_id', '-task_id', 'price', '-created']:
+                queryset = redis_root.query(IndexedTaskChallenge).order_by(ordering)
+                queryset.batch_size = 7
+                if [instance['id'] for instance in queryset] != [instance['id'] for instance in redis_root.order(all_instances, ordering)]:
+                    have_exception = True
+                page = [instance['id'] for instance in queryset[40:55]]
+                if page != [instance['id'] for instance in redis_root.order(all_instances, ordering)[40:55]]:
+                    have_exception = True
+                filtered = queryset.filter(status='completed').exclude(task_id__lt=10)[5:25]
+                expected = [
+                    instance['id']
+                    for instance in redis_root.order(all_instances, ordering)
+                    if instance['status'] == 'completed' and instance['task_id'] >= 10
+                ][5:25]
+                if [instance['id'] for instance in filtered] != expected:
+                    have_exception = True
+            
+            keyspace_hits_before = redis_root.redis_instance.info('stats')['keyspace_hits']
+            page = list(redis_root.query(IndexedTaskChallenge).order_by('-created')[100:105])
+            keyspace_hits_after = redis_root.redis_instance.info('stats')['keyspace_hits']
+            if len(page) != 5 or keyspace_hits_after - keyspace_hits_before > 100:
+                have_exception = True
+            
+            redis_root.create(IndexedTaskChallenge, price=None)
+            if len(list(redis_root.query(IndexedTaskChallenge).order_by('task_id'))) != 301:
+                have_exception = True
+            clean_db_after_test(connection_pool, prefix)
+            
+            big_number = 2 ** 60
+            redis_root.bulk_create(IndexedTaskChallenge, [
+                {'task_id': big_number + i}
+                for i in [2, 3, 1]
+            ])
+            queryset = redis_root.query(IndexedTaskChallenge)
+            expected = [big_number + 1, big_number + 2, big_number + 3]
+            if queryset.order_by('task_id').values_list('task_id', flat=True) != expected:
+                have_exception = True
+            if queryset.filter(status='in_work').order_by('-task_id').values_list('task_id', flat=True) != expected[::-1]:
+                have_exception = True
+            if list(queryset.order_by('-task_id')[:1])[0]['task_id'] != big_number + 3:
+                have_exception = True
+            clean_db_after_test(connection_pool, prefix)
+    except BaseException as ex:
+        print(ex)
+        have_exception = True
+    
+    clean_db_after_test(connection_pool, prefix)
+    return have_exception
+
+
+def index_count_test(connection_pool, prefix):
+    have_exception = False
+    try:
+        for save_type in ['instances', 'fields', 'hash']:
+            redis_root = RedisRoot(
+                prefix=prefix,
+                connection_pool=connection_pool,
+                ignore_deserialization_errors=True,
+                save_type=save_type
+            )
+            redis_root.bulk_create(IndexedTaskChallenge, [
+                {
+                    'task_id': i % 50,
+                    'status': ('completed' if i % 3 else 'in_work'),
+                    'checked': bool(i % 4),
+                    'created': datetime.datetime(2021, 1, 1) + datetime.timedelta(hours=i % 97),
+                    'deadline': datetime.date(2021, 1, 1) + datetime.timedelta(days=i % 31),
+                }
+                for i in range(500)
+            ], batch_size=1000)
+            redis_root.create(IndexedTaskChallenge, status=None, task_id=7)
+            all_instances = redis_root.get(IndexedTaskChallenge)
+            cases = [
+                ({'status': 'completed'}, lambda instance: instance['status'] == 'completed'),
+                ({'status__in': ['in_work', None]}, lambda instance: instance['status'] in ['in_work', None]),
+                ({'status__isnull': True}, lambda instance: instance['status'] is None),
+                ({'task_id__gt': 10, 'task_id__lte': 20}, lambda instance: 10 < instance['task_id'] <= 20),
+                ({'task_id': 7, 'checked': True}, lambda instance: instance['task_id'] == 7 and instance['checked']),
+                (
+                    {'created__lt': datetime.datetime(2021, 1, 2), 'status': 'in_work', 'checked__in': [False]},
+                    lambda instance: instance['created'] < datetime.datetime(2021, 1, 2, tzinfo=pytz.UTC) and instance['status'] == 'in_work' and not instance['checked']
+                ),
+                ({'deadline__gte': datetime.date(2021, 1, 20)}, lambda instance: instance['deadline'] >= datetime.date(2021, 1, 20)),
+                ({'status__in': []}, lambda instance: False),
+                ({'id__gt': 100, 'id__lte': 250}, lambda instance: 100 < instance['id'] <= 250),
+                ({'id': 7, 'status': 'completed'}, lambda instance: instance['id'] == 7 and instance['status'] == 'completed'),
+            ]
+            for filters, check in cases:
+                expected = len([instance for instance in all_instances if check(instance)])
+                if redis_root._get_index_count(IndexedTaskChallenge, [filters]) != expected:
+                    have_exception = True
+                if redis_root.count(IndexedTaskChallenge, **filters) != expected:
+                    have_exception = True
+                if redis_root.query(IndexedTaskChallenge).filter(**filters).count() != expected:
+                    have_exception = True
+            queryset = redis_root.query(IndexedTaskChallenge).filter(status='completed').filter(task_id__lt=5)
+            if queryset.count() != len([instance for instance in all_instances if instance['status'] == 'completed' and instance['task_id'] < 5]):
+                have_exception = True
+            for filters in [{'status__icontains': 'work'}, {'price__gte': 0}, {'task_id__in': [1, 2]}, {'status': 5}]:
+                if redis_root._get_index_count(IndexedTaskChallenge, [filters]) is not None:
+                    have_exception = True
+            if redis_root.count(IndexedTaskChallenge, status__icontains='WORK') != len([instance for instance in all_instances if instance['status'] == 'in_work']):
+                have_exception = True
+            clean_db_after_test(connection_pool, prefix)
+            
+            big_number = 2 ** 60
+            redis_root.bulk_create(IndexedTaskChallenge, [
+                {'task_id': big_number + i}
+                for i in [2, 3, 1]
+            ])
+            for filters in [{'task_id': big_number + 1}, {'task_id__gt': big_number + 1}, {'task_id': big_number}, {'task_id__lte': big_number + 2}]:
+                if redis_root.count(IndexedTaskChallenge, **filters) != len(redis_root.get(IndexedTaskChallenge, **filters)):
+                    have_exception = True
+            clean_db_after_test(connection_pool, prefix)
+    except BaseException as ex:
+        print(ex)
+        have_exception = True
+    
+    clean_db_after_test(connection_pool, prefix)
+    return have_exception
+
+
+def aggregate_test(connection_pool, prefix):
+    have_exception = False
+    try:
+        for save_type in ['instances', 'fields', 'hash']:
+            redis_root = RedisRoot(
+                prefix=prefix,
+                connection_pool=connection_pool,
+                ignore_deserialization_errors=True,
+                save_type=save_type
+            )
+            redis_root.bulk_create(IndexedTaskChallenge, [
+                {
+                    'task_id': i % 50,
+                    'status': ('completed' if i % 3 else 'in_work'),
+                    'checked': bool(i % 4),
+                    'price': (decimal.Decimal(i % 13) / 4 if i % 5 else None),
+                    'created': datetime.datetime(2021, 1, 1) + datetime.timedelta(hours=(i * 11) % 97),
+                }
+                for i in range(1500)
+            ], batch_size=1000)
+            redis_root.bulk_create(TaskChallenge, [
+                {'account_checks_count': (i % 7) / 2}
+                for i in range(1200)
+            ], batch_size=1000)
+            all_instances = redis_root.get(IndexedTaskChallenge)
+            prices = [instance['price'] for instance in all_instances if instance['price'] is not None]
+            result = redis_root.aggregate(
+                IndexedTaskChallenge,
+                Sum('task_id'), Avg('price'), Sum('price'), Min('price'), Max('created'), Min('status'), Count('price')
+            )
+            expected = {
+                'task_id__sum': sum(instance['task_id'] for instance in all_instances),
+                'price__avg': sum(prices) / len(prices),
+                'price__sum': sum(prices),
+                'price__min': min(prices),
+                'created__max': max(instance['created'] for instance in all_instances),
+                'status__min': 'completed',
+                'price__count': len(prices),
+            }
+            if result != expected:
+                have_exception = True
+            if redis_root.aggregate(IndexedTaskChallenge, Min('task_id'), Max('task_id')) != {'task_id__min': 0, 'task_id__max': 49}:
+                have_exception = True
+            for filters, check in [
+                ({'status': 'in_work', 'task_id__gte': 10}, lambda instance: instance['status'] == 'in_work' and instance['task_id'] >= 10),
+                ({'status__icontains': 'WORK'}, lambda instance: instance['status'] == 'in_work'),
+            ]:
+                filtered_instances = [instance for instance in all_instances if check(instance)]
+                result = redis_root.aggregate(IndexedTaskChallenge, Sum('task_id'), Max('task_id'), **filters)
+                if result != {
+                    'task_id__sum': sum(instance['task_id'] for instance in filtered_instances),
+                    'task_id__max': max(instance['task_id'] for instance in filtered_instances),
+                }:
+                    have_exception = True
+                expected_groups = {}
+                for instance in filtered_instances:
+                    expected_groups[instance['checked']] = expected_groups.get(instance['checked'], 0) + 1
+                if redis_root.group_count(IndexedTaskChallenge, 'checked', **filters) != expected_groups:
+                    have_exception = True
+            
+            def get_scan_calls():
+                commandstats = redis_root.redis_instance.info('commandstats')
+                return sum(
+                    commandstats.get(f'cmdstat_{command}', {}).get('calls', 0)
+                    for command in ['scan', 'keys', 'evalsha']
+                )
+            
+            scan_calls_before = get_scan_calls()
+            if redis_root.group_count(IndexedTaskChallenge, 'status') != {'completed': 1000, 'in_work': 500}:
+                have_exception = True
+            if get_scan_calls() != scan_calls_before:
+                have_exception = True
+            redis_root.update(IndexedTaskChallenge, all_instances[:3], status='failed_bot')
+            if redis_root.group_count(IndexedTaskChallenge, 'status') != {'completed': 998, 'in_work': 499, 'failed_bot': 3}:
+                have_exception = True
+            redis_root.redis_instance.delete(redis_root._get_index_groups_key('IndexedTaskChallenge', 'status'))
+            if redis_root.group_count(IndexedTaskChallenge, 'status') != {'completed': 998, 'in_work': 499, 'failed_bot': 3}:
+                have_exception = True
+            redis_root.update(IndexedTaskChallenge, all_instances[:3], status='completed')
+            if len(redis_root.group_count(IndexedTaskChallenge, 'task_id')) != 50:
+                have_exception = True
+            task_challenges = redis_root.get(TaskChallenge)
+            checks_counts = [instance['account_checks_count'] for instance in task_challenges]
+            result = redis_root.aggregate(TaskChallenge, Sum('account_checks_count'), Avg('account_checks_count'), Max('account_checks_count'))
+            if result != {
+                'account_checks_count__sum': sum(checks_counts),
+                'account_checks_count__avg': sum(checks_counts) / len(checks_counts),
+                'account_checks_count__max': 3.0,
+            }:
+                have_exception = True
+            if redis_root.aggregate(TaskChallenge, Sum('account_checks_count'), account_checks_count__gt=100) != {'account_checks_count__sum': None}:
+                have_exception = True
+            try:
+                redis_root.aggregate(IndexedTaskChallenge, Sum('status'))
+                have_exception = True
+            except BaseException as ex:
+                pass
+            big_number = 2 ** 60
+            redis_root.bulk_create(TaskChallenge, [
+                {'account_checks_count': big_number + i}
+                for i in range(1, 4)
+            ])
+            result = redis_root.aggregate(TaskChallenge, Sum('account_checks_count'), account_checks_count__gte=big_number)
+            if result != {'account_checks_count__sum': 3 * big_number + 6}:
+                have_exception = True
+            if redis_root.aggregate(TaskChallenge, Max('account_checks_count')) != {'account_checks_count__max': big_number + 3}:
+                have_exception = True
+            if redis_root.group_count(TaskChallenge, 'status', account_checks_count__gte=big_number) != {'in_work': 3}:
+                have_exception = True
+            redis_root.bulk_create(IndexedTaskChallenge, [
+                {'task_id': 1000, 'price': decimal.Decimal('12345678901234567.89')}
+                for i in range(3)
+            ])
+            result = redis_root.aggregate(IndexedTaskChallenge, Sum('price'), Avg('price'), task_id=1000)
+            if result != {'price__sum': decimal.Decimal('37037036703703703.67'), 'price__avg': decimal.Decimal('12345678901234567.89')}:
+                have_exception = True
+            if save_type != 'fields':
+                try:
+                    redis_root.aggregate(TaskChallenge, Sum('task_id'), created__gte=datetime.datetime(2021, 1, 1))
+                    have_exception = True
+                except BaseException as ex:
+                    pass
+            clean_db_after_test(connection_pool, prefix)
+            redis_root.bulk_create(IndexedTaskChallenge, [
+                {'task_id': big_number + i, 'price': decimal.Decimal(f'12345678901234567.9{i}')}
+                for i in [2, 3, 1]
+            ])
+            result = redis_root.aggregate(IndexedTaskChallenge, Min('task_id'), Max('task_id'), Min('price'), Max('price'))
+            if result != {
+                'task_id__min': big_number + 1,
+                'task_id__max': big_number + 3,
+                'price__min': decimal.Decimal('12345678901234567.91'),
+                'price__max': decimal.Decimal('12345678901234567.93'),
+            }:
+                have_exception = True
+            clean_db_after_test(connection_pool, prefix)
+    except BaseException as ex:
+        print(ex)
+        have_exception = True
+    
+    clean_db_after_test(connection_pool, prefix)
+    return have_exception
+
+
+def projection_test(connection_pool, prefix):
+    have_exception = False
+    try:
+        for save_type in ['instances', 'fields', 'hash']:
+            redis_root = RedisRoot(
+                prefix=prefix,
+                connection_pool=connection_pool,
+                ignore_deserialization_errors=True,
+                save_type=save_type
+            )
+            bot_session = redis_root.create(BotSession, session_token='token')
+            redis_root.bulk_create(TaskChallenge, [
+                {
+                    'bot_session': bot_session,
+                    'task_id': i,
+                    'status': ('completed' if i % 3 else 'in_work'),
+                    'account_checks_count': i % 5,
+                }
+                for i in range(30)
+            ])
+            redis_root.bulk_create(DictCheckModel, [{'redis_dict': {'key': i}} for i in range(5)])
+            all_instances = redis_root.get(TaskChallenge)
+            instances = redis_root.get(TaskChallenge, only=['task_id'], status='completed', account_checks_count__gte=2)
+            expected = [
+                {'id': instance['id'], 'task_id': instance['task_id']}
+                for instance in all_instances
+                if instance['status'] == 'completed' and instance['account_checks_count'] >= 2
+            ]
+            if instances != expected:
+                have_exception = True
+            instances = redis_root.get(TaskChallenge, only=['bot_session', 'status'], task_id=4)
+            if instances != [{'id': all_instances[4]['id'], 'bot_session': bot_session, 'status': 'completed'}]:
+                have_exception = True
+            if redis_root.values_list(TaskChallenge, 'id', 'task_id', task_id__lt=3) != [
+                (instance['id'], instance['task_id'])
+                for instance in all_instances[:3]
+            ]:
+                have_exception = True
+            if redis_root.values_list(DictCheckModel, 'redis_dict', flat=True) != [{'key': i} for i in range(5)]:
+                have_exception = True
+            queryset = redis_root.query(TaskChallenge).filter(status='in_work').order_by('-account_checks_count')
+            if queryset.values_list('task_id', flat=True) != [
+                instance['task_id']
+                for instance in redis_root.order(
+                    [instance for instance in all_instances if instance['status'] == 'in_work'],
+                    '-account_checks_count'
+                )
+            ]:
+                have_exception = True
+            if queryset.exclude(task_id=0).count() != 9:
+                have_exception = True
+            try:
+                redis_root.get(TaskChallenge, only=['unknown_field'])
+                have_exception = True
+            except BaseException as ex:
+                pass
+            try:
+                redis_root.values_list(TaskChallenge, 'id', 'task_id', flat=True)
+                have_exception = True
+            except BaseException as ex:
+                pass
+            clean_db_after_test(connection_pool, prefix)
+    except BaseException as ex:
+        print(ex)
+        have_exception = True
+    
+    clean_db_after_test(connection_pool, prefix)
+    return have_exception
+
+
+def ids_filter_test(connection_pool, prefix):
+    have_exception = False
+    try:
+        for save_type in ['instances', 'fields', 'hash']:
+            redis_root = RedisRoot(
+                prefix=prefix,
+                connection_pool=connection_pool,
+                ignore_deserialization_errors=True,
+                save_type=save_type
+            )
+            created = redis_root.bulk_create(IndexedTaskChallenge, [
+                {
+                    'task_id': i % 10,
+                    'status': ('completed' if i % 3 else 'in_work'),
+                }
+                for i in range(200)
+            ])
+            ids = [instance['id'] for instance in created]
+            cases = [
+                ({'id': ids[5]}, [ids[5]]),
+                ({'id__in': [ids[3], ids[150], 10 ** 9]}, [ids[3], ids[150]]),
+                ({'id__in': []}, []),
+                ({'id__gte': ids[190]}, ids[190:]),
+                ({'id__lt': ids[10], 'status': 'in_work'}, [instance_id for i, instance_id in enumerate(ids[:10]) if not i % 3]),
+                ({'id__range': ids[20]}, [instance_id for instance_id in ids if instance_id in range(ids[20])]),
+            ]
+            for filters, expected in cases:
+                if redis_root._get_index_filter_plan(IndexedTaskChallenge, filters) is None:
+                    have_exception = True
+                if redis_root._get_index_filtered_ids(IndexedTaskChallenge, filters) is None:
+                    have_exception = True
+                if sorted(instance['id'] for instance in redis_root.get(IndexedTaskChallenge, **filters)) != expected:
+                    have_exception = True
+                if redis_root.query(IndexedTaskChallenge).filter(**filters).values_list('id', flat=True) != expected:
+                    have_exception = True
+            if redis_root._get_index_filtered_ids(IndexedTaskChallenge, {'id__in': [ids[1], ids[2]]}) != [ids[1], ids[2]]:
+                have_exception = True
+            if redis_root.count(IndexedTaskChallenge, id__gte=ids[100]) != 100:
+                have_exception = True
+            clean_db_after_test(connection_pool, prefix)
+    except BaseException as ex:
+        print(ex)
+        have_exception = True
+    
+    clean_db_after_test(connection_pool, prefix)
+    return have_exception
+
+
+def update_return_test(connection_pool, prefix):
+    have_exception = False
+    try:
+        for save_type in ['instances', 'fields', 'hash']:
+            redis_root = RedisRoot(
+                prefix=prefix,
+                connection_pool=connection_pool,
+                ignore_deserialization_errors=True,
+                save_type=save_type
+            )
+            bot_session = redis_root.create(BotSession, session_token='123')
+            task_challenge = redis_root.create(TaskChallenge, bot_session=bot_session, task_id=5, status='in_work')
+            updated = redis_root.update(TaskChallenge, task_challenge, status='completed', account_checks_count=3)
+            stored = redis_root.get(TaskChallenge, id=task_challenge['id'])
+            if len(updated) != 1 or set(updated[0].keys()) != set(stored[0].keys()):
+                have_exception = True
+            elif updated[0]['status'] != 'completed' or updated[0]['task_id'] != 5:
+                have_exception = True
+            elif save_type != 'instances' and updated[0] != stored[0]:
+                have_exception = True
+            updated_dict = redis_root.update(TaskChallenge, task_challenge, return_dict=True, task_id=6)
+            stored_dict = redis_root.get(TaskChallenge, return_dict=True, id=task_challenge['id'])
+            if set(updated_dict.keys()) != {task_challenge['id']}:
+                have_exception = True
+            elif set(updated_dict[task_challenge['id']].keys()) != set(stored_dict[task_challenge['id']].keys()):
+                have_exception = True
+            elif updated_dict[task_challenge['id']]['status'] != 'completed':
+                have_exception = True
+            clean_db_after_test(connection_pool, prefix)
+    except BaseException as ex:
+        print(ex)
+        have_exception = True
+    
+    clean_db_after_test(connection_pool, prefix)
+    return have_exception
+
+
+def concurrent_index_test(connection_pool, prefix):
+    have_exception = False
+    try:
+        statuses = ['in_work', 'completed', 'failed_bot']
+        for save_type in ['instances', 'fields', 'hash']:
+            redis_root = RedisRoot(
+                prefix=prefix,
+                connection_pool=connection_pool,
+                ignore_deserialization_errors=True,
+                save_type=save_type
+            )
+            task_challenges = redis_root.bulk_create(IndexedTaskChallenge, [{'task_id': i} for i in range(10)])
+            
+            def update_statuses(worker):
+                worker_redis_root = RedisRoot(
+                    prefix=prefix,
+                    connection_pool=connection_pool,
+                    ignore_deserialization_errors=True,
+                    save_type=save_type
+                )
+                for i in range(30):
+                    worker_redis_root.update(
+                        IndexedTaskChallenge,
+                        task_challenges[(worker + i) % 5:(worker + i) % 5 + 5],
+                        status=statuses[(worker + i) % 3]
+                    )
+                worker_redis_root.delete(IndexedTaskChallenge, task_challenges[9 - worker:10 - worker])
+            
+            with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+                list(executor.map(update_statuses, range(4)))
+            stored = redis_root.get(IndexedTaskChallenge)
+            for status in statuses:
+                expected = sorted(instance['id'] for instance in stored if instance['status'] == status)
+                if redis_root.query(IndexedTaskChallenge).filter(status=status).values_list('id', flat=True) != expected:
+                    have_exception = True
+                if redis_root.count(IndexedTaskChallenge, status=status) != len(expected):
+                    have_exception = True
+            if len(stored) != 6:
+                have_exception = True
+            clean_db_after_test(connection_pool, prefix)
+    except BaseException as ex:
+        print(ex)
+        have_exception = True
+    
+    clean_db_after_test(connection_pool, prefix)
+    return have_exception
+
+
 def performance_test(connection_pool, prefix):
     have_exception = False
     
@@ -832,6 +2547,34 @@ def run_tests():
         many_to_many_test,
         save_override_test,
         inheritance_test,
+        ids_index_test,
+        ids_allocation_test,
+        bulk_create_test,
+        bulk_update_test,
+        save_types_test,
+        range_index_test,
+        exact_index_test,
+        queryset_test,
+        iterate_test,
+        select_related_test,
+        many_to_many_prefetch_test,
+        lazy_relations_test,
+        codec_test,
+        fields_metadata_test,
+        model_values_test,
+        async_test,
+        nb_thread_test,
+        write_behind_test,
+        batch_test,
+        lua_filter_test,
+        compiled_filters_test,
+        order_index_test,
+        index_count_test,
+        aggregate_test,
+        projection_test,
+        ids_filter_test,
+        update_return_test,
+        concurrent_index_test,
         performance_test,
         flood_performance_test,
     ]
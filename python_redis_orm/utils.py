@@ -24,7 +24,7 @@ def check_classes(value, allowed_classes):
 
 
 def get_ids_from_untyped_data(instances):
-    if type(instances) == dict:
+    if isinstance(instances, dict):
         if 'id' in instances.keys():
             ids = [instances['id']]
         else:
@@ -72,3 +72,9 @@ def check_callable(value):
 
 def attr_is_real(attr_k, attr_v):
     return not isfunction(attr_v) and not (attr_k.startswith('__') and attr_k.endswith('__'))
+
+
+def get_not_supported_method(method_name):
+    def not_supported_method(self, *args, **kwargs):
+        raise Exception(f'{method_name} is not supported by {self.__class__.__name__}')
+    return not_supported_method